@@ -2,16 +2,41 @@
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <sys/stat.h>
 #include <gmssl/zuc.h>
 #include <gmssl/rand.h>
 #include "sm2_ecdh.h"
 
+#ifdef _WIN32
+#include <windows.h>
+#include <io.h>
+#include <fcntl.h>
+#include <direct.h>
+#else
+#include <dirent.h>
+#include <pthread.h>
+#include <unistd.h>
+#endif
+
+#ifndef S_ISDIR
+#define S_ISDIR(m) (((m) & S_IFMT) == S_IFDIR)
+#endif
+#ifndef S_ISREG
+#define S_ISREG(m) (((m) & S_IFMT) == S_IFREG)
+#endif
+
 #define COLOR_GREEN  "\033[1;32m"
 #define COLOR_RED    "\033[1;31m"
 #define COLOR_YELLOW "\033[1;33m"
 #define COLOR_RESET  "\033[0m"
 
 #define ZUC_KEY_SIZE 16 // 128-bit
+#define IO_BUFFER_SIZE (64 * 1024) // 流式加解密缓冲区大小（必须是4的倍数）
+#define PREVIEW_SIZE 512
+#define ZUC_IV_SIZE 16
+#define BATCH_PATH_MAX 4096
+#define BATCH_MAX_THREADS 64
+#define BATCH_INDEX_HEADER "# e2e-tool batch index v1"
 
 // 命令行参数结构
 typedef struct {
@@ -21,16 +46,25 @@ typedef struct {
     const char *privkey;
     const char *pubkey;
     const char *peer_pubkey;
+    const char *indexfile;
+    int threads;
 } cmd_args_t;
 
 // 函数声明
 void print_usage(const char *prog);
 int read_file(const char *filename, unsigned char **data, size_t *len);
 int write_file(const char *filename, const unsigned char *data, size_t len);
+FILE *open_input(const char *filename);
+FILE *open_output(const char *filename);
+void close_stream(FILE *fp);
+int zuc_crypt_stream(ZUC_STATE *state, FILE *in, FILE *out, unsigned char *preview, size_t *preview_len, size_t *total);
 int parse_encrypt_args(int argc, char **argv, cmd_args_t *args);
 int parse_decrypt_args(int argc, char **argv, cmd_args_t *args);
 int parse_gen_keys_args(int argc, char **argv, cmd_args_t *args);
 int parse_key_exchange_args(int argc, char **argv, cmd_args_t *args);
+int parse_batch_args(int argc, char **argv, cmd_args_t *args, int encrypt);
+int handle_encrypt_batch(const cmd_args_t *args);
+int handle_decrypt_batch(const cmd_args_t *args);
 int handle_encrypt(const cmd_args_t *args);
 int handle_decrypt(const cmd_args_t *args);
 int handle_gen_keys(const cmd_args_t *args);
@@ -41,6 +75,10 @@ void print_usage(const char *prog) {
     printf("Usage:\n");
     printf("  %s encrypt -in <input.txt> -out <output.zuc>\n", prog);
     printf("  %s decrypt -in <input.zuc> -out <output.txt> -key <zuc.key>\n", prog);
+    printf("  (-in/-out 为 - 时使用标准输入/标准输出)\n");
+    printf("  %s encrypt-batch -in <dir|manifest.txt> -out <outdir> -index <index.txt> [-threads N]\n", prog);
+    printf("  %s decrypt-batch -index <index.txt> -out <outdir> [-in <dir>] [-threads N]\n", prog);
+    printf("  (批量模式每个文件使用独立的随机密钥和 IV，记录在索引文件中；manifest 每行一个路径)\n");
     printf("  %s gen-keys -priv <priv.pem> -pub <pub.pem>\n", prog);
     printf("  %s key-exchange -priv <my.pem> -peer <peer_pub.pem> -out <session.key>\n", prog);
 }
@@ -81,6 +119,103 @@ int write_file(const char *filename, const unsigned char *data, size_t len) {
     return 0;
 }
 
+// 打开输入流，"-" 表示标准输入
+FILE *open_input(const char *filename) {
+    if (strcmp(filename, "-") == 0) {
+#ifdef _WIN32
+        _setmode(_fileno(stdin), _O_BINARY);
+#endif
+        return stdin;
+    }
+    FILE *fp = fopen(filename, "rb");
+    if (!fp) {
+        fprintf(stderr, COLOR_RED "[-] Cannot open file: %s\n" COLOR_RESET, filename);
+    }
+    return fp;
+}
+
+// 打开输出流，"-" 表示标准输出
+FILE *open_output(const char *filename) {
+    if (strcmp(filename, "-") == 0) {
+#ifdef _WIN32
+        _setmode(_fileno(stdout), _O_BINARY);
+#endif
+        return stdout;
+    }
+    FILE *fp = fopen(filename, "wb");
+    if (!fp) {
+        fprintf(stderr, COLOR_RED "[-] Cannot write file: %s\n" COLOR_RESET, filename);
+    }
+    return fp;
+}
+
+void close_stream(FILE *fp) {
+    if (fp && fp != stdin && fp != stdout) {
+        fclose(fp);
+    }
+}
+
+// 尽量读满缓冲区（管道可能分多次返回），返回读到的字节数
+static size_t read_full(FILE *in, unsigned char *buf, size_t len) {
+    size_t n = 0;
+    while (n < len) {
+        size_t r = fread(buf + n, 1, len - n, in);
+        if (r == 0) {
+            break;
+        }
+        n += r;
+    }
+    return n;
+}
+
+// 用同一个 ZUC_STATE 分块加解密整个输入流，内存占用固定为 IO_BUFFER_SIZE；
+// 除最后一块外每块长度都是4的倍数，保证密钥流连续。preview 非空时保存输出的前 PREVIEW_SIZE 字节
+// 缓冲区按次分配，批量模式下多个工作线程可以同时调用
+int zuc_crypt_stream(ZUC_STATE *state, FILE *in, FILE *out, unsigned char *preview, size_t *preview_len, size_t *total) {
+    unsigned char *buf = malloc(IO_BUFFER_SIZE);
+    size_t n;
+    int ret = 0;
+
+    *total = 0;
+    if (preview_len) {
+        *preview_len = 0;
+    }
+    if (!buf) {
+        fprintf(stderr, COLOR_RED "[-] Out of memory\n" COLOR_RESET);
+        return -1;
+    }
+    while ((n = read_full(in, buf, IO_BUFFER_SIZE)) > 0) {
+        zuc_encrypt(state, buf, n, buf);
+        if (fwrite(buf, 1, n, out) != n) {
+            fprintf(stderr, COLOR_RED "[-] Write failed\n" COLOR_RESET);
+            ret = -1;
+            break;
+        }
+        if (preview && *preview_len < PREVIEW_SIZE) {
+            size_t copy = PREVIEW_SIZE - *preview_len < n ? PREVIEW_SIZE - *preview_len : n;
+            memcpy(preview + *preview_len, buf, copy);
+            *preview_len += copy;
+        }
+        *total += n;
+        if (n < IO_BUFFER_SIZE) {
+            break;
+        }
+    }
+    free(buf);
+    if (ret != 0) {
+        return -1;
+    }
+    if (ferror(in)) {
+        fprintf(stderr, COLOR_RED "[-] Read failed\n" COLOR_RESET);
+        return -1;
+    }
+    if (fflush(out) != 0) {
+        fprintf(stderr, COLOR_RED "[-] Write failed\n" COLOR_RESET);
+        return -1;
+    }
+    return 0;
+}
+
 // 解析加密命令参数
 int parse_encrypt_args(int argc, char **argv, cmd_args_t *args) {
     memset(args, 0, sizeof(cmd_args_t));
@@ -165,99 +300,674 @@ int parse_key_exchange_args(int argc, char **argv, cmd_args_t *args) {
     return 0;
 }
 
-// 处理加密
-int handle_encrypt(const cmd_args_t *args) {
-    unsigned char *in_data = NULL;
-    size_t in_len = 0;
+// 解析批量命令参数（encrypt-batch / decrypt-batch）
+int parse_batch_args(int argc, char **argv, cmd_args_t *args, int encrypt) {
+    memset(args, 0, sizeof(cmd_args_t));
+    
+    for (int i = 2; i < argc; i++) {
+        if (strcmp(argv[i], "-in") == 0 && i + 1 < argc) {
+            args->infile = argv[++i];
+        } else if (strcmp(argv[i], "-out") == 0 && i + 1 < argc) {
+            args->outfile = argv[++i];
+        } else if (strcmp(argv[i], "-index") == 0 && i + 1 < argc) {
+            args->indexfile = argv[++i];
+        } else if (strcmp(argv[i], "-threads") == 0 && i + 1 < argc) {
+            args->threads = atoi(argv[++i]);
+        }
+    }
     
-    // 读取输入文件
-    if (read_file(args->infile, &in_data, &in_len) != 0) {
+    if (!args->outfile || !args->indexfile || (encrypt && !args->infile)) {
+        fprintf(stderr, COLOR_RED "[-] Missing required arguments for %s\n" COLOR_RESET,
+                encrypt ? "encrypt-batch" : "decrypt-batch");
+        return -1;
+    }
+    if (args->threads < 0) {
+        fprintf(stderr, COLOR_RED "[-] Invalid thread count\n" COLOR_RESET);
         return -1;
     }
     
+    return 0;
+}
+
+// 处理加密（流式，固定大小缓冲区）
+int handle_encrypt(const cmd_args_t *args) {
+    // 输出到标准输出时，提示信息改写到标准错误，避免混入密文
+    FILE *msg = strcmp(args->outfile, "-") == 0 ? stderr : stdout;
+    
     // 生成随机密钥
     unsigned char key[ZUC_KEY_SIZE];
     if (rand_bytes(key, ZUC_KEY_SIZE) != 1) {
         fprintf(stderr, COLOR_RED "[-] Failed to generate random ZUC key\n" COLOR_RESET);
-        free(in_data);
+        return -1;
+    }
+    
+    FILE *in = open_input(args->infile);
+    if (!in) {
+        return -1;
+    }
+    FILE *out = open_output(args->outfile);
+    if (!out) {
+        close_stream(in);
         return -1;
     }
     
     // 加密
-    unsigned char out_data[in_len];
     unsigned char iv[16] = {0}; // 固定 IV（全 0）
+    size_t total = 0;
     
     ZUC_STATE state;
     zuc_init(&state, key, iv);
-    zuc_encrypt(&state, in_data, in_len, out_data);
-    
-    // 写入输出文件
-    if (write_file(args->outfile, out_data, in_len) != 0) {
-        free(in_data);
+    int ret = zuc_crypt_stream(&state, in, out, NULL, NULL, &total);
+    close_stream(in);
+    close_stream(out);
+    if (ret != 0) {
         return -1;
     }
     
     // 保存密钥
     if (write_file("zuc.key", key, ZUC_KEY_SIZE) != 0) {
-        free(in_data);
         return -1;
     }
     
     // 输出结果
-    printf(COLOR_GREEN "[+] Encryption successful\n" COLOR_RESET);
-    printf(COLOR_YELLOW "[+] Encrypted file: %s\n" COLOR_RESET, args->outfile);
-    printf(COLOR_YELLOW "[+] Key saved to: zuc.key\n" COLOR_RESET);
+    fprintf(msg, COLOR_GREEN "[+] Encryption successful (%zu bytes)\n" COLOR_RESET, total);
+    fprintf(msg, COLOR_YELLOW "[+] Encrypted file: %s\n" COLOR_RESET, args->outfile);
+    fprintf(msg, COLOR_YELLOW "[+] Key saved to: zuc.key\n" COLOR_RESET);
     
-    free(in_data);
     return 0;
 }
 
-// 处理解密
+// 处理解密（流式，固定大小缓冲区）
 int handle_decrypt(const cmd_args_t *args) {
-    unsigned char *in_data = NULL;
-    size_t in_len = 0;
     unsigned char *key = NULL;
     size_t key_len = 0;
-    
-    // 读取输入文件
-    if (read_file(args->infile, &in_data, &in_len) != 0) {
-        return -1;
-    }
+    int to_stdout = strcmp(args->outfile, "-") == 0;
+    FILE *msg = to_stdout ? stderr : stdout;
     
     // 读取密钥文件
     if (read_file(args->keyfile, &key, &key_len) != 0 || key_len != ZUC_KEY_SIZE) {
         fprintf(stderr, COLOR_RED "[-] Invalid key file\n" COLOR_RESET);
-        free(in_data);
+        free(key);
+        return -1;
+    }
+    
+    FILE *in = open_input(args->infile);
+    if (!in) {
+        free(key);
+        return -1;
+    }
+    FILE *out = open_output(args->outfile);
+    if (!out) {
+        close_stream(in);
+        free(key);
         return -1;
     }
     
     // 解密
-    unsigned char out_data[in_len];
     unsigned char iv[16] = {0}; // 固定 IV（全 0）
+    unsigned char preview[PREVIEW_SIZE];
+    size_t preview_len = 0;
+    size_t total = 0;
     
     ZUC_STATE state;
     zuc_init(&state, key, iv);
-    zuc_encrypt(&state, in_data, in_len, out_data); // 解密
-    
-    // 写入输出文件
-    if (write_file(args->outfile, out_data, in_len) != 0) {
-        free(in_data);
-        free(key);
+    int ret = zuc_crypt_stream(&state, in, out, to_stdout ? NULL : preview, &preview_len, &total);
+    close_stream(in);
+    close_stream(out);
+    free(key);
+    if (ret != 0) {
         return -1;
     }
     
     // 输出结果
-    printf(COLOR_GREEN "[+] Decryption successful\n" COLOR_RESET);
-    printf(COLOR_YELLOW "[+] Decrypted file: %s\n" COLOR_RESET, args->outfile);
-    printf(COLOR_YELLOW "[+] Preview:\n" COLOR_RESET);
-    fwrite(out_data, 1, in_len < 512 ? in_len : 512, stdout);
-    printf("\n");
+    fprintf(msg, COLOR_GREEN "[+] Decryption successful (%zu bytes)\n" COLOR_RESET, total);
+    fprintf(msg, COLOR_YELLOW "[+] Decrypted file: %s\n" COLOR_RESET, args->outfile);
+    if (!to_stdout) {
+        printf(COLOR_YELLOW "[+] Preview:\n" COLOR_RESET);
+        fwrite(preview, 1, preview_len, stdout);
+        printf("\n");
+    }
     
-    free(in_data);
-    free(key);
     return 0;
 }
 
+// ---------------- 批量模式 ----------------
+// 一次进程处理多个文件：GmSSL 初始化和进程启动只付一次，文件在工作线程池中并行加解密。
+// 每个文件使用独立的随机密钥和 IV，写入索引文件（每行：key、iv、明文大小、明文路径、密文路径，以 TAB 分隔）
+
+// 单个文件的任务；src 为读取路径，dst 为写入路径
+typedef struct {
+    char *src;
+    char *dst;
+    char *plain;  // 索引中记录的明文路径
+    unsigned char key[ZUC_KEY_SIZE];
+    unsigned char iv[ZUC_IV_SIZE];
+    size_t size;
+    size_t expected;  // 解密时索引中记录的大小
+    int status;
+} batch_job_t;
+
+typedef struct {
+    batch_job_t *items;
+    size_t count;
+    size_t cap;
+} batch_list_t;
+
+#ifdef _WIN32
+typedef HANDLE batch_thread_t;
+typedef CRITICAL_SECTION batch_mutex_t;
+#define batch_mutex_init(m) InitializeCriticalSection(m)
+#define batch_mutex_lock(m) EnterCriticalSection(m)
+#define batch_mutex_unlock(m) LeaveCriticalSection(m)
+#define batch_mutex_destroy(m) DeleteCriticalSection(m)
+#define batch_mkdir(path) _mkdir(path)
+#else
+typedef pthread_t batch_thread_t;
+typedef pthread_mutex_t batch_mutex_t;
+#define batch_mutex_init(m) pthread_mutex_init(m, NULL)
+#define batch_mutex_lock(m) pthread_mutex_lock(m)
+#define batch_mutex_unlock(m) pthread_mutex_unlock(m)
+#define batch_mutex_destroy(m) pthread_mutex_destroy(m)
+#define batch_mkdir(path) mkdir(path, 0755)
+#endif
+
+// 工作线程共享的任务队列：每个线程取下一个未处理的下标
+typedef struct {
+    batch_list_t *list;
+    size_t next;
+    batch_mutex_t lock;
+} batch_queue_t;
+
+static char *batch_strdup(const char *s) {
+    size_t len = strlen(s) + 1;
+    char *copy = malloc(len);
+    if (copy) {
+        memcpy(copy, s, len);
+    }
+    return copy;
+}
+
+static const char *path_basename(const char *path) {
+    const char *base = path;
+    for (const char *p = path; *p; p++) {
+        if (*p == '/' || *p == '\\') {
+            base = p + 1;
+        }
+    }
+    return base;
+}
+
+static char *path_join(const char *dir, const char *name, const char *suffix) {
+    size_t dir_len = strlen(dir);
+    size_t len = dir_len + 1 + strlen(name) + strlen(suffix) + 1;
+    int sep = dir_len > 0 && dir[dir_len - 1] != '/' && dir[dir_len - 1] != '\\';
+    char *path = malloc(len);
+    if (path) {
+        snprintf(path, len, "%s%s%s%s", dir, sep ? "/" : "", name, suffix);
+    }
+    return path;
+}
+
+static batch_job_t *batch_add(batch_list_t *list, const char *src) {
+    if (list->count == list->cap) {
+        size_t cap = list->cap ? list->cap * 2 : 64;
+        batch_job_t *items = realloc(list->items, cap * sizeof(batch_job_t));
+        if (!items) {
+            return NULL;
+        }
+        list->items = items;
+        list->cap = cap;
+    }
+    batch_job_t *job = &list->items[list->count];
+    memset(job, 0, sizeof(batch_job_t));
+    if (!(job->src = batch_strdup(src))) {
+        return NULL;
+    }
+    list->count++;
+    return job;
+}
+
+static void batch_free(batch_list_t *list) {
+    for (size_t i = 0; i < list->count; i++) {
+        free(list->items[i].src);
+        free(list->items[i].dst);
+        free(list->items[i].plain);
+    }
+    free(list->items);
+    memset(list, 0, sizeof(batch_list_t));
+}
+
+static int batch_compare_src(const void *a, const void *b) {
+    return strcmp(((const batch_job_t *)a)->src, ((const batch_job_t *)b)->src);
+}
+
+// 收集目录下的普通文件（不递归），按路径排序
+static int batch_collect_dir(const char *dir, batch_list_t *list) {
+#ifdef _WIN32
+    WIN32_FIND_DATAA data;
+    char *pattern = path_join(dir, "*", "");
+    HANDLE find = pattern ? FindFirstFileA(pattern, &data) : INVALID_HANDLE_VALUE;
+    free(pattern);
+    if (find == INVALID_HANDLE_VALUE) {
+        fprintf(stderr, COLOR_RED "[-] Cannot open directory: %s\n" COLOR_RESET, dir);
+        return -1;
+    }
+    do {
+        if (data.dwFileAttributes & FILE_ATTRIBUTE_DIRECTORY) {
+            continue;
+        }
+        char *path = path_join(dir, data.cFileName, "");
+        if (!path || !batch_add(list, path)) {
+            free(path);
+            FindClose(find);
+            return -1;
+        }
+        free(path);
+    } while (FindNextFileA(find, &data));
+    FindClose(find);
+#else
+    DIR *d = opendir(dir);
+    struct dirent *entry;
+    if (!d) {
+        fprintf(stderr, COLOR_RED "[-] Cannot open directory: %s\n" COLOR_RESET, dir);
+        return -1;
+    }
+    while ((entry = readdir(d)) != NULL) {
+        struct stat st;
+        char *path = path_join(dir, entry->d_name, "");
+        if (!path) {
+            closedir(d);
+            return -1;
+        }
+        if (stat(path, &st) == 0 && S_ISREG(st.st_mode) && !batch_add(list, path)) {
+            free(path);
+            closedir(d);
+            return -1;
+        }
+        free(path);
+    }
+    closedir(d);
+#endif
+    qsort(list->items, list->count, sizeof(batch_job_t), batch_compare_src);
+    return 0;
+}
+
+// 收集清单文件中的路径：每行一个，忽略空行和 # 开头的注释
+static int batch_collect_manifest(const char *manifest, batch_list_t *list) {
+    char line[BATCH_PATH_MAX];
+    FILE *fp = fopen(manifest, "r");
+    if (!fp) {
+        fprintf(stderr, COLOR_RED "[-] Cannot open manifest: %s\n" COLOR_RESET, manifest);
+        return -1;
+    }
+    while (fgets(line, sizeof(line), fp)) {
+        size_t len = strlen(line);
+        while (len > 0 && (line[len - 1] == '\n' || line[len - 1] == '\r' || line[len - 1] == ' ')) {
+            line[--len] = '\0';
+        }
+        if (len == 0 || line[0] == '#') {
+            continue;
+        }
+        if (!batch_add(list, line)) {
+            fclose(fp);
+            return -1;
+        }
+    }
+    fclose(fp);
+    return 0;
+}
+
+// 输出目录不存在时创建
+static int batch_ensure_dir(const char *dir) {
+    struct stat st;
+    if (stat(dir, &st) == 0) {
+        if (!S_ISDIR(st.st_mode)) {
+            fprintf(stderr, COLOR_RED "[-] Not a directory: %s\n" COLOR_RESET, dir);
+            return -1;
+        }
+        return 0;
+    }
+    if (batch_mkdir(dir) != 0) {
+        fprintf(stderr, COLOR_RED "[-] Cannot create directory: %s\n" COLOR_RESET, dir);
+        return -1;
+    }
+    return 0;
+}
+
+static int batch_compare_str(const void *a, const void *b) {
+    return strcmp(*(char * const *)a, *(char * const *)b);
+}
+
+// 不同目录下的同名文件会写到同一个输出路径，提前拒绝
+static int batch_check_unique(const batch_list_t *list) {
+    int ret = 0;
+    char **paths = malloc((list->count ? list->count : 1) * sizeof(char *));
+    if (!paths) {
+        return -1;
+    }
+    for (size_t i = 0; i < list->count; i++) {
+        paths[i] = list->items[i].dst;
+    }
+    qsort(paths, list->count, sizeof(char *), batch_compare_str);
+    for (size_t i = 1; i < list->count; i++) {
+        if (strcmp(paths[i - 1], paths[i]) == 0) {
+            fprintf(stderr, COLOR_RED "[-] Duplicate output file: %s\n" COLOR_RESET, paths[i]);
+            ret = -1;
+            break;
+        }
+    }
+    free(paths);
+    return ret;
+}
+
+// 处理单个文件；ZUC 加解密是同一运算
+static void batch_process(batch_job_t *job) {
+    FILE *in = fopen(job->src, "rb");
+    if (!in) {
+        fprintf(stderr, COLOR_RED "[-] Cannot open file: %s\n" COLOR_RESET, job->src);
+        job->status = -1;
+        return;
+    }
+    FILE *out = fopen(job->dst, "wb");
+    if (!out) {
+        fprintf(stderr, COLOR_RED "[-] Cannot write file: %s\n" COLOR_RESET, job->dst);
+        fclose(in);
+        job->status = -1;
+        return;
+    }
+    
+    ZUC_STATE state;
+    zuc_init(&state, job->key, job->iv);
+    job->status = zuc_crypt_stream(&state, in, out, NULL, NULL, &job->size);
+    fclose(in);
+    if (fclose(out) != 0) {
+        job->status = -1;
+    }
+    if (job->status != 0) {
+        remove(job->dst);
+    }
+}
+
+static void batch_worker(batch_queue_t *queue) {
+    for (;;) {
+        batch_mutex_lock(&queue->lock);
+        size_t i = queue->next++;
+        batch_mutex_unlock(&queue->lock);
+        if (i >= queue->list->count) {
+            break;
+        }
+        batch_process(&queue->list->items[i]);
+    }
+}
+
+#ifdef _WIN32
+static DWORD WINAPI batch_thread_main(LPVOID arg) {
+    batch_worker((batch_queue_t *)arg);
+    return 0;
+}
+
+static int batch_thread_start(batch_thread_t *thread, batch_queue_t *queue) {
+    *thread = CreateThread(NULL, 0, batch_thread_main, queue, 0, NULL);
+    return *thread ? 0 : -1;
+}
+
+static void batch_thread_join(batch_thread_t thread) {
+    WaitForSingleObject(thread, INFINITE);
+    CloseHandle(thread);
+}
+
+static int batch_cpu_count(void) {
+    SYSTEM_INFO info;
+    GetSystemInfo(&info);
+    return info.dwNumberOfProcessors > 0 ? (int)info.dwNumberOfProcessors : 1;
+}
+#else
+static void *batch_thread_main(void *arg) {
+    batch_worker((batch_queue_t *)arg);
+    return NULL;
+}
+
+static int batch_thread_start(batch_thread_t *thread, batch_queue_t *queue) {
+    return pthread_create(thread, NULL, batch_thread_main, queue) == 0 ? 0 : -1;
+}
+
+static void batch_thread_join(batch_thread_t thread) {
+    pthread_join(thread, NULL);
+}
+
+static int batch_cpu_count(void) {
+    long n = sysconf(_SC_NPROCESSORS_ONLN);
+    return n > 0 ? (int)n : 1;
+}
+#endif
+
+// 用线程池处理全部任务，返回实际使用的线程数；threads 为 0 时取 CPU 核数
+static int batch_run(batch_list_t *list, int threads) {
+    batch_queue_t queue;
+    batch_thread_t tids[BATCH_MAX_THREADS];
+    int started = 0;
+    
+    if (threads <= 0) {
+        threads = batch_cpu_count();
+    }
+    if (threads > BATCH_MAX_THREADS) {
+        threads = BATCH_MAX_THREADS;
+    }
+    if ((size_t)threads > list->count) {
+        threads = list->count > 0 ? (int)list->count : 1;
+    }
+    
+    queue.list = list;
+    queue.next = 0;
+    batch_mutex_init(&queue.lock);
+    for (int i = 0; i < threads; i++) {
+        if (batch_thread_start(&tids[started], &queue) == 0) {
+            started++;
+        }
+    }
+    if (started == 0) {
+        // 无法创建线程时在当前线程处理
+        batch_worker(&queue);
+    }
+    for (int i = 0; i < started; i++) {
+        batch_thread_join(tids[i]);
+    }
+    batch_mutex_destroy(&queue.lock);
+    return started > 0 ? started : 1;
+}
+
+static void hex_write(FILE *fp, const unsigned char *data, size_t len) {
+    for (size_t i = 0; i < len; i++) {
+        fprintf(fp, "%02x", data[i]);
+    }
+}
+
+static int hex_parse(const char *hex, unsigned char *out, size_t len) {
+    if (strlen(hex) != len * 2) {
+        return -1;
+    }
+    for (size_t i = 0; i < len; i++) {
+        unsigned int byte;
+        if (sscanf(hex + i * 2, "%2x", &byte) != 1) {
+            return -1;
+        }
+        out[i] = (unsigned char)byte;
+    }
+    return 0;
+}
+
+// 处理批量加密
+int handle_encrypt_batch(const cmd_args_t *args) {
+    batch_list_t list = {0};
+    struct stat st;
+    size_t failed = 0, total = 0;
+    int ret = -1;
+    
+    if (stat(args->infile, &st) != 0) {
+        fprintf(stderr, COLOR_RED "[-] Cannot open file: %s\n" COLOR_RESET, args->infile);
+        return -1;
+    }
+    if ((S_ISDIR(st.st_mode) ? batch_collect_dir(args->infile, &list)
+                              : batch_collect_manifest(args->infile, &list)) != 0) {
+        goto end;
+    }
+    if (list.count == 0) {
+        fprintf(stderr, COLOR_RED "[-] No input files: %s\n" COLOR_RESET, args->infile);
+        goto end;
+    }
+    if (batch_ensure_dir(args->outfile) != 0) {
+        goto end;
+    }
+    
+    // 密钥和 IV 在主线程中生成，工作线程只做加密
+    for (size_t i = 0; i < list.count; i++) {
+        batch_job_t *job = &list.items[i];
+        job->plain = batch_strdup(job->src);
+        job->dst = path_join(args->outfile, path_basename(job->src), ".zuc");
+        if (!job->plain || !job->dst) {
+            fprintf(stderr, COLOR_RED "[-] Out of memory\n" COLOR_RESET);
+            goto end;
+        }
+        if (rand_bytes(job->key, ZUC_KEY_SIZE) != 1 || rand_bytes(job->iv, ZUC_IV_SIZE) != 1) {
+            fprintf(stderr, COLOR_RED "[-] Failed to generate random ZUC key\n" COLOR_RESET);
+            goto end;
+        }
+    }
+    if (batch_check_unique(&list) != 0) {
+        goto end;
+    }
+    
+    int threads = batch_run(&list, args->threads);
+    
+    // 索引只记录成功的文件
+    FILE *index = fopen(args->indexfile, "w");
+    if (!index) {
+        fprintf(stderr, COLOR_RED "[-] Cannot write file: %s\n" COLOR_RESET, args->indexfile);
+        goto end;
+    }
+    fprintf(index, "%s\n", BATCH_INDEX_HEADER);
+    for (size_t i = 0; i < list.count; i++) {
+        batch_job_t *job = &list.items[i];
+        if (job->status != 0) {
+            fprintf(stderr, COLOR_RED "[-] Failed: %s\n" COLOR_RESET, job->src);
+            failed++;
+            continue;
+        }
+        hex_write(index, job->key, ZUC_KEY_SIZE);
+        fputc('\t', index);
+        hex_write(index, job->iv, ZUC_IV_SIZE);
+        fprintf(index, "\t%zu\t%s\t%s\n", job->size, job->plain, job->dst);
+        total += job->size;
+    }
+    if (fclose(index) != 0) {
+        fprintf(stderr, COLOR_RED "[-] Write failed\n" COLOR_RESET);
+        goto end;
+    }
+    
+    printf(COLOR_GREEN "[+] Batch encryption: %zu/%zu files, %zu bytes, %d threads\n" COLOR_RESET,
+           list.count - failed, list.count, total, threads);
+    printf(COLOR_YELLOW "[+] Encrypted files: %s\n" COLOR_RESET, args->outfile);
+    printf(COLOR_YELLOW "[+] Keys saved to: %s\n" COLOR_RESET, args->indexfile);
+    ret = failed == 0 ? 0 : -1;
+    
+end:
+    batch_free(&list);
+    return ret;
+}
+
+// 读取索引文件；-in 指定时按文件名在该目录下查找密文，否则使用索引中记录的密文路径
+static int batch_load_index(const cmd_args_t *args, batch_list_t *list) {
+    char line[BATCH_PATH_MAX * 2 + 128];
+    size_t lineno = 0;
+    FILE *fp = fopen(args->indexfile, "r");
+    if (!fp) {
+        fprintf(stderr, COLOR_RED "[-] Cannot open file: %s\n" COLOR_RESET, args->indexfile);
+        return -1;
+    }
+    while (fgets(line, sizeof(line), fp)) {
+        lineno++;
+        line[strcspn(line, "\r\n")] = '\0';
+        if (line[0] == '\0' || line[0] == '#') {
+            continue;
+        }
+        
+        char *fields[5];
+        int n = 0;
+        char *p = line;
+        while (n < 5) {
+            fields[n++] = p;
+            p = strchr(p, '\t');
+            if (!p) {
+                break;
+            }
+            *p++ = '\0';
+        }
+        char *src = n == 5 && args->infile ? path_join(args->infile, path_basename(fields[4]), "") : NULL;
+        batch_job_t *job = n == 5 ? batch_add(list, args->infile ? (src ? src : "") : fields[4]) : NULL;
+        free(src);
+        if (!job || hex_parse(fields[0], job->key, ZUC_KEY_SIZE) != 0
+                 || hex_parse(fields[1], job->iv, ZUC_IV_SIZE) != 0) {
+            fprintf(stderr, COLOR_RED "[-] Invalid index line %zu: %s\n" COLOR_RESET, lineno, args->indexfile);
+            fclose(fp);
+            return -1;
+        }
+        job->expected = (size_t)strtoull(fields[2], NULL, 10);
+        job->plain = batch_strdup(fields[3]);
+        job->dst = path_join(args->outfile, path_basename(fields[3]), "");
+        if (!job->plain || !job->dst) {
+            fprintf(stderr, COLOR_RED "[-] Out of memory\n" COLOR_RESET);
+            fclose(fp);
+            return -1;
+        }
+    }
+    fclose(fp);
+    return 0;
+}
+
+// 处理批量解密
+int handle_decrypt_batch(const cmd_args_t *args) {
+    batch_list_t list = {0};
+    size_t failed = 0, total = 0;
+    int ret = -1;
+    
+    if (batch_load_index(args, &list) != 0) {
+        goto end;
+    }
+    if (list.count == 0) {
+        fprintf(stderr, COLOR_RED "[-] No entries in index: %s\n" COLOR_RESET, args->indexfile);
+        goto end;
+    }
+    if (batch_ensure_dir(args->outfile) != 0 || batch_check_unique(&list) != 0) {
+        goto end;
+    }
+    
+    int threads = batch_run(&list, args->threads);
+    
+    for (size_t i = 0; i < list.count; i++) {
+        batch_job_t *job = &list.items[i];
+        if (job->status == 0 && job->size != job->expected) {
+            fprintf(stderr, COLOR_RED "[-] Size mismatch: %s (%zu != %zu)\n" COLOR_RESET,
+                    job->src, job->size, job->expected);
+            job->status = -1;
+        }
+        if (job->status != 0) {
+            fprintf(stderr, COLOR_RED "[-] Failed: %s\n" COLOR_RESET, job->src);
+            failed++;
+            continue;
+        }
+        total += job->size;
+    }
+    
+    printf(COLOR_GREEN "[+] Batch decryption: %zu/%zu files, %zu bytes, %d threads\n" COLOR_RESET,
+           list.count - failed, list.count, total, threads);
+    printf(COLOR_YELLOW "[+] Decrypted files: %s\n" COLOR_RESET, args->outfile);
+    ret = failed == 0 ? 0 : -1;
+    
+end:
+    batch_free(&list);
+    return ret;
+}
+
 // 处理生成密钥对
 int handle_gen_keys(const cmd_args_t *args) {
     if (sm2_generate_keypair(args->privkey, args->pubkey) == 0) {
@@ -353,6 +1063,18 @@ int main(int argc, char **argv) {
             return 1;
         }
         
+    } else if (strcmp(mode, "encrypt-batch") == 0 || strcmp(mode, "decrypt-batch") == 0) {
+        int encrypt = strcmp(mode, "encrypt-batch") == 0;
+        
+        if (parse_batch_args(argc, argv, &args, encrypt) != 0) {
+            print_usage(argv[0]);
+            return 1;
+        }
+        
+        if ((encrypt ? handle_encrypt_batch(&args) : handle_decrypt_batch(&args)) != 0) {
+            return 1;
+        }
+        
     } else {
         fprintf(stderr, COLOR_RED "[-] Unknown mode: %s\n" COLOR_RESET, mode);
         print_usage(argv[0]);
@@ -0,0 +1,123 @@
+"""
+ZUC 加解密吞吐量基准测试
+
+测量 crypto.zuc 当前后端在 1KB–100MB 消息上的加密/解密耗时与 MB/s，
+并可对较小的消息对比旧的逐4字节拼接 + 逐字节异或实现。
+
+用法:
+    python -m crypto.bench
+    python -m crypto.bench --sizes 1K,1M --repeat 3
+    python -m crypto.bench --backend python --sizes 1K,64K
+    python -m crypto.bench --reselect
+    python -m crypto.bench --legacy-max 64K --output zuc_bench.json
+"""
+
+import argparse
+import json
+import os
+import time
+
+from hide.bench import format_size, parse_size
+
+from . import zuc
+
+DEFAULT_SIZES = ['1K', '10K', '100K', '1M', '10M', '100M']
+DEFAULT_LEGACY_MAX = '64K'
+
+
+def legacy_encrypt(key: bytes, iv: bytes, data: bytes) -> bytes:
+    """旧实现：密钥流逐4字节拼接，逐字节异或（仅用于对比）"""
+    import gmalg
+
+    g = gmalg.ZUC(key, iv)
+    stream = b''
+    while len(stream) < len(data):
+        stream += g.generate()
+    return bytes([a ^ b for a, b in zip(data, stream)])
+
+
+def _best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_size(size, repeat=1, legacy=False, backend=None):
+    backend = backend or zuc.get_backend()
+    crypt = zuc.BACKENDS[backend]
+    crypt_inplace = zuc.INPLACE_BACKENDS[backend]
+    key, iv = os.urandom(zuc.KEY_LEN), os.urandom(zuc.IV_LEN)
+    data = os.urandom(size)
+
+    encrypt_s, ciphertext = _best_time(lambda: crypt(key, iv, data), repeat)
+    decrypt_s, plaintext = _best_time(lambda: crypt(key, iv, ciphertext), repeat)
+    if plaintext != data:
+        raise RuntimeError(f"{format_size(size)} 解密结果与明文不一致")
+
+    # 原地加密：每次调用都在同一缓冲区上加密/解密交替进行
+    buf = bytearray(data)
+    inplace_s, _ = _best_time(lambda: crypt_inplace(key, iv, buf), repeat)
+    if buf != (ciphertext if repeat % 2 else data):
+        raise RuntimeError(f"{format_size(size)} 原地加密结果不一致")
+
+    mb = size / (1024 * 1024)
+    result = {
+        'size': size,
+        'encrypt_s': round(encrypt_s, 6),
+        'decrypt_s': round(decrypt_s, 6),
+        'encrypt_mb_s': round(mb / encrypt_s, 3) if encrypt_s else None,
+        'decrypt_mb_s': round(mb / decrypt_s, 3) if decrypt_s else None,
+        'inplace_s': round(inplace_s, 6),
+        'inplace_mb_s': round(mb / inplace_s, 3) if inplace_s else None,
+    }
+    if legacy:
+        legacy_s, legacy_ct = _best_time(lambda: legacy_encrypt(key, iv, data), 1)
+        if legacy_ct != ciphertext:
+            raise RuntimeError(f"{format_size(size)} 新旧实现密文不一致")
+        result['legacy_encrypt_s'] = round(legacy_s, 6)
+        result['legacy_mb_s'] = round(mb / legacy_s, 3) if legacy_s else None
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m crypto.bench', description='ZUC 加解密吞吐量基准测试')
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES), help='消息大小，如 1K,1M,100M')
+    parser.add_argument('--repeat', type=int, default=1, help='每个大小重复次数（取最优）')
+    parser.add_argument('--legacy-max', default=DEFAULT_LEGACY_MAX,
+                        help='不超过该大小时同时测量旧实现（0 表示不测）')
+    parser.add_argument('--backend', choices=sorted(zuc.BACKENDS), help='指定后端（默认使用自动选择的后端）')
+    parser.add_argument('--reselect', action='store_true', help='忽略缓存，重新测速选择后端')
+    parser.add_argument('--output', help='结果JSON路径')
+    args = parser.parse_args(argv)
+
+    if args.reselect:
+        zuc.select_backend(force=True)
+    info = zuc.backend_info()
+    backend = args.backend or info['backend']
+    print(f"[系统] ZUC 后端: {backend}（自动选择: {info['backend']}，来源: {info['source']}，"
+          f"可用: {', '.join(info['available'])}）")
+
+    legacy_max = parse_size(args.legacy_max)
+    results = []
+    print(f"{'大小':>8} {'加密MB/s':>10} {'解密MB/s':>10} {'原地MB/s':>10} {'旧实现MB/s':>12}")
+    for text in args.sizes.split(','):
+        size = parse_size(text)
+        result = run_size(size, args.repeat, legacy=0 < size <= legacy_max, backend=backend)
+        results.append(result)
+        legacy = result.get('legacy_mb_s')
+        print(f"{format_size(size):>8} {result['encrypt_mb_s']:>10} {result['decrypt_mb_s']:>10} {result['inplace_mb_s']:>10} "
+              f"{legacy if legacy is not None else '-':>12}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'backend': backend, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"[系统] 结果已保存: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
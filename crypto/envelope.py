@@ -0,0 +1,114 @@
+"""
+二进制密文信封
+
+替代 iv.hex() + ':' + ciphertext.hex() 字符串：隐写载体直接嵌入二进制信封，
+文本消息用 base64 传输，每个密文字节在载体中只占1字节（base64 约1.33字节），
+而不是十六进制的2字节。
+
+信封格式（大端）:
+    MAGIC(1) | 版本(1) | 标志(1) | IV(16) | 密文长度(4) | 密文 | [MAC(16)]
+
+标志 FLAG_MAC 置位时附带 HMAC-SHA256 截断到16字节的校验值，覆盖信封头和密文；
+MAC 密钥由会话密钥派生，与加密密钥分开。解密默认要求 MAC（require_mac=True），
+否则攻击者清除标志位并截掉校验值、或把信封改写成旧的 'iv:ct' 格式即可篡改密文；
+只有调用方显式传 require_mac=False 时才接受不带 MAC 的信封和旧格式。
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import struct
+
+from . import keystream_pool, zuc
+
+MAGIC = 0xE5
+VERSION = 1
+FLAG_MAC = 0x01
+HEADER = struct.Struct('>BBB16sI')
+MAC_LEN = 16
+
+
+def _mac_key(key: bytes) -> bytes:
+    return hmac.new(key, b'e2e-envelope-mac', hashlib.sha256).digest()
+
+
+def _mac(key: bytes, data) -> bytes:
+    return hmac.new(_mac_key(key), data, hashlib.sha256).digest()[:MAC_LEN]
+
+
+def is_envelope(data) -> bool:
+    return isinstance(data, (bytes, bytearray, memoryview)) and len(data) >= HEADER.size and data[0] == MAGIC
+
+
+def seal(session_key, data: bytes, mac=True) -> bytes:
+    """加密 data 并封装为二进制信封"""
+    key = zuc.session_key_bytes(session_key)
+    # 短消息优先使用后台预计算的密钥流，只需异或
+    pooled = keystream_pool.take(key, len(data))
+    if pooled:
+        iv, keystream = pooled
+        body = bytearray(HEADER.pack(MAGIC, VERSION, FLAG_MAC if mac else 0, iv, len(data)))
+        body += zuc.xor_bytes(data, keystream)
+    else:
+        iv = os.urandom(zuc.IV_LEN)
+        body = bytearray(HEADER.pack(MAGIC, VERSION, FLAG_MAC if mac else 0, iv, len(data)))
+        body += data
+        zuc.zuc_crypt_inplace(key, iv, memoryview(body)[HEADER.size:])
+    if mac:
+        body += _mac(key, body)
+    return bytes(body)
+
+
+def open_envelope(session_key, blob, require_mac=True) -> bytes:
+    """校验并解密二进制信封，失败或缺少 MAC 时抛出 ValueError"""
+    if not is_envelope(blob):
+        raise ValueError("不是有效的密文信封")
+    _, version, flags, iv, length = HEADER.unpack_from(blob)
+    if version != VERSION:
+        raise ValueError(f"不支持的信封版本: {version}")
+    if require_mac and not flags & FLAG_MAC:
+        raise ValueError("密文信封缺少校验值")
+    end = HEADER.size + length
+    expected = end + (MAC_LEN if flags & FLAG_MAC else 0)
+    if len(blob) < expected:
+        raise ValueError("密文信封长度不完整")
+
+    key = zuc.session_key_bytes(session_key)
+    if flags & FLAG_MAC and not hmac.compare_digest(_mac(key, blob[:end]), bytes(blob[end:expected])):
+        raise ValueError("密文信封校验失败")
+    plaintext = bytearray(blob[HEADER.size:end])
+    zuc.zuc_crypt_inplace(key, iv, plaintext)
+    return bytes(plaintext)
+
+
+def encrypt_text(session_key, plaintext: str, mac=True) -> str:
+    """加密文本消息，返回 base64 编码的信封（用于 JSON 消息）"""
+    return base64.b64encode(seal(session_key, plaintext.encode(), mac)).decode('ascii')
+
+
+def _is_legacy(text: str) -> bool:
+    iv_hex, sep, _ = text.partition(':')
+    return bool(sep) and len(iv_hex) == zuc.IV_LEN * 2
+
+
+def open_any(session_key, payload, require_mac=True) -> bytes:
+    """
+    解密任意格式的密文，返回明文字节串：
+    二进制信封、base64 编码的信封，以及旧的 'iv:ct' 十六进制格式（str 或 bytes）。
+    旧格式没有校验值，只在 require_mac=False 时接受
+    """
+    if is_envelope(payload):
+        return open_envelope(session_key, payload, require_mac)
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        payload = bytes(payload).decode('ascii')
+    if _is_legacy(payload):
+        if require_mac:
+            raise ValueError("旧格式密文没有校验值，已拒绝")
+        return zuc.decrypt_bytes(session_key, payload)
+    return open_envelope(session_key, base64.b64decode(payload, validate=True), require_mac)
+
+
+def decrypt_text(session_key, payload, require_mac=True) -> str:
+    """解密任意格式的密文为文本"""
+    return open_any(session_key, payload, require_mac).decode()
@@ -0,0 +1,105 @@
+"""
+临时 SM2 密钥对池
+
+建立或更新会话时不再在收到 key_exchange / rekey 之后才生成密钥：后台线程预先生成
+若干临时密钥对（每对一次固定基标量乘，见 sm2_ec），关键路径上只剩一次 ECDH 标量乘。
+
+    - 每个临时密钥对只取用一次，取走后后台自动补充
+    - 池空时当场生成（固定基表下约 1 毫秒），不会阻塞等待后台线程
+    - 会话建立时默认仍使用 keys/ 下的长期密钥对；设置环境变量 E2E_EPHEMERAL_SM2=1
+      后改用临时密钥对。rekey 消息始终使用临时密钥对
+"""
+
+import atexit
+import os
+import threading
+from collections import deque
+
+from . import sm2_ec
+
+EPHEMERAL_ENV = 'E2E_EPHEMERAL_SM2'
+DEFAULT_POOL_SIZE = 4
+
+
+class EphemeralKeyPool:
+    """后台预生成的临时 SM2 密钥对池"""
+
+    def __init__(self, size=DEFAULT_POOL_SIZE):
+        self.size = size
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._fill_loop, name='sm2-ephemeral-pool', daemon=True)
+        self._thread.start()
+
+    def _fill_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and len(self._items) >= self.size:
+                    self._cond.wait()
+                if self._closed:
+                    return
+            keypair = sm2_ec.generate_keypair()
+            with self._cond:
+                if self._closed:
+                    return
+                self._items.append(keypair)
+                self._cond.notify_all()
+
+    def take(self):
+        """取一对 (私钥, 公钥)；池空时当场生成"""
+        with self._cond:
+            if self._items:
+                keypair = self._items.popleft()
+                self._cond.notify_all()
+                return keypair
+        return sm2_ec.generate_keypair()
+
+    def wait_ready(self, count=1, timeout=None):
+        """等待池中至少有 count 对（测试和预热用）"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._closed or len(self._items) >= count, timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._items.clear()
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+_pool = None
+_lock = threading.Lock()
+
+
+def enabled():
+    """会话建立时是否使用临时密钥对（默认关闭）"""
+    return os.environ.get(EPHEMERAL_ENV, '0') in ('1', 'true', 'yes')
+
+
+def get_pool():
+    """进程内共享的临时密钥对池，首次调用时启动后台填充"""
+    global _pool
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                _pool = EphemeralKeyPool()
+    return _pool
+
+
+def take():
+    return get_pool().take()
+
+
+def shutdown():
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool:
+        pool.close()
+
+
+atexit.register(shutdown)
@@ -0,0 +1,234 @@
+"""
+会话密钥库
+
+所有客户端共用一个进程内密钥库：
+    - 会话密钥保存在 session_keys/index.json 一个索引文件中（{用户A: {用户B: 十六进制密钥}}，
+      A < B），写入时先写临时文件再 os.replace，保证原子性，适合上千个对端；
+      多个客户端进程共用同一目录时，写入前在文件锁（index.lock）内重新读取并合并磁盘上的索引，
+      不会互相覆盖对方新增的条目
+    - 内存中缓存解析好的16字节 ZUC 密钥，逐条消息加解密不再读盘、不再解析十六进制；
+      解析后即为该密钥启动后台密钥流池（见 keystream_pool），密钥更换时清空
+    - 旧版 session_keys/{a}_{b}_session.key 文件在首次查询时自动迁移进索引
+    - SM2 密钥对仍保存在 keys/{用户名}_priv.hex / _pub.hex（与C工具兼容），读取一次后缓存
+"""
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+
+from . import keystream_pool, sm2_ec
+from .zuc import KEY_LEN
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+INDEX_VERSION = 1
+
+
+def _pair(me, peer):
+    return tuple(sorted([me, peer]))
+
+
+@contextlib.contextmanager
+def _file_lock(path):
+    """跨进程排他文件锁（POSIX 用 fcntl.flock，Windows 用 msvcrt.locking）"""
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class KeyStore:
+    """会话密钥与 SM2 密钥对的缓存和持久化"""
+
+    def __init__(self, base_dir=PROJECT_ROOT):
+        self.key_dir = os.path.join(base_dir, 'keys')
+        self.session_dir = os.path.join(base_dir, 'session_keys')
+        self.index_path = os.path.join(self.session_dir, 'index.json')
+        self.lock_path = os.path.join(self.session_dir, 'index.lock')
+        self._sessions = None     # {(a, b): 十六进制会话密钥}，首次使用时加载
+        self._key_bytes = {}      # {(a, b): 16字节 ZUC 密钥}
+        self._keypairs = {}       # {用户名: (私钥, 公钥)}
+        self._missing = set()     # 没有旧版密钥文件的会话，查找不到密钥时不再重复访问磁盘
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # 会话密钥
+    # ------------------------------------------------------------------
+
+    def legacy_session_path(self, me, peer):
+        a, b = _pair(me, peer)
+        return os.path.join(self.session_dir, f"{a}_{b}_session.key")
+
+    def _read_index(self):
+        """读取磁盘上的索引，返回 {(a, b): 十六进制会话密钥}"""
+        sessions = {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            for a, peers in index.get('sessions', {}).items():
+                for b, session_key in peers.items():
+                    sessions[(a, b)] = session_key
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"[警告] 会话密钥索引读取失败，将重新建立: {e}")
+        return sessions
+
+    def _load_index(self):
+        if self._sessions is None:
+            self._sessions = self._read_index()
+        return self._sessions
+
+    def _update_index(self, pair, session_key):
+        """在文件锁内合并磁盘上的索引（其他进程写入的条目优先），写入 pair 后原子替换"""
+        os.makedirs(self.session_dir, exist_ok=True)
+        with _file_lock(self.lock_path):
+            sessions = self._load_index()
+            for other, value in self._read_index().items():
+                if sessions.get(other) != value:
+                    sessions[other] = value
+                    self._forget(other)
+            sessions[pair] = session_key
+            self._save_index()
+
+    def _save_index(self):
+        index = {}
+        for (a, b), session_key in self._sessions.items():
+            index.setdefault(a, {})[b] = session_key
+        os.makedirs(self.session_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.session_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'sessions': index}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.index_path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _migrate_legacy(self, pair):
+        """从旧版单文件迁移会话密钥，找不到时返回 None"""
+        if pair in self._missing:
+            return None
+        path = self.legacy_session_path(*pair)
+        if not os.path.exists(path):
+            self._missing.add(pair)
+            return None
+        with open(path, 'r') as f:
+            session_key = f.read().strip()
+        self._update_index(pair, session_key)
+        print(f"[系统] 已迁移旧版会话密钥: {path}")
+        return session_key
+
+    def get_session_key(self, me, peer):
+        """返回十六进制会话密钥，不存在时返回 None"""
+        pair = _pair(me, peer)
+        with self._lock:
+            sessions = self._load_index()
+            session_key = sessions.get(pair)
+            if session_key is None:
+                session_key = self._migrate_legacy(pair)
+            return session_key
+
+    def get_session_key_bytes(self, me, peer):
+        """返回解析好的16字节 ZUC 密钥（内存缓存），不存在时返回 None"""
+        pair = _pair(me, peer)
+        key = self._key_bytes.get(pair)
+        if key is not None:
+            return key
+        # 读盘与填充缓存都在锁内，避免并发的 set_session_key 失效后旧密钥又被写回缓存
+        with self._lock:
+            key = self._key_bytes.get(pair)
+            if key is not None:
+                return key
+            session_key = self.get_session_key(me, peer)
+            if session_key is None:
+                return None
+            key = bytes.fromhex(session_key[:KEY_LEN * 2])
+            self._key_bytes[pair] = key
+            # 会话可用后即开始在后台预计算密钥流
+            keystream_pool.warm(key)
+            return key
+
+    def set_session_key(self, me, peer, session_key):
+        """保存会话密钥（原子写入索引文件）并刷新缓存"""
+        pair = _pair(me, peer)
+        with self._lock:
+            self.invalidate(me, peer)
+            self._missing.discard(pair)
+            self._update_index(pair, session_key)
+
+    def invalidate(self, me, peer):
+        """丢弃该会话的已解析密钥缓存和预计算密钥流（密钥交换或会话结束时调用）"""
+        with self._lock:
+            self._forget(_pair(me, peer))
+
+    def _forget(self, pair):
+        key = self._key_bytes.pop(pair, None)
+        if key is not None:
+            keystream_pool.discard(key)
+
+    def session_count(self):
+        with self._lock:
+            return len(self._load_index())
+
+    # ------------------------------------------------------------------
+    # SM2 密钥对
+    # ------------------------------------------------------------------
+
+    def ensure_keypair(self, username):
+        """返回 (私钥, 公钥) 十六进制字符串，不存在时生成并保存；读取一次后缓存"""
+        keypair = self._keypairs.get(username)
+        if keypair is not None:
+            return keypair
+        with self._lock:
+            if username in self._keypairs:
+                return self._keypairs[username]
+            os.makedirs(self.key_dir, exist_ok=True)
+            priv_path = os.path.join(self.key_dir, f"{username}_priv.hex")
+            pub_path = os.path.join(self.key_dir, f"{username}_pub.hex")
+
+            if not (os.path.exists(priv_path) and os.path.exists(pub_path)):
+                private_key, public_key = sm2_ec.generate_keypair()
+                with open(priv_path, 'w') as f:
+                    f.write(private_key)
+                with open(pub_path, 'w') as f:
+                    f.write(public_key)
+                print(f"[系统] 已为 {username} 生成SM2密钥对")
+            else:
+                print(f"[系统] 已加载 {username} 的SM2密钥对")
+
+            with open(priv_path, 'r') as f:
+                priv = f.read()
+            with open(pub_path, 'r') as f:
+                pub = f.read()
+            self._keypairs[username] = (priv, pub)
+            return priv, pub
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_keystore():
+    """进程内共享的默认密钥库（项目根目录下的 keys/ 与 session_keys/）"""
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = KeyStore()
+    return _default_store
@@ -0,0 +1,141 @@
+"""
+后台预计算的 ZUC 密钥流池
+
+短聊天消息的延迟主要花在 ZUC 初始化（32轮）和密钥流生成上。每个会话密钥
+维护一个小池子，后台线程在用户输入期间预先生成 (IV, 密钥流) 对，加密时只需异或。
+
+    - 每个 (IV, 密钥流) 只会被取走一次，取走后即从池中删除
+    - 密钥更换或会话结束时调用 discard()：池被清空并关闭，
+      正在生成中的结果通过代数计数器识别后直接丢弃
+    - 设置环境变量 E2E_KEYSTREAM_POOL=0 可关闭
+"""
+
+import atexit
+import os
+import threading
+from collections import deque
+
+from . import zuc
+
+POOL_ENV = 'E2E_KEYSTREAM_POOL'
+DEFAULT_POOL_SIZE = 8
+DEFAULT_LENGTH = 4096  # 每条预计算密钥流的长度，超过此长度的消息直接现场加密
+
+
+class KeystreamPool:
+    """单个会话密钥的密钥流池"""
+
+    def __init__(self, key: bytes, size=DEFAULT_POOL_SIZE, length=DEFAULT_LENGTH):
+        self.key = bytes(key)
+        self.size = size
+        self.length = length
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._fill_loop, name='zuc-keystream-pool', daemon=True)
+        self._thread.start()
+
+    def _fill_loop(self):
+        while True:
+            with self._cond:
+                while not self._closed and len(self._items) >= self.size:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                generation = self._generation
+
+            iv = os.urandom(zuc.IV_LEN)
+            keystream = zuc.zuc_crypt(self.key, iv, bytes(self.length))
+
+            with self._cond:
+                if self._closed:
+                    return
+                # 生成期间发生过 drain 的结果作废
+                if generation == self._generation:
+                    self._items.append((iv, keystream))
+                    self._cond.notify_all()
+
+    def take(self, length):
+        """取一对 (IV, 密钥流)；池空或消息过长时返回 None，由调用方现场加密"""
+        if length > self.length:
+            return None
+        with self._cond:
+            if self._closed or not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+        return item
+
+    def wait_ready(self, count=1, timeout=None):
+        """等待池中至少有 count 对（测试和预热用）"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._closed or len(self._items) >= count, timeout)
+
+    def drain(self):
+        """清空池并作废正在生成的结果，之后继续填充"""
+        with self._cond:
+            self._generation += 1
+            self._items.clear()
+            self._cond.notify_all()
+
+    def close(self):
+        """清空并停止后台线程"""
+        with self._cond:
+            self._closed = True
+            self._generation += 1
+            self._items.clear()
+            self._cond.notify_all()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+# ---------------------------------------------------------------------------
+# 按会话密钥管理的池
+# ---------------------------------------------------------------------------
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def enabled():
+    return os.environ.get(POOL_ENV, '1') not in ('0', 'false', 'no')
+
+
+def warm(key: bytes):
+    """为会话密钥创建（或返回已有的）密钥流池，后台开始填充"""
+    if not enabled():
+        return None
+    key = bytes(key)
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = KeystreamPool(key)
+        return pool
+
+
+def take(key: bytes, length):
+    """取一对预计算的 (IV, 密钥流)；该密钥没有池或池已空时返回 None"""
+    pool = _pools.get(bytes(key))
+    return pool.take(length) if pool else None
+
+
+def discard(key: bytes):
+    """密钥更换或会话结束：清空并关闭该密钥的池"""
+    with _lock:
+        pool = _pools.pop(bytes(key), None)
+    if pool:
+        pool.close()
+
+
+def shutdown():
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(shutdown)
@@ -0,0 +1,316 @@
+"""
+进程内 ZUC 性能测试套件
+
+取代 test/test_perf.py 中逐个 subprocess 调用 e2e-tool 的计时方式（小消息时测到的主要是
+fork/exec 和文件读写）。每个实现、每个大小先预热若干次再重复采样，报告
+最小/平均/p50/p95/p99 耗时和按 p50 计算的 MB/s，可输出 JSON/CSV，并与基线文件比较。
+
+参与对比的实现:
+    gmalg   gmalg.ZUC 逐4字节生成密钥流（旧实现）
+    python  crypto.zuc 纯 Python 后端
+    gmssl   GmSSL ctypes 后端（与 e2e-tool 相同的 zuc_init/zuc_encrypt，进程内调用）
+    cli     e2e-tool 子进程，数据经标准输入/输出管道传输（含进程启动，仅作端到端参考；E2E_TOOL 指定路径）
+    cli-batch  e2e-tool encrypt-batch/decrypt-batch，一次调用处理 BATCH_FILES 个文件，按平均每个文件计时
+
+用法:
+    python -m crypto.perf
+    python -m crypto.perf --sizes 16,1K,64K,1M --repeat 50 --warmup 5
+    python -m crypto.perf --impl gmssl,cli --json perf.json --csv perf.csv
+    python -m crypto.perf --baseline perf.json --threshold 0.2
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+from hide.bench import format_size, parse_size
+
+from . import zuc, zuc_ctypes
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+TOOL_ENV = 'E2E_TOOL'
+
+DEFAULT_SIZES = ['16', '256', '4K', '64K', '1M', '4M']
+DEFAULT_IMPLS = ['gmalg', 'python', 'gmssl', 'cli', 'cli-batch']
+DEFAULT_WARMUP = 3
+DEFAULT_REPEAT = 20
+DEFAULT_SLOW_MAX = '64K'   # gmalg / python 只测不超过该大小的消息
+DEFAULT_THRESHOLD = 0.10   # 相对基线 p50 变慢超过该比例视为回退
+SLOW_IMPLS = ('gmalg', 'python')
+BATCH_FILES = 32           # cli-batch 每次调用处理的文件数
+PERCENTILES = (50, 95, 99)
+CSV_FIELDS = ['impl', 'op', 'size', 'samples', 'min_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'mb_s']
+
+
+# ---------------------------------------------------------------------------
+# 统计
+# ---------------------------------------------------------------------------
+
+def percentile(samples, p):
+    """最近秩百分位数"""
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples, size):
+    """耗时样本（秒）汇总为毫秒统计和 MB/s（按 p50）"""
+    p50 = percentile(samples, 50)
+    result = {
+        'samples': len(samples),
+        'min_ms': round(min(samples) * 1000, 6),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 6),
+    }
+    for p in PERCENTILES:
+        result[f'p{p}_ms'] = round(percentile(samples, p) * 1000, 6)
+    result['mb_s'] = round(size / (1024 * 1024) / p50, 3) if p50 > 0 else None
+    return result
+
+
+def measure(func, warmup=DEFAULT_WARMUP, repeat=DEFAULT_REPEAT):
+    """预热 warmup 次后采样 repeat 次，返回 (各次耗时秒列表, 最后一次返回值)"""
+    result = None
+    for _ in range(warmup):
+        result = func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return samples, result
+
+
+# ---------------------------------------------------------------------------
+# 实现
+# ---------------------------------------------------------------------------
+
+def find_tool():
+    """e2e-tool 路径，找不到时返回 None"""
+    candidates = [os.environ.get(TOOL_ENV), os.path.join(PROJECT_ROOT, 'e2e-tool'),
+                  os.path.join(PROJECT_ROOT, 'build', 'e2e-tool'), shutil.which('e2e-tool')]
+    for path in candidates:
+        if path and os.path.isfile(path) and os.access(path, os.X_OK):
+            return os.path.abspath(path)
+    return None
+
+
+def _gmalg_crypt(key, iv, data):
+    from .bench import legacy_encrypt
+    return legacy_encrypt(key, iv, data)
+
+
+IN_PROCESS = {
+    'gmalg': _gmalg_crypt,
+    'python': zuc.python_crypt,
+    'gmssl': zuc.gmssl_crypt,
+}
+
+
+def available_impls():
+    names = []
+    try:
+        import gmalg  # noqa: F401
+        names.append('gmalg')
+    except ImportError:
+        pass
+    names.append('python')
+    if zuc_ctypes.available():
+        names.append('gmssl')
+    if find_tool():
+        names.extend(['cli', 'cli-batch'])
+    return names
+
+
+def _bench_in_process(name, size, warmup, repeat):
+    crypt = IN_PROCESS[name]
+    key, iv = os.urandom(zuc.KEY_LEN), os.urandom(zuc.IV_LEN)
+    data = os.urandom(size)
+    encrypt_samples, ciphertext = measure(lambda: crypt(key, iv, data), warmup, repeat)
+    decrypt_samples, plaintext = measure(lambda: crypt(key, iv, ciphertext), warmup, repeat)
+    if plaintext != data:
+        raise RuntimeError(f"{name} {format_size(size)} 解密结果与明文不一致")
+    return {'encrypt': encrypt_samples, 'decrypt': decrypt_samples}
+
+
+def _bench_cli(size, warmup, repeat):
+    """e2e-tool 子进程计时，明文/密文经管道传输；工具会把随机密钥写到当前目录的 zuc.key，因此在临时目录中运行"""
+    tool = find_tool()
+    data = os.urandom(size)
+    with tempfile.TemporaryDirectory() as tmp:
+        def run(*args, stdin):
+            return subprocess.run([tool, *args, '-in', '-', '-out', '-'], input=stdin, cwd=tmp, check=True,
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout
+
+        encrypt_samples, ciphertext = measure(lambda: run('encrypt', stdin=data), warmup, repeat)
+        key_path = os.path.join(tmp, 'zuc.key')
+        decrypt_samples, plaintext = measure(lambda: run('decrypt', '-key', key_path, stdin=ciphertext),
+                                             warmup, repeat)
+        if plaintext != data:
+            raise RuntimeError(f"cli {format_size(size)} 解密结果与明文不一致")
+    return {'encrypt': encrypt_samples, 'decrypt': decrypt_samples}
+
+
+def _bench_cli_batch(size, warmup, repeat, files=BATCH_FILES):
+    """e2e-tool 批量模式计时：一次调用加解密 files 个文件（进程启动只付一次），样本为平均每个文件的耗时"""
+    tool = find_tool()
+    with tempfile.TemporaryDirectory() as tmp:
+        plain_dir, cipher_dir, out_dir = (os.path.join(tmp, name) for name in ('plain', 'cipher', 'out'))
+        index = os.path.join(tmp, 'index.txt')
+        os.mkdir(plain_dir)
+        data = {f'{i:04d}.bin': os.urandom(size) for i in range(files)}
+        for name, content in data.items():
+            with open(os.path.join(plain_dir, name), 'wb') as f:
+                f.write(content)
+
+        def run(*args):
+            subprocess.run([tool, *args], cwd=tmp, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        encrypt_samples, _ = measure(lambda: run('encrypt-batch', '-in', plain_dir, '-out', cipher_dir,
+                                                 '-index', index), warmup, repeat)
+        decrypt_samples, _ = measure(lambda: run('decrypt-batch', '-index', index, '-out', out_dir),
+                                     warmup, repeat)
+        for name, content in data.items():
+            with open(os.path.join(out_dir, name), 'rb') as f:
+                if f.read() != content:
+                    raise RuntimeError(f"cli-batch {format_size(size)} 解密结果与明文不一致: {name}")
+    return {'encrypt': [s / files for s in encrypt_samples], 'decrypt': [s / files for s in decrypt_samples]}
+
+
+def run_suite(sizes, impls=None, warmup=DEFAULT_WARMUP, repeat=DEFAULT_REPEAT, slow_max=None, log=print):
+    """运行测试，返回结果行列表：{impl, op, size, samples, min_ms, ..., mb_s}"""
+    available = available_impls()
+    impls = [name for name in (impls or DEFAULT_IMPLS) if name in available]
+    slow_max = parse_size(DEFAULT_SLOW_MAX) if slow_max is None else slow_max
+    rows = []
+    for name in impls:
+        for size in sizes:
+            if name in SLOW_IMPLS and slow_max and size > slow_max:
+                continue
+            if name == 'cli':
+                samples = _bench_cli(size, warmup, repeat)
+            elif name == 'cli-batch':
+                samples = _bench_cli_batch(size, warmup, repeat)
+            else:
+                samples = _bench_in_process(name, size, warmup, repeat)
+            for op, op_samples in samples.items():
+                row = {'impl': name, 'op': op, 'size': size}
+                row.update(summarize(op_samples, size))
+                rows.append(row)
+                if log:
+                    log(f"{name:>9} {op:>8} {format_size(size):>8} p50 {row['p50_ms']:>10.4f} ms  "
+                        f"p95 {row['p95_ms']:>10.4f} ms  p99 {row['p99_ms']:>10.4f} ms  {row['mb_s']:>10} MB/s")
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# 输出与基线比较
+# ---------------------------------------------------------------------------
+
+def write_json(path, rows, meta=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta or {}, 'results': rows}, f, ensure_ascii=False, indent=2)
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def load_results(path):
+    """读取 JSON 或 CSV 结果文件"""
+    if path.endswith('.csv'):
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            row['size'] = int(row['size'])
+            for field in CSV_FIELDS[3:]:
+                row[field] = float(row[field]) if row[field] not in ('', None) else None
+        return rows
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+def compare(rows, baseline_rows, threshold=DEFAULT_THRESHOLD):
+    """
+    按 (实现, 操作, 大小) 对比 p50，返回比较结果列表；
+    ratio = 当前 p50 / 基线 p50，大于 1 + threshold 时标记为回退
+    """
+    baseline = {(r['impl'], r['op'], int(r['size'])): r for r in baseline_rows}
+    comparisons = []
+    for row in rows:
+        base = baseline.get((row['impl'], row['op'], row['size']))
+        if not base or not base.get('p50_ms'):
+            continue
+        ratio = row['p50_ms'] / base['p50_ms']
+        comparisons.append({
+            'impl': row['impl'], 'op': row['op'], 'size': row['size'],
+            'baseline_p50_ms': base['p50_ms'], 'p50_ms': row['p50_ms'],
+            'ratio': round(ratio, 3), 'regression': ratio > 1 + threshold,
+        })
+    return comparisons
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m crypto.perf', description='进程内 ZUC 性能测试套件')
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES), help='消息大小，如 16,4K,1M')
+    parser.add_argument('--impl', default=','.join(DEFAULT_IMPLS),
+                        help=f"参与对比的实现（逗号分隔）: {', '.join(DEFAULT_IMPLS)}")
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP, help='每项预热次数')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='每项采样次数')
+    parser.add_argument('--slow-max', default=DEFAULT_SLOW_MAX,
+                        help='gmalg/python 只测不超过该大小的消息（0 表示不限制）')
+    parser.add_argument('--json', help='结果JSON路径')
+    parser.add_argument('--csv', help='结果CSV路径')
+    parser.add_argument('--baseline', help='基线结果文件（JSON 或 CSV）')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='p50 回退判定阈值（比例）')
+    args = parser.parse_args(argv)
+
+    impls = [name.strip() for name in args.impl.split(',') if name.strip()]
+    unknown = set(impls) - set(DEFAULT_IMPLS)
+    if unknown:
+        parser.error(f"未知实现: {', '.join(sorted(unknown))}")
+    available = available_impls()
+    skipped = [name for name in impls if name not in available]
+    if skipped:
+        print(f"[警告] 以下实现不可用，已跳过: {', '.join(skipped)}")
+    if args.repeat < 1:
+        parser.error("--repeat 至少为 1")
+
+    sizes = [parse_size(text) for text in args.sizes.split(',')]
+    print(f"[系统] 预热 {args.warmup} 次，采样 {args.repeat} 次")
+    rows = run_suite(sizes, impls, args.warmup, args.repeat, parse_size(args.slow_max))
+
+    meta = {'warmup': args.warmup, 'repeat': args.repeat, 'impls': [n for n in impls if n in available],
+            'gmssl_lib': zuc_ctypes.LIB_PATH, 'cli': find_tool()}
+    if args.json:
+        write_json(args.json, rows, meta)
+        print(f"[系统] JSON 结果已保存: {args.json}")
+    if args.csv:
+        write_csv(args.csv, rows)
+        print(f"[系统] CSV 结果已保存: {args.csv}")
+
+    if args.baseline:
+        comparisons = compare(rows, load_results(args.baseline), args.threshold)
+        regressions = [c for c in comparisons if c['regression']]
+        print(f"\n[系统] 与基线比较（{args.baseline}，阈值 {args.threshold:.0%}）")
+        for c in comparisons:
+            mark = '回退' if c['regression'] else ''
+            print(f"{c['impl']:>7} {c['op']:>8} {format_size(c['size']):>8} "
+                  f"{c['baseline_p50_ms']:>10.4f} -> {c['p50_ms']:>10.4f} ms  x{c['ratio']:<6} {mark}")
+        if regressions:
+            print(f"[警告] {len(regressions)} 项相对基线变慢超过 {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,98 @@
+"""
+SM2 标量乘基准测试
+
+对比 gmssl CryptSM2._kg、crypto.sm2_ec 纯 Python 引擎和原生动态库（sm2_native，找到时）
+在密钥生成（k*G）、ECDH（k*对端公钥，首次协商/重复对端）上的单次耗时，并校验结果一致。
+
+用法:
+    python -m crypto.sm2_bench
+    python -m crypto.sm2_bench --repeat 50 --output sm2_bench.json
+"""
+
+import argparse
+import json
+import time
+
+from . import sm2_ec, sm2_native
+
+
+def _avg_ms(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(repeat=20):
+    from gmssl import sm2
+
+    priv, _ = sm2_ec.generate_keypair()
+    _, peer_pub = sm2_ec.generate_keypair()
+    k = int(priv, 16)
+    g = sm2.default_ecc_table['g']
+    legacy = sm2.CryptSM2(public_key='', private_key=priv)
+
+    peer = sm2_ec.point_from_hex(peer_pub)
+    native = sm2_native if sm2_native.available() else None
+
+    def engine_keygen():
+        return sm2_ec.point_to_hex(sm2_ec.scalar_mult_base(k))
+
+    def engine_ecdh():
+        return sm2_ec.point_to_hex(sm2_ec.scalar_mult(k, peer))
+
+    def engine_ecdh_new_peer():
+        sm2_ec._peer_tables.clear()
+        return engine_ecdh()
+
+    if legacy._kg(k, g) != engine_keygen():
+        raise RuntimeError("密钥生成结果与 gmssl 不一致")
+    if legacy._kg(k, peer_pub) != engine_ecdh():
+        raise RuntimeError("ECDH 结果与 gmssl 不一致")
+    if native and (native.public_key_hex(priv) != engine_keygen() or native.ecdh_hex(priv, peer_pub) != engine_ecdh()):
+        raise RuntimeError("原生动态库结果与纯 Python 引擎不一致")
+
+    cases = {
+        'keygen': (lambda: legacy._kg(k, g), engine_keygen, lambda: native.public_key_hex(priv)),
+        'ecdh_new_peer': (lambda: legacy._kg(k, peer_pub), engine_ecdh_new_peer,
+                          lambda: native.ecdh_hex(priv, peer_pub)),
+        'ecdh_cached_peer': (lambda: legacy._kg(k, peer_pub), engine_ecdh, lambda: native.ecdh_hex(priv, peer_pub)),
+    }
+    results = {}
+    for name, (legacy_func, engine_func, native_func) in cases.items():
+        item = {
+            'gmssl_ms': round(_avg_ms(legacy_func, repeat), 3),
+            'engine_ms': round(_avg_ms(engine_func, repeat), 3),
+            'native_ms': round(_avg_ms(native_func, repeat), 3) if native else None,
+        }
+        item['speedup'] = round(item['gmssl_ms'] / item['engine_ms'], 1) if item['engine_ms'] else None
+        results[name] = item
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m crypto.sm2_bench', description='SM2 标量乘基准测试')
+    parser.add_argument('--repeat', type=int, default=20, help='每项重复次数（取平均）')
+    parser.add_argument('--output', help='结果JSON路径')
+    args = parser.parse_args(argv)
+
+    # 固定基表首次使用时建立，不计入单次耗时
+    start = time.perf_counter()
+    sm2_ec.scalar_mult_base(1)
+    print(f"[系统] 生成元预计算表建立耗时: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    results = run(args.repeat)
+    print(f"{'项目':<18} {'gmssl(ms)':>10} {'引擎(ms)':>10} {'加速比':>8} {'原生(ms)':>10}")
+    for name, item in results.items():
+        native_ms = item['native_ms'] if item['native_ms'] is not None else '-'
+        print(f"{name:<18} {item['gmssl_ms']:>10} {item['engine_ms']:>10} {item['speedup']:>8} {native_ms:>10}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"[系统] 结果已保存: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,299 @@
+"""
+SM2 椭圆曲线点运算引擎
+
+替代 gmssl CryptSM2._kg 的朴素倍点-点加（字符串形式的坐标、每步重复解析参数）：
+    - Jacobian 坐标，a = -3 的快速倍点公式，预计算点用仿射坐标做混合加法
+    - 生成元 G 使用固定基表：256位标量按4位分成64个窗口，每个窗口预存 1..15 倍点，
+      k*G 只需不超过64次混合加法、无需倍点（首次使用时建表）
+    - 任意点使用宽度为5的 wNAF，对端公钥的奇数倍点表按 LRU 缓存，重复与同一对端协商时复用
+
+输出格式与 _kg 一致：x、y 各64位小写十六进制拼接（共128个字符）。
+
+十六进制接口（public_key_hex / ecdh_hex / generate_keypair）在找到 src/sm2_ecdh.c 编译出的
+动态库且其基于 GmSSL 3.1.2+ 时优先走原生实现（见 sm2_native），原生调用失败时回退到本模块。
+环境变量 E2E_SM2_BACKEND=native 强制使用原生实现（只要动态库可用），=python 强制使用纯 Python 实现。
+"""
+
+import os
+import secrets
+import threading
+from collections import OrderedDict
+
+P = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF00000000FFFFFFFFFFFFFFFF
+A = P - 3
+B = 0x28E9FA9E9D9F5E344D5A9E4BCF6509A7F39789F515AB8F92DDBCBD414D940E93
+N = 0xFFFFFFFEFFFFFFFFFFFFFFFFFFFFFFFF7203DF6B21C6052B53BBF40939D54123
+G = (0x32C4AE2C1F1981195F9904466A39C9948FE30BBFF2660BE1715A4589334C74C7,
+     0xBC3736A2F4F6779C59BDCEE36B692153D0A9877CC62A474002DF32E52139F0A0)
+
+BASE_WINDOW = 4
+WNAF_WIDTH = 5
+PEER_CACHE_SIZE = 64
+BACKEND_ENV = 'E2E_SM2_BACKEND'
+
+# Jacobian 无穷远点用 Z = 0 表示
+_INFINITY = (1, 1, 0)
+
+
+# ---------------------------------------------------------------------------
+# 基本点运算
+# ---------------------------------------------------------------------------
+
+def is_on_curve(point):
+    x, y = point
+    return 0 <= x < P and 0 <= y < P and (y * y - x * x * x - A * x - B) % P == 0
+
+
+def _double(p1):
+    X1, Y1, Z1 = p1
+    if Z1 == 0 or Y1 == 0:
+        return _INFINITY
+    delta = Z1 * Z1 % P
+    gamma = Y1 * Y1 % P
+    beta = X1 * gamma % P
+    alpha = 3 * (X1 - delta) * (X1 + delta) % P
+    X3 = (alpha * alpha - 8 * beta) % P
+    Z3 = ((Y1 + Z1) * (Y1 + Z1) - gamma - delta) % P
+    Y3 = (alpha * (4 * beta - X3) - 8 * gamma * gamma) % P
+    return X3, Y3, Z3
+
+
+def _add_mixed(p1, p2):
+    """Jacobian 点 + 仿射点"""
+    X1, Y1, Z1 = p1
+    x2, y2 = p2
+    if Z1 == 0:
+        return x2, y2, 1
+    Z1Z1 = Z1 * Z1 % P
+    H = (x2 * Z1Z1 - X1) % P
+    r = (y2 * Z1 * Z1Z1 - Y1) % P
+    if H == 0:
+        return _double(p1) if r == 0 else _INFINITY
+    HH = H * H % P
+    HHH = H * HH % P
+    V = X1 * HH % P
+    X3 = (r * r - HHH - 2 * V) % P
+    Y3 = (r * (V - X3) - Y1 * HHH) % P
+    Z3 = Z1 * H % P
+    return X3, Y3, Z3
+
+
+def _to_affine(p1):
+    X, Y, Z = p1
+    if Z == 0:
+        raise ValueError("结果为无穷远点")
+    z_inv = pow(Z, -1, P)
+    z_inv2 = z_inv * z_inv % P
+    return X * z_inv2 % P, Y * z_inv2 * z_inv % P
+
+
+def _to_affine_batch(points):
+    """Montgomery 批量求逆：多个 Jacobian 点只做一次模逆转换为仿射坐标"""
+    prefix = []
+    acc = 1
+    for _, _, Z in points:
+        prefix.append(acc)
+        acc = acc * Z % P
+    inv = pow(acc, -1, P)
+    result = [None] * len(points)
+    for i in range(len(points) - 1, -1, -1):
+        X, Y, Z = points[i]
+        z_inv = inv * prefix[i] % P
+        inv = inv * Z % P
+        z_inv2 = z_inv * z_inv % P
+        result[i] = (X * z_inv2 % P, Y * z_inv2 * z_inv % P)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# 固定基：生成元 G
+# ---------------------------------------------------------------------------
+
+_base_table = None
+_base_lock = threading.Lock()
+
+
+def _build_base_table():
+    """table[i][j-1] = j * 2^(4i) * G（仿射），i = 0..63，j = 1..15"""
+    windows = (256 + BASE_WINDOW - 1) // BASE_WINDOW
+    size = (1 << BASE_WINDOW) - 1
+    jacobian = []
+    base = G
+    for _ in range(windows):
+        acc = (base[0], base[1], 1)
+        row = [acc]
+        for _ in range(size - 1):
+            acc = _add_mixed(acc, base)
+            row.append(acc)
+        jacobian.extend(row)
+        # 下一个窗口的基点 = 2^4 * 当前基点
+        nxt = (base[0], base[1], 1)
+        for _ in range(BASE_WINDOW):
+            nxt = _double(nxt)
+        base = _to_affine(nxt)
+    affine = _to_affine_batch(jacobian)
+    return [affine[i * size:(i + 1) * size] for i in range(windows)]
+
+
+def _get_base_table():
+    global _base_table
+    if _base_table is None:
+        with _base_lock:
+            if _base_table is None:
+                _base_table = _build_base_table()
+    return _base_table
+
+
+def scalar_mult_base(k):
+    """k*G，返回仿射坐标 (x, y)"""
+    k %= N
+    if k == 0:
+        raise ValueError("标量不能为0")
+    table = _get_base_table()
+    mask = (1 << BASE_WINDOW) - 1
+    acc = _INFINITY
+    i = 0
+    while k:
+        digit = k & mask
+        if digit:
+            acc = _add_mixed(acc, table[i][digit - 1])
+        k >>= BASE_WINDOW
+        i += 1
+    return _to_affine(acc)
+
+
+# ---------------------------------------------------------------------------
+# 任意点：wNAF + 对端奇数倍点表缓存
+# ---------------------------------------------------------------------------
+
+_peer_tables = OrderedDict()
+_peer_lock = threading.Lock()
+
+
+def _wnaf(k, width=WNAF_WIDTH):
+    """宽度为 width 的 NAF 表示（低位在前），非零位均为奇数且 |d| < 2^(width-1)"""
+    digits = []
+    full = 1 << width
+    half = full >> 1
+    while k:
+        if k & 1:
+            d = k & (full - 1)
+            if d >= half:
+                d -= full
+            k -= d
+        else:
+            d = 0
+        digits.append(d)
+        k >>= 1
+    return digits
+
+
+def _odd_multiples(point, width=WNAF_WIDTH):
+    """[P, 3P, 5P, ..., (2^(width-1)-1)P]（仿射）"""
+    count = 1 << (width - 2)
+    two_p = _to_affine(_double((point[0], point[1], 1)))
+    jacobian = [(point[0], point[1], 1)]
+    for _ in range(count - 1):
+        jacobian.append(_add_mixed(jacobian[-1], two_p))
+    return _to_affine_batch(jacobian)
+
+
+def _get_peer_table(point):
+    with _peer_lock:
+        table = _peer_tables.get(point)
+        if table is not None:
+            _peer_tables.move_to_end(point)
+            return table
+    table = _odd_multiples(point)
+    with _peer_lock:
+        _peer_tables[point] = table
+        while len(_peer_tables) > PEER_CACHE_SIZE:
+            _peer_tables.popitem(last=False)
+    return table
+
+
+def scalar_mult(k, point):
+    """k*point，返回仿射坐标 (x, y)；point 为 G 时走固定基表"""
+    if point == G:
+        return scalar_mult_base(k)
+    k %= N
+    if k == 0:
+        raise ValueError("标量不能为0")
+    table = _get_peer_table(point)
+    acc = _INFINITY
+    for d in reversed(_wnaf(k)):
+        acc = _double(acc)
+        if d > 0:
+            acc = _add_mixed(acc, table[d >> 1])
+        elif d < 0:
+            x, y = table[(-d) >> 1]
+            acc = _add_mixed(acc, (x, P - y))
+    return _to_affine(acc)
+
+
+# ---------------------------------------------------------------------------
+# 十六进制接口（与 gmssl 的密钥格式一致）
+# ---------------------------------------------------------------------------
+
+def point_from_hex(text):
+    """128个十六进制字符（x||y）解析为点，校验是否在曲线上"""
+    text = text.strip()
+    if len(text) == 130 and text[:2] == '04':
+        text = text[2:]
+    if len(text) != 128:
+        raise ValueError(f"SM2 公钥长度错误: {len(text)}")
+    point = (int(text[:64], 16), int(text[64:], 16))
+    if not is_on_curve(point):
+        raise ValueError("SM2 公钥不在曲线上")
+    return point
+
+
+def point_to_hex(point):
+    return '%064x%064x' % point
+
+
+def _native():
+    """可用且未被禁用时返回原生绑定模块，否则返回 None（动态库在首次调用时加载）"""
+    choice = os.environ.get(BACKEND_ENV, 'auto')
+    if choice == 'python':
+        return None
+    from . import sm2_native
+    if choice == 'native':
+        return sm2_native if sm2_native.available() else None
+    return sm2_native if sm2_native.is_fast() else None
+
+
+def backend():
+    """当前十六进制接口使用的实现：native 或 python"""
+    return 'native' if _native() else 'python'
+
+
+def public_key_hex(private_key_hex):
+    """由私钥计算公钥，等价于 _kg(int(priv, 16), G)"""
+    native = _native()
+    if native:
+        try:
+            return native.public_key_hex(private_key_hex)
+        except ValueError:
+            pass  # 例如私钥 >= n-1，原生库拒绝，交给纯 Python 实现按 _kg 的语义计算
+    return point_to_hex(scalar_mult_base(int(private_key_hex, 16)))
+
+
+def ecdh_hex(private_key_hex, peer_public_key_hex):
+    """ECDH 共享点，等价于 _kg(int(priv, 16), peer_pub)"""
+    native = _native()
+    if native:
+        try:
+            return native.ecdh_hex(private_key_hex, peer_public_key_hex)
+        except ValueError:
+            pass  # 无效公钥会在下面再次校验并抛出 ValueError
+    return point_to_hex(scalar_mult(int(private_key_hex, 16), point_from_hex(peer_public_key_hex)))
+
+
+def generate_keypair():
+    """生成 (私钥, 公钥) 十六进制字符串"""
+    native = _native()
+    if native:
+        return native.generate_keypair()
+    private_key = '%064x' % (secrets.randbelow(N - 1) + 1)
+    return private_key, public_key_hex(private_key)
@@ -0,0 +1,143 @@
+"""
+SM2 密钥生成与 ECDH 的原生绑定（ctypes，调用 src/sm2_ecdh.c 编译出的动态库）
+
+密钥直接以内存缓冲区传递（sm2_*_raw 接口），不再经过 PEM 文件和 e2e-tool 子进程。
+动态库由 `make shared` 或 CMake 的 sm2_ecdh 目标生成，按以下顺序查找，
+找不到时 lib 为 None，导入本模块不会失败：
+    1. 环境变量 E2E_SM2_LIB 指定的路径
+    2. 项目根目录、build/、build/lib/、build/bin/ 下的 libsm2_ecdh.so / .dylib / sm2_ecdh.dll
+    3. ctypes.util.find_library('sm2_ecdh')
+
+公钥与 ECDH 结果的格式与 crypto.sm2_ec 一致：x、y 各64位小写十六进制拼接。
+GmSSL 3.1.2 之前的 SM2 实现是通用大数运算，速度不如 sm2_ec 的查表引擎，
+crypto.sm2_ec 默认只在 is_fast() 为真时使用原生实现。
+"""
+
+import ctypes
+import ctypes.util
+import os
+import sys
+
+LIB_ENV = 'E2E_SM2_LIB'
+
+PRIVATE_KEY_SIZE = 32
+PUBLIC_KEY_SIZE = 64
+SHARED_SIZE = 64
+Z256_VERSION = 30102  # GmSSL 3.1.2：SM2 改为 SM2_Z256 实现
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+_SEARCH_DIRS = [
+    PROJECT_ROOT,
+    os.path.join(PROJECT_ROOT, 'build'),
+    os.path.join(PROJECT_ROOT, 'build', 'lib'),
+    os.path.join(PROJECT_ROOT, 'build', 'bin'),
+]
+
+if sys.platform == 'darwin':
+    _LIB_NAMES = ['libsm2_ecdh.dylib']
+elif sys.platform == 'win32':
+    _LIB_NAMES = ['sm2_ecdh.dll', 'libsm2_ecdh.dll']
+else:
+    _LIB_NAMES = ['libsm2_ecdh.so']
+
+
+def candidate_paths():
+    """按优先级返回可能的动态库路径"""
+    paths = []
+    if os.environ.get(LIB_ENV):
+        paths.append(os.environ[LIB_ENV])
+    for directory in _SEARCH_DIRS:
+        for name in _LIB_NAMES:
+            paths.append(os.path.join(directory, name))
+    found = ctypes.util.find_library('sm2_ecdh')
+    if found:
+        paths.append(found)
+    return paths
+
+
+def _bind(lib):
+    buf = ctypes.c_char_p
+    lib.sm2_generate_keypair_raw.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+    lib.sm2_generate_keypair_raw.restype = ctypes.c_int
+    lib.sm2_compute_public_key_raw.argtypes = [buf, ctypes.c_void_p]
+    lib.sm2_compute_public_key_raw.restype = ctypes.c_int
+    lib.sm2_derive_session_key_raw.argtypes = [buf, buf, ctypes.c_void_p]
+    lib.sm2_derive_session_key_raw.restype = ctypes.c_int
+    lib.sm2_ecdh_gmssl_version.argtypes = []
+    lib.sm2_ecdh_gmssl_version.restype = ctypes.c_int
+    return lib
+
+
+def load_library():
+    """加载动态库，返回 (lib, 路径)；找不到或缺少 raw 接口时返回 (None, None)"""
+    for path in candidate_paths():
+        if os.path.sep in path or '/' in path:
+            if not os.path.exists(path):
+                continue
+        try:
+            return _bind(ctypes.CDLL(path)), path
+        except (OSError, AttributeError):
+            continue
+    return None, None
+
+
+lib, LIB_PATH = load_library()
+
+
+def available() -> bool:
+    return lib is not None
+
+
+def gmssl_version():
+    """动态库编译时的 GmSSL 版本号，未加载时返回 None"""
+    return lib.sm2_ecdh_gmssl_version() if lib is not None else None
+
+
+def is_fast() -> bool:
+    """动态库是否基于 GmSSL 3.1.2+ 的 SM2_Z256 实现"""
+    return available() and gmssl_version() >= Z256_VERSION
+
+
+def _require():
+    if lib is None:
+        raise RuntimeError(f"SM2 动态库未找到，请先执行 make shared，或通过环境变量 {LIB_ENV} 指定路径")
+
+
+def _private_bytes(private_key_hex):
+    try:
+        return int(private_key_hex, 16).to_bytes(PRIVATE_KEY_SIZE, 'big')
+    except OverflowError:
+        raise ValueError("SM2 私钥超过32字节") from None
+
+
+def generate_keypair():
+    """生成 (私钥, 公钥) 十六进制字符串"""
+    _require()
+    priv = ctypes.create_string_buffer(PRIVATE_KEY_SIZE)
+    pub = ctypes.create_string_buffer(PUBLIC_KEY_SIZE)
+    if lib.sm2_generate_keypair_raw(priv, pub) != 0:
+        raise RuntimeError("SM2 密钥对生成失败")
+    return priv.raw.hex(), pub.raw.hex()
+
+
+def public_key_hex(private_key_hex):
+    """由私钥计算公钥；私钥不在 [1, n-2] 范围内时抛出 ValueError"""
+    _require()
+    pub = ctypes.create_string_buffer(PUBLIC_KEY_SIZE)
+    if lib.sm2_compute_public_key_raw(_private_bytes(private_key_hex), pub) != 0:
+        raise ValueError("SM2 私钥无效")
+    return pub.raw.hex()
+
+
+def ecdh_hex(private_key_hex, peer_public_key_hex):
+    """ECDH 共享点；私钥无效或对端公钥不在曲线上时抛出 ValueError"""
+    _require()
+    peer = bytes.fromhex(peer_public_key_hex.strip())
+    if len(peer) == PUBLIC_KEY_SIZE + 1 and peer[0] == 0x04:
+        peer = peer[1:]
+    if len(peer) != PUBLIC_KEY_SIZE:
+        raise ValueError(f"SM2 公钥长度错误: {len(peer) * 2}")
+    shared = ctypes.create_string_buffer(SHARED_SIZE)
+    if lib.sm2_derive_session_key_raw(_private_bytes(private_key_hex), peer, shared) != 0:
+        raise ValueError("SM2 ECDH 失败（私钥无效或对端公钥不在曲线上）")
+    return shared.raw.hex()
@@ -0,0 +1,374 @@
+"""
+ZUC 流密码（共享实现）
+
+按块批量生成密钥流写入预分配缓冲区，并用 int.from_bytes 整体异或，
+替代各客户端中逐4字节拼接密钥流、逐字节异或的旧实现。
+消息格式保持不变: iv.hex() + ':' + ciphertext.hex()
+
+后端：GmSSL 原生库（见 zuc_ctypes）可用时按测速结果自动选用，否则使用
+本模块的纯 Python 实现；环境变量 E2E_ZUC_BACKEND=gmssl|python 可强制指定。
+"""
+
+import os
+import struct
+
+KEY_LEN = 16
+IV_LEN = 16
+
+# 每批生成的32位字数：批内 LFSR 直接追加到列表，批末截断
+BLOCK_WORDS = 4096
+
+_P = 0x7fffffff
+_M32 = 0xffffffff
+
+_S0 = bytes.fromhex(
+    '3e725b47cae0003304d1549809b96dcb7b1bf932af9d6aa5b82dfc1d08530390'
+    '4d4e8499e4ced991ddb685488b296eaccdc1f81e734369c6b5bdfd396320d438'
+    '767db2a7cfed57c5f32cbb142106559be3ef5e314f7f5aa40d8251495fba581c'
+    '4a16d517a892241f8cffd8ae2e01d3ad3b4bda46ebc9de9a8f87d73a806f2fc8'
+    'b1b437f70a2213287ccc3c89c7c3965607bf7ef00b2b975235417961a64c10fe'
+    'bc2695888ab0a3fbc01894f2e1e5e95dd0dc1166645cec59427512f5749caa23'
+    '0e86abbe2a02e767e644a26cc2939ff1f6fa36d250689e6271153dd640c4e20f'
+    '8e83776b25053f0c30ea70b7a1e8a9658d271adb81b3a0f4457a19dfee783460')
+_S1 = bytes.fromhex(
+    '55c263713bc847869f3cda5b29aafd778cc5940ca61a1300e3a8167240f9f842'
+    '4426689681d9453e1076c6a78b3943e13ab5562ac06db3052266bfdc0bfa6248'
+    'dd20110636c9c1cff62752bb69f5d4877f844cd29c57a4bc4f9adffed68d7aeb'
+    '2b53d85ca11417fb23d57d3067730809eeb7703f61b2198e4ee54b938f5ddba9'
+    'adf1ae2ecb0dfcf42d466e1d97e8d1e94d37a5755e839eab829db91ce0cd4989'
+    '01b6bd5824a25f387899159050b895e4d091c7ceed0fb46fa0ccf0024a79c3de'
+    'a3efea51e66b18ec1b2c80f774e7ff215a6a541e41319235c433070aba7e0e34'
+    '88b1987cf33d606c7bcad31f3265042864be859b2f598ad7b025acaf1203e2f2')
+
+_D = (
+    0x44D7, 0x26BC, 0x626B, 0x135E, 0x5789, 0x35E2, 0x7135, 0x09AF,
+    0x4D78, 0x2F13, 0x6BC4, 0x1AF1, 0x5E26, 0x3C4D, 0x789A, 0x47AC,
+)
+
+# S 盒按字节位置预先移位，查表后直接拼成32位字
+_T0 = tuple(x << 24 for x in _S0)
+_T1 = tuple(x << 16 for x in _S1)
+_T2 = tuple(x << 8 for x in _S0)
+_T3 = tuple(_S1)
+
+
+def _sbox(x):
+    return _T0[x >> 24] | _T1[(x >> 16) & 0xff] | _T2[(x >> 8) & 0xff] | _T3[x & 0xff]
+
+
+class ZUC:
+    """ZUC 密钥流生成器，一次生成任意长度的密钥流"""
+
+    def __init__(self, key: bytes, iv: bytes):
+        if len(key) != KEY_LEN or len(iv) != IV_LEN:
+            raise ValueError("ZUC 的 key 和 iv 必须为16字节")
+        self._lfsr = [(key[i] << 23) | (_D[i] << 8) | iv[i] for i in range(16)]
+        self._r1 = 0
+        self._r2 = 0
+        for _ in range(32):
+            self._step(init=True)
+        # 初始化后丢弃第一个字
+        self._step()
+
+    def _step(self, init=False):
+        """单步（初始化阶段使用），返回输出字"""
+        S = self._lfsr
+        X0 = ((S[15] & 0x7fff8000) << 1) | (S[14] & 0xffff)
+        X1 = ((S[11] & 0xffff) << 16) | (S[9] >> 15)
+        X2 = ((S[7] & 0xffff) << 16) | (S[5] >> 15)
+        X3 = ((S[2] & 0xffff) << 16) | (S[0] >> 15)
+        R1, R2 = self._r1, self._r2
+        W = ((X0 ^ R1) + R2) & _M32
+        W1 = (R1 + X1) & _M32
+        W2 = R2 ^ X2
+        u = ((W1 << 16) | (W2 >> 16)) & _M32
+        v = ((W2 << 16) | (W1 >> 16)) & _M32
+        u ^= ((u << 2) | (u >> 30)) ^ ((u << 10) | (u >> 22)) ^ ((u << 18) | (u >> 14)) ^ ((u << 24) | (u >> 8))
+        v ^= ((v << 8) | (v >> 24)) ^ ((v << 14) | (v >> 18)) ^ ((v << 22) | (v >> 10)) ^ ((v << 30) | (v >> 2))
+        self._r1 = _sbox(u & _M32)
+        self._r2 = _sbox(v & _M32)
+
+        s = (S[15] << 15) + (S[13] << 17) + (S[10] << 21) + (S[4] << 20) + (S[0] << 8) + S[0]
+        if init:
+            s += W >> 1
+        s = (s & _P) + (s >> 31)
+        s = (s & _P) + (s >> 31)
+        S.append(s)
+        del S[0]
+        return W ^ X3
+
+    def generate_words(self, count):
+        """生成 count 个32位密钥流字（列表）"""
+        S = self._lfsr
+        R1, R2 = self._r1, self._r2
+        T0, T1, T2, T3 = _T0, _T1, _T2, _T3
+        out = []
+        append = out.append
+        i = 0
+        for _ in range(count):
+            X0 = ((S[i + 15] & 0x7fff8000) << 1) | (S[i + 14] & 0xffff)
+            X1 = ((S[i + 11] & 0xffff) << 16) | (S[i + 9] >> 15)
+            X2 = ((S[i + 7] & 0xffff) << 16) | (S[i + 5] >> 15)
+            s0 = S[i]
+            append((((X0 ^ R1) + R2) & 0xffffffff) ^ ((S[i + 2] & 0xffff) << 16) ^ (s0 >> 15))
+            W1 = (R1 + X1) & 0xffffffff
+            W2 = R2 ^ X2
+            u = ((W1 << 16) | (W2 >> 16)) & 0xffffffff
+            v = ((W2 << 16) | (W1 >> 16)) & 0xffffffff
+            u = (u ^ ((u << 2) | (u >> 30)) ^ ((u << 10) | (u >> 22))
+                 ^ ((u << 18) | (u >> 14)) ^ ((u << 24) | (u >> 8))) & 0xffffffff
+            v = (v ^ ((v << 8) | (v >> 24)) ^ ((v << 14) | (v >> 18))
+                 ^ ((v << 22) | (v >> 10)) ^ ((v << 30) | (v >> 2))) & 0xffffffff
+            R1 = T0[u >> 24] | T1[(u >> 16) & 0xff] | T2[(u >> 8) & 0xff] | T3[u & 0xff]
+            R2 = T0[v >> 24] | T1[(v >> 16) & 0xff] | T2[(v >> 8) & 0xff] | T3[v & 0xff]
+
+            s = (S[i + 15] << 15) + (S[i + 13] << 17) + (S[i + 10] << 21) + (S[i + 4] << 20) + (s0 << 8) + s0
+            s = (s & 0x7fffffff) + (s >> 31)
+            S.append((s & 0x7fffffff) + (s >> 31))
+            i += 1
+        del S[:i]
+        self._r1, self._r2 = R1, R2
+        return out
+
+    def keystream_into(self, buf, length=None):
+        """向预分配的可写缓冲区写入 length 字节密钥流（默认写满）"""
+        mv = memoryview(buf).cast('B')
+        length = len(mv) if length is None else length
+        offset = 0
+        while offset < length:
+            words = min(BLOCK_WORDS, (length - offset + 3) // 4)
+            chunk = struct.pack(f'>{words}I', *self.generate_words(words))
+            n = min(len(chunk), length - offset)
+            mv[offset:offset + n] = chunk[:n]
+            offset += n
+        return length
+
+    def keystream(self, length):
+        """生成 length 字节密钥流"""
+        buf = bytearray(length)
+        self.keystream_into(buf)
+        return bytes(buf)
+
+
+def xor_bytes(data, keystream) -> bytes:
+    """整体异或两段等长字节串"""
+    n = len(data)
+    if n == 0:
+        return b''
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(keystream[:n], 'big')).to_bytes(n, 'big')
+
+
+def python_crypt(key: bytes, iv: bytes, data) -> bytes:
+    """纯 Python 后端"""
+    return xor_bytes(data, ZUC(key, iv).keystream(len(data)))
+
+
+def gmssl_crypt(key: bytes, iv: bytes, data) -> bytes:
+    """GmSSL 原生后端（ctypes）"""
+    from .zuc_ctypes import zuc_encrypt_py
+    return zuc_encrypt_py(key, iv, data)
+
+
+def python_crypt_inplace(key: bytes, iv: bytes, buf) -> int:
+    """纯 Python 后端的原地加密：密钥流按块生成，逐块异或写回"""
+    from .zuc_ctypes import writable_bytes
+
+    mv = writable_bytes(buf)
+    g = ZUC(key, iv)
+    step = BLOCK_WORDS * 4
+    for offset in range(0, mv.nbytes, step):
+        chunk = mv[offset:offset + step]
+        chunk[:] = xor_bytes(chunk, g.keystream(len(chunk)))
+    return mv.nbytes
+
+
+def gmssl_crypt_inplace(key: bytes, iv: bytes, buf) -> int:
+    """GmSSL 原生后端的原地加密，零拷贝"""
+    from .zuc_ctypes import zuc_encrypt_inplace
+    return zuc_encrypt_inplace(key, iv, buf)
+
+
+# ---------------------------------------------------------------------------
+# 后端选择：环境变量强制指定 > 本机缓存的测速结果 > 现场测速（每次安装一次）
+# ---------------------------------------------------------------------------
+
+BACKEND_ENV = 'E2E_ZUC_BACKEND'
+CACHE_ENV = 'E2E_ZUC_BACKEND_CACHE'
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'e2e', 'zuc_backend.json')
+SELECT_BENCH_SIZE = 64 * 1024
+
+BACKENDS = {
+    'gmssl': gmssl_crypt,
+    'python': python_crypt,
+}
+INPLACE_BACKENDS = {
+    'gmssl': gmssl_crypt_inplace,
+    'python': python_crypt_inplace,
+}
+
+_backend = None  # (名称, 来源)
+
+
+def available_backends():
+    """当前环境可用的后端名称列表"""
+    from . import zuc_ctypes
+
+    names = ['python']
+    if zuc_ctypes.available():
+        names.insert(0, 'gmssl')
+    return names
+
+
+def _install_fingerprint():
+    """标识一次安装：Python 版本、本模块与原生库的路径/大小/修改时间"""
+    import sys
+    from . import zuc_ctypes
+
+    parts = [sys.version.split()[0], __file__, zuc_ctypes.LIB_PATH or '']
+    for path in (__file__, zuc_ctypes.LIB_PATH):
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            parts.append(f"{stat.st_size}:{int(stat.st_mtime)}")
+    return '|'.join(parts)
+
+
+def _cache_path():
+    return os.environ.get(CACHE_ENV) or DEFAULT_CACHE_PATH
+
+
+def _load_cached_choice(fingerprint, names):
+    import json
+
+    try:
+        with open(_cache_path(), 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get('fingerprint') == fingerprint and cached.get('backend') in names:
+        return cached['backend']
+    return None
+
+
+def _save_cached_choice(fingerprint, name, timings):
+    import json
+    import tempfile
+
+    path = _cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': fingerprint, 'backend': name, 'timings': timings}, f, indent=2)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[警告] 无法缓存 ZUC 后端测速结果: {e}")
+
+
+def benchmark_backends(names=None, size=SELECT_BENCH_SIZE):
+    """对各后端测速，返回 {名称: 秒}；结果与纯 Python 后端不一致的后端被排除"""
+    import time
+
+    key, iv, data = os.urandom(KEY_LEN), os.urandom(IV_LEN), os.urandom(size)
+    expected = python_crypt(key, iv, data)
+    timings = {}
+    for name in names or available_backends():
+        try:
+            start = time.perf_counter()
+            result = BACKENDS[name](key, iv, data)
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            print(f"[警告] ZUC 后端 {name} 不可用: {e}")
+            continue
+        if result == expected:
+            timings[name] = elapsed
+        else:
+            print(f"[警告] ZUC 后端 {name} 输出与参考实现不一致，已忽略")
+    return timings
+
+
+def select_backend(force=False):
+    """选择最快的可用后端，返回 (名称, 来源)；force=True 时忽略缓存重新测速"""
+    global _backend
+
+    names = available_backends()
+    override = os.environ.get(BACKEND_ENV)
+    if override:
+        if override not in names:
+            raise ValueError(f"ZUC 后端 {override} 不可用，可用后端: {', '.join(names)}")
+        _backend = (override, 'env')
+        return _backend
+    if len(names) == 1:
+        _backend = (names[0], 'only')
+        return _backend
+
+    fingerprint = _install_fingerprint()
+    cached = None if force else _load_cached_choice(fingerprint, names)
+    if cached:
+        _backend = (cached, 'cache')
+        return _backend
+
+    timings = benchmark_backends(names)
+    name = min(timings, key=timings.get) if timings else 'python'
+    _save_cached_choice(fingerprint, name, timings)
+    _backend = (name, 'benchmark')
+    return _backend
+
+
+def get_backend():
+    """当前使用的后端名称（首次调用时选择）"""
+    if _backend is None:
+        select_backend()
+    return _backend[0]
+
+
+def backend_info():
+    """当前后端信息，便于日志和基准测试报告"""
+    from . import zuc_ctypes
+
+    name = get_backend()
+    return {
+        'backend': name,
+        'source': _backend[1],
+        'available': available_backends(),
+        'gmssl_lib': zuc_ctypes.LIB_PATH,
+    }
+
+
+def zuc_crypt(key: bytes, iv: bytes, data) -> bytes:
+    """ZUC 加密/解密（流密码两者相同），使用当前选择的后端"""
+    return BACKENDS[get_backend()](key, iv, data)
+
+
+def zuc_crypt_inplace(key: bytes, iv: bytes, buf) -> int:
+    """原地加密/解密 bytearray、可写 memoryview 或 NumPy 数组，返回处理的字节数"""
+    return INPLACE_BACKENDS[get_backend()](key, iv, buf)
+
+
+def session_key_bytes(session_key) -> bytes:
+    """会话密钥转16字节 ZUC 密钥：十六进制字符串取前32个字符，bytes 取前16字节"""
+    if isinstance(session_key, str):
+        return bytes.fromhex(session_key[:KEY_LEN * 2])
+    return bytes(session_key[:KEY_LEN])
+
+
+def encrypt_bytes(session_key, data: bytes) -> str:
+    """加密字节串，返回 'iv:ciphertext' 十六进制格式"""
+    iv = os.urandom(IV_LEN)
+    ciphertext = zuc_crypt(session_key_bytes(session_key), iv, data)
+    return iv.hex() + ':' + ciphertext.hex()
+
+
+def decrypt_bytes(session_key, msg: str) -> bytes:
+    """解密 'iv:ciphertext' 格式的消息，返回字节串"""
+    iv_hex, ct_hex = msg.split(':', 1)
+    return zuc_crypt(session_key_bytes(session_key), bytes.fromhex(iv_hex), bytes.fromhex(ct_hex))
+
+
+def encrypt_message(session_key, plaintext: str) -> str:
+    """使用ZUC加密消息"""
+    return encrypt_bytes(session_key, plaintext.encode())
+
+
+def decrypt_message(session_key, msg: str) -> str:
+    """使用ZUC解密消息"""
+    return decrypt_bytes(session_key, msg).decode()
@@ -1,35 +1,146 @@
+"""
+GmSSL 3 原生 ZUC 绑定（ctypes）
+
+按以下顺序查找 libgmssl，找不到时 lib 为 None，导入本模块不会失败：
+    1. 环境变量 E2E_GMSSL_LIB 指定的路径
+    2. ctypes.util.find_library('gmssl')
+    3. 常见安装位置（/usr/local/lib、Homebrew、系统库目录、Windows GmSSL 目录）
+"""
+
 import ctypes
+import ctypes.util
 import os
+import sys
 
-# 修改为你的实际 GmSSL 动态库路径
-GMSL_LIB_PATH = '/usr/local/lib/libgmssl.dylib'  # macOS
-# GMSL_LIB_PATH = '/usr/local/lib/libgmssl.so'  # Linux
+LIB_ENV = 'E2E_GMSSL_LIB'
 
-if not os.path.exists(GMSL_LIB_PATH):
-    raise FileNotFoundError(f"GmSSL动态库未找到: {GMSL_LIB_PATH}")
+ZUC_KEY_SIZE = 16
+ZUC_IV_SIZE = 16
 
-lib = ctypes.cdll.LoadLibrary(GMSL_LIB_PATH)
-
-zuc_encrypt = lib.zuc_encrypt
-zuc_encrypt.argtypes = [
-    ctypes.c_char_p, ctypes.c_char_p,
-    ctypes.c_char_p, ctypes.c_size_t,
-    ctypes.c_char_p
+_SEARCH_DIRS = [
+    '/usr/local/lib',
+    '/usr/local/lib64',
+    '/opt/homebrew/lib',
+    '/usr/lib',
+    '/usr/lib64',
+    '/usr/lib/x86_64-linux-gnu',
+    '/usr/lib/aarch64-linux-gnu',
+    'C:/Program Files/GmSSL/bin',
+    'C:/GmSSL/bin',
 ]
-zuc_encrypt.restype = ctypes.c_int
 
-def zuc_encrypt_py(key: bytes, iv: bytes, data: bytes) -> bytes:
-    if not (isinstance(key, bytes) and isinstance(iv, bytes) and isinstance(data, bytes)):
-        raise TypeError("key, iv, data 必须为 bytes 类型")
-    if len(key) != 16 or len(iv) != 16:
+if sys.platform == 'darwin':
+    _LIB_NAMES = ['libgmssl.dylib', 'libgmssl.3.dylib']
+elif sys.platform == 'win32':
+    _LIB_NAMES = ['gmssl.dll', 'libgmssl.dll']
+else:
+    _LIB_NAMES = ['libgmssl.so', 'libgmssl.so.3']
+
+
+class ZUC_STATE(ctypes.Structure):
+    """与 gmssl/zuc.h 中的 ZUC_STATE 布局一致"""
+    _fields_ = [
+        ('LFSR', ctypes.c_uint32 * 16),
+        ('R1', ctypes.c_uint32),
+        ('R2', ctypes.c_uint32),
+    ]
+
+
+def candidate_paths():
+    """按优先级返回可能的 libgmssl 路径"""
+    paths = []
+    if os.environ.get(LIB_ENV):
+        paths.append(os.environ[LIB_ENV])
+    found = ctypes.util.find_library('gmssl')
+    if found:
+        paths.append(found)
+    for directory in _SEARCH_DIRS:
+        for name in _LIB_NAMES:
+            paths.append(os.path.join(directory, name))
+    return paths
+
+
+def _bind(lib):
+    lib.zuc_init.argtypes = [ctypes.POINTER(ZUC_STATE), ctypes.c_char_p, ctypes.c_char_p]
+    lib.zuc_init.restype = None
+    lib.zuc_encrypt.argtypes = [ctypes.POINTER(ZUC_STATE), ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p]
+    lib.zuc_encrypt.restype = None
+    return lib
+
+
+def load_library():
+    """加载 libgmssl，返回 (lib, 路径)；找不到或缺少 ZUC 符号时返回 (None, None)"""
+    for path in candidate_paths():
+        # find_library 返回的可能只是库名，交给动态链接器解析
+        if os.path.sep in path or '/' in path:
+            if not os.path.exists(path):
+                continue
+        try:
+            return _bind(ctypes.CDLL(path)), path
+        except (OSError, AttributeError):
+            continue
+    return None, None
+
+
+lib, LIB_PATH = load_library()
+
+
+def available() -> bool:
+    return lib is not None
+
+
+def _check(key, iv):
+    if lib is None:
+        raise RuntimeError(f"GmSSL动态库未找到，可通过环境变量 {LIB_ENV} 指定路径")
+    if len(key) != ZUC_KEY_SIZE or len(iv) != ZUC_IV_SIZE:
         raise ValueError("key 和 iv 必须为16字节")
-    if len(data) == 0:
-        raise ValueError("data 不能为空")
+
+
+def zuc_init(key: bytes, iv: bytes) -> ZUC_STATE:
+    """创建并初始化 ZUC_STATE"""
+    _check(key, iv)
+    state = ZUC_STATE()
+    lib.zuc_init(ctypes.byref(state), bytes(key), bytes(iv))
+    return state
+
+
+def zuc_encrypt_py(key: bytes, iv: bytes, data) -> bytes:
+    """一次性加密/解密 data，返回新的 bytes"""
+    state = zuc_init(key, iv)
+    data = bytes(data)
     outbuf = ctypes.create_string_buffer(len(data))
-    ret = zuc_encrypt(key, iv, data, len(data), outbuf)
-    if ret != 1:
-        raise RuntimeError("zuc_encrypt failed")
+    if data:
+        lib.zuc_encrypt(ctypes.byref(state), data, len(data), outbuf)
     return outbuf.raw
 
 # 解密时也用 zuc_encrypt_py
 zuc_decrypt_py = zuc_encrypt_py
+
+
+def writable_bytes(buf):
+    """把 bytearray / memoryview / NumPy 数组等可写缓冲区转为按字节的 memoryview（不复制）"""
+    mv = memoryview(buf)
+    if mv.readonly:
+        raise TypeError("缓冲区必须可写（bytearray、可写 memoryview 或 NumPy 数组）")
+    if not mv.c_contiguous:
+        raise ValueError("缓冲区必须是连续内存")
+    return mv.cast('B') if mv.format != 'B' or mv.ndim != 1 else mv
+
+
+def zuc_encrypt_state_inplace(state: ZUC_STATE, buf) -> int:
+    """用已有 ZUC_STATE 原地加密/解密可写缓冲区，返回处理的字节数
+
+    GmSSL 的 zuc_encrypt 在长度不是4的倍数时会消耗整个密钥字，
+    连续调用时除最后一块外长度应为4的倍数。
+    """
+    mv = writable_bytes(buf)
+    n = mv.nbytes
+    if n:
+        cbuf = (ctypes.c_char * n).from_buffer(mv)
+        lib.zuc_encrypt(ctypes.byref(state), cbuf, n, cbuf)
+    return n
+
+
+def zuc_encrypt_inplace(key: bytes, iv: bytes, buf) -> int:
+    """原地加密/解密可写缓冲区，不分配中间缓冲区，返回处理的字节数"""
+    return zuc_encrypt_state_inplace(zuc_init(key, iv), buf)
@@ -0,0 +1,112 @@
+"""
+流式 ZUC 加密上下文
+
+ZucStream 在多次 update 调用之间保留密码状态，分块边界可以落在任意字节位置：
+上一块末尾未用完的密钥字节会留给下一块使用，因此任意切分得到的密文
+与一次性加密完全相同。配合 encrypt_file / iter_encrypt_file 可以用固定内存
+加密任意大小的文件。
+"""
+
+from . import zuc
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+class ZucStream:
+    """有状态的 ZUC 加密/解密上下文（流密码加解密相同）"""
+
+    def __init__(self, key: bytes, iv: bytes, backend=None):
+        self.backend = backend or zuc.get_backend()
+        if self.backend == 'gmssl':
+            from . import zuc_ctypes
+            self._state = zuc_ctypes.zuc_init(key, iv)
+        else:
+            self._state = zuc.ZUC(key, iv)
+        self._pending = b''  # 上次剩余、尚未使用的密钥流字节（0~3字节）
+        self.offset = 0      # 已处理的字节数
+
+    def _next_word(self) -> bytes:
+        """取下一个完整密钥字（4字节）"""
+        if self.backend == 'gmssl':
+            from . import zuc_ctypes
+            word = bytearray(4)
+            zuc_ctypes.zuc_encrypt_state_inplace(self._state, word)
+            return bytes(word)
+        return self._state.keystream(4)
+
+    def _crypt_words(self, mv):
+        """原地处理长度为4的倍数的缓冲区"""
+        if self.backend == 'gmssl':
+            from . import zuc_ctypes
+            zuc_ctypes.zuc_encrypt_state_inplace(self._state, mv)
+            return
+        step = zuc.BLOCK_WORDS * 4
+        for start in range(0, len(mv), step):
+            chunk = mv[start:start + step]
+            chunk[:] = zuc.xor_bytes(chunk, self._state.keystream(len(chunk)))
+
+    def update_into(self, buf) -> int:
+        """原地加密/解密可写缓冲区，返回处理的字节数"""
+        from .zuc_ctypes import writable_bytes
+
+        mv = writable_bytes(buf)
+        n = len(mv)
+        pos = 0
+
+        # 先用完上一块剩余的密钥流
+        if self._pending and n:
+            k = min(len(self._pending), n)
+            mv[:k] = zuc.xor_bytes(mv[:k], self._pending)
+            self._pending = self._pending[k:]
+            pos = k
+
+        whole = (n - pos) // 4 * 4
+        if whole:
+            self._crypt_words(mv[pos:pos + whole])
+            pos += whole
+
+        # 不足一个字的尾部：生成一个字，剩余部分留给下一块
+        tail = n - pos
+        if tail:
+            word = self._next_word()
+            mv[pos:] = zuc.xor_bytes(mv[pos:], word)
+            self._pending = word[tail:]
+
+        self.offset += n
+        return n
+
+    def update(self, data) -> bytes:
+        """加密/解密一块数据，返回新的 bytes"""
+        buf = bytearray(data)
+        self.update_into(buf)
+        return bytes(buf)
+
+
+def iter_encrypt_file(path, key: bytes, iv: bytes, chunk_size=DEFAULT_CHUNK_SIZE, backend=None):
+    """
+    逐块读取并加密文件，产出加密后的块（memoryview，指向复用的同一缓冲区，
+    需在取下一块前用完或复制）。内存占用只有一个 chunk_size 缓冲区。
+    """
+    stream = ZucStream(key, iv, backend)
+    buf = bytearray(chunk_size)
+    with open(path, 'rb') as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            view = memoryview(buf)[:n]
+            stream.update_into(view)
+            yield view
+
+
+def encrypt_file(input_path, output_path, key: bytes, iv: bytes, chunk_size=DEFAULT_CHUNK_SIZE, backend=None):
+    """以固定内存加密/解密文件，返回处理的字节数"""
+    total = 0
+    with open(output_path, 'wb') as out:
+        for chunk in iter_encrypt_file(input_path, key, iv, chunk_size, backend):
+            out.write(chunk)
+            total += len(chunk)
+    return total
+
+# 流密码解密与加密相同
+decrypt_file = encrypt_file
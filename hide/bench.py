@@ -0,0 +1,377 @@
+"""
+隐写性能基准测试
+
+扫描载体类型、负载大小、n_bits、载体分辨率和PDF页数，测量嵌入/提取耗时、
+吞吐量、峰值内存(RSS)和输出文件大小，结果写入JSON并可与基线对比。
+
+用法:
+    python -m hide.bench
+    python -m hide.bench --carriers image --sizes 1K,64K --resolutions 640x480
+    python -m hide.bench --save-baseline hide/bench_baseline.json
+    python -m hide.bench --baseline hide/bench_baseline.json --threshold 0.2
+"""
+
+import argparse
+import contextlib
+import functools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_CARRIERS = ['image', 'pdf', 'video']
+DEFAULT_SIZES = ['1K', '10K', '100K', '1M', '10M', '100M']
+DEFAULT_N_BITS = [1, 2, 4]
+DEFAULT_RESOLUTIONS = ['640x480', '1920x1080', '3840x2160']
+DEFAULT_PAGES = [1, 10, 100]
+DEFAULT_THRESHOLD = 0.10
+VIDEO_FRAMES = 30
+
+# 与基线对比的指标（数值越大越差）
+REGRESSION_METRICS = ['embed_s', 'extract_s', 'peak_rss']
+
+_UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(text):
+    """解析 1K / 64K / 1M 形式的大小"""
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    for unit in ('G', 'M', 'K'):
+        if size >= _UNITS[unit] and size % _UNITS[unit] == 0:
+            return f"{size // _UNITS[unit]}{unit}"
+    return str(size)
+
+
+def parse_resolution(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+# ---------------------------------------------------------------------------
+# 合成载体（与 net/tests/create_test_image.py / create_test_pdf.py 相同的绘制逻辑）
+# ---------------------------------------------------------------------------
+
+def create_cover_image(output_path, width=400, height=300):
+    """创建测试图片：白底、居中文字、矩形和圆形，按分辨率等比缩放"""
+    from PIL import Image, ImageDraw, ImageFont
+
+    scale = width / 400
+    image = Image.new('RGB', (width, height), color='white')
+    draw = ImageDraw.Draw(image)
+
+    font_size = max(12, int(24 * scale))
+    try:
+        font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", font_size)
+    except Exception:
+        font = ImageFont.load_default()
+
+    text = "E2E Tool Test Image"
+    text_bbox = draw.textbbox((0, 0), text, font=font)
+    text_width = text_bbox[2] - text_bbox[0]
+    text_height = text_bbox[3] - text_bbox[1]
+    draw.text(((width - text_width) // 2, (height - text_height) // 2), text, fill='black', font=font)
+
+    def s(values):
+        return [int(v * scale) for v in values]
+
+    draw.rectangle(s([50, 50, 150, 100]), outline='blue', width=max(2, int(2 * scale)))
+    draw.ellipse(s([200, 150, 300, 250]), fill='red')
+
+    image.save(output_path)
+    return output_path
+
+
+def create_cover_pdf(output_path, pages=1):
+    """创建测试PDF：每页内容与 create_test_pdf.py 相同"""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import letter
+
+    c = canvas.Canvas(output_path, pagesize=letter)
+    for page in range(pages):
+        c.setFont("Helvetica-Bold", 24)
+        c.drawString(100, 750, "E2E Tool Test Document")
+
+        c.setFont("Helvetica", 12)
+        c.drawString(100, 700, "This is a test document for steganography testing.")
+        c.drawString(100, 680, "It contains some sample text that can be used as a carrier.")
+        c.drawString(100, 660, "The document will be used to test PDF steganography functionality.")
+
+        c.drawString(100, 620, "Sample content:")
+        c.drawString(100, 600, "- Line 1: Basic text content")
+        c.drawString(100, 580, "- Line 2: More sample text")
+        c.drawString(100, 560, "- Line 3: Additional content for testing")
+        c.drawString(100, 540, "- Line 4: Final line of test content")
+
+        c.setFont("Helvetica", 10)
+        c.drawString(100, 100, f"Generated by E2E Tool for testing purposes - page {page + 1}")
+        c.showPage()
+    c.save()
+    return output_path
+
+
+def create_cover_video(output_path, width=400, height=300, frames=VIDEO_FRAMES):
+    """用合成测试图片作为每一帧创建测试视频"""
+    import cv2
+
+    image_path = output_path + '.png'
+    create_cover_image(image_path, width, height)
+    frame = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    os.remove(image_path)
+
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (width, height), isColor=True)
+    if not writer.isOpened():
+        raise RuntimeError("无法创建测试视频，请检查OpenCV编码器支持")
+    for _ in range(frames):
+        writer.write(frame)
+    writer.release()
+    return output_path
+
+
+# ---------------------------------------------------------------------------
+# 用例
+# ---------------------------------------------------------------------------
+
+def build_cases(carriers, sizes, n_bits_list, resolutions, pages_list):
+    """生成扫描用例列表"""
+    cases = []
+    for carrier in carriers:
+        for size in sizes:
+            if carrier == 'image':
+                for resolution in resolutions:
+                    for n_bits in n_bits_list:
+                        cases.append({'carrier': carrier, 'size': size, 'n_bits': n_bits,
+                                      'resolution': resolution})
+            elif carrier == 'video':
+                for resolution in resolutions:
+                    cases.append({'carrier': carrier, 'size': size, 'n_bits': 1,
+                                  'resolution': resolution})
+            elif carrier == 'pdf':
+                for pages in pages_list:
+                    cases.append({'carrier': carrier, 'size': size, 'pages': pages})
+            else:
+                raise ValueError(f"不支持的载体类型: {carrier}")
+    return cases
+
+
+def case_key(case):
+    parts = [case['carrier'], format_size(case['size'])]
+    if 'resolution' in case:
+        parts.append(case['resolution'])
+    if case['carrier'] == 'image':
+        parts.append(f"n{case['n_bits']}")
+    if 'pages' in case:
+        parts.append(f"p{case['pages']}")
+    return '/'.join(parts)
+
+
+@functools.lru_cache(maxsize=None)
+def _pdf_cover_size(pages):
+    with tempfile.TemporaryDirectory() as workdir:
+        return os.path.getsize(create_cover_pdf(os.path.join(workdir, 'cover.pdf'), pages))
+
+
+def capacity(case):
+    """
+    载体可容纳的最大负载字节数（不含4字节长度头部）。
+    PDF 为上限估计：随机负载不可压缩，嵌入数据不能超过原文件大小的5%；
+    写回后的大小变化还要在±5%以内，所以接近上限的用例仍可能失败
+    """
+    if case['carrier'] in ('image', 'video'):
+        width, height = parse_resolution(case['resolution'])
+        return width * height * 3 * case['n_bits'] // 8 - 4
+    from hide.pdf_steganography import calculate_size_limit
+    return max(0, int(calculate_size_limit(_pdf_cover_size(case['pages']))) - 4)
+
+
+def _peak_rss():
+    """当前进程的峰值RSS（字节）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为KB，macOS 为字节
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_case(case, workdir):
+    """在独立子进程中执行单个用例，返回测量结果"""
+    from hide.steg import embed_message, extract_message
+
+    carrier = case['carrier']
+    if carrier == 'image':
+        width, height = parse_resolution(case['resolution'])
+        cover = create_cover_image(os.path.join(workdir, 'cover.png'), width, height)
+        output = os.path.join(workdir, 'stego.png')
+    elif carrier == 'video':
+        width, height = parse_resolution(case['resolution'])
+        cover = create_cover_video(os.path.join(workdir, 'cover.avi'), width, height)
+        output = os.path.join(workdir, 'stego.avi')
+    else:
+        cover = create_cover_pdf(os.path.join(workdir, 'cover.pdf'), case['pages'])
+        output = os.path.join(workdir, 'stego.pdf')
+
+    payload = os.urandom(case['size'])
+    kwargs = {'n_bits': case['n_bits']} if carrier == 'image' else {}
+    root, ext = os.path.splitext(output)
+
+    # 载体模块会打印大量过程信息，基准测试时屏蔽
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        # 载体模块及 cv2/numpy/skimage/PyPDF2 都在首次调用时才导入，先用小负载预热一次，不计入耗时
+        embed_message(carrier, cover, root + '.warmup' + ext, b'warmup', **kwargs)
+        extract_message(carrier, root + '.warmup' + ext, **kwargs)
+
+        t0 = time.perf_counter()
+        embed_message(carrier, cover, output, payload, **kwargs)
+        t1 = time.perf_counter()
+        extracted = extract_message(carrier, output, **kwargs)
+        t2 = time.perf_counter()
+
+    embed_s = t1 - t0
+    extract_s = t2 - t1
+    return {
+        'embed_s': embed_s,
+        'extract_s': extract_s,
+        'embed_mb_s': case['size'] / embed_s / 1024 ** 2 if embed_s else None,
+        'extract_mb_s': case['size'] / extract_s / 1024 ** 2 if extract_s else None,
+        'peak_rss': _peak_rss(),
+        'cover_size': os.path.getsize(cover),
+        'output_size': os.path.getsize(output),
+        'ok': extracted == payload,
+    }
+
+
+def _run_isolated(case):
+    """子进程入口：使用独立临时目录，保证峰值RSS只统计本用例"""
+    with tempfile.TemporaryDirectory(prefix='hide_bench_') as workdir:
+        return run_case(case, workdir)
+
+
+def run_benchmark(cases, repeat=1):
+    """依次执行所有用例，每次重复都在新的子进程中运行"""
+    ctx = multiprocessing.get_context('spawn')
+    results = []
+    for case in cases:
+        key = case_key(case)
+        record = dict(case, key=key)
+        limit = capacity(case)
+        if case['size'] > limit:
+            record.update(status='skipped', reason=f"超出载体容量 ({limit} 字节)")
+            print(f"{key:<32} 跳过: 超出载体容量")
+            results.append(record)
+            continue
+
+        samples = []
+        try:
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    samples.append(pool.submit(_run_isolated, case).result())
+        except Exception as e:
+            record.update(status='error', reason=str(e).splitlines()[0] if str(e) else repr(e))
+            print(f"{key:<32} 失败: {record['reason']}")
+            results.append(record)
+            continue
+
+        # 取耗时最短的一次，降低调度抖动影响
+        best = min(samples, key=lambda s: s['embed_s'] + s['extract_s'])
+        record.update(best)
+        record['status'] = 'ok' if all(s['ok'] for s in samples) else 'mismatch'
+        results.append(record)
+        rss = f"{record['peak_rss'] / 1024 ** 2:.1f}MB" if record['peak_rss'] else '-'
+        print(f"{key:<32} 嵌入 {record['embed_s'] * 1000:10.1f} ms | "
+              f"提取 {record['extract_s'] * 1000:10.1f} ms | "
+              f"{record['embed_mb_s']:8.3f} MB/s | RSS {rss:>9} | "
+              f"输出 {record['output_size']:>11,} B | {record['status']}")
+    return results
+
+
+def compare_with_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """与基线对比，返回回归列表 [(key, metric, old, new, ratio)]"""
+    old_by_key = {r['key']: r for r in baseline.get('results', []) if r.get('status') == 'ok'}
+    regressions = []
+    for record in results:
+        old = old_by_key.get(record['key'])
+        if record.get('status') != 'ok' or old is None:
+            continue
+        for metric in REGRESSION_METRICS:
+            old_value, new_value = old.get(metric), record.get(metric)
+            if not old_value or new_value is None:
+                continue
+            ratio = new_value / old_value - 1
+            if ratio > threshold:
+                regressions.append((record['key'], metric, old_value, new_value, ratio))
+    return regressions
+
+
+def _split(text, convert=str):
+    return [convert(item) for item in text.split(',') if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m hide.bench', description='隐写性能基准测试')
+    parser.add_argument('--carriers', default=','.join(DEFAULT_CARRIERS), help='载体类型，逗号分隔')
+    parser.add_argument('--sizes', default=','.join(DEFAULT_SIZES), help='负载大小，如 1K,1M,100M')
+    parser.add_argument('--n-bits', default=','.join(map(str, DEFAULT_N_BITS)), help='图像LSB位数')
+    parser.add_argument('--resolutions', default=','.join(DEFAULT_RESOLUTIONS), help='图像/视频分辨率')
+    parser.add_argument('--pages', default=','.join(map(str, DEFAULT_PAGES)), help='PDF页数')
+    parser.add_argument('--repeat', type=int, default=1, help='每个用例重复次数（取最优）')
+    parser.add_argument('--output', default='hide_bench_results.json', help='结果JSON路径')
+    parser.add_argument('--baseline', help='基线JSON路径，存在回归时返回非零退出码')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='回归阈值（相对基线的增幅，默认0.10即10%%）')
+    parser.add_argument('--save-baseline', help='将本次结果保存为基线')
+    args = parser.parse_args(argv)
+
+    cases = build_cases(
+        _split(args.carriers),
+        _split(args.sizes, parse_size),
+        _split(args.n_bits, int),
+        _split(args.resolutions),
+        _split(args.pages, int),
+    )
+    print(f"共 {len(cases)} 个用例")
+    results = run_benchmark(cases, repeat=args.repeat)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\n结果已保存: {args.output}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"基线已保存: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ 发现 {len(regressions)} 项性能回归（阈值 {args.threshold:.0%}）:")
+            for key, metric, old, new, ratio in regressions:
+                print(f"  {key:<32} {metric:<10} {old:.4g} -> {new:.4g} (+{ratio:.1%})")
+            return 1
+        print(f"\n✅ 未发现超过 {args.threshold:.0%} 的性能回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
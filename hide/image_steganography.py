@@ -1,9 +1,56 @@
-import cv2
-import numpy as np
 import os
-from skimage.metrics import structural_similarity as ssim
 from hide.utils import get_image_path, get_output_image_path, get_extracted_image_path
 
+def embed_bits(pixels, data_bytes, n_bits=1):
+    """
+    将二进制数据按LSB原地写入像素数组（向量化实现）
+    :param pixels: uint8 像素数组（任意形状，按C顺序逐像素、逐通道写入），会被原地修改
+    :param data_bytes: 要嵌入的二进制数据
+    :param n_bits: 每个通道值嵌入的位数（1~8），比特按高位在前依次填入
+    """
+    import numpy as np
+
+    flat = pixels.reshape(-1)
+    bits = np.unpackbits(np.frombuffer(data_bytes, dtype=np.uint8))
+    data_len = len(bits)
+
+    # 计算可嵌入的最大比特数
+    max_bits = flat.size * n_bits
+    if data_len > max_bits:
+        raise ValueError(f"数据过大，无法嵌入。最大可嵌入 {max_bits} 位，当前数据 {data_len} 位")
+
+    # 不足 n_bits 的尾部补0，每 n_bits 位合成一个值
+    pad = -data_len % n_bits
+    if pad:
+        bits = np.concatenate([bits, np.zeros(pad, dtype=np.uint8)])
+    groups = bits.reshape(-1, n_bits)
+    weights = (1 << np.arange(n_bits - 1, -1, -1)).astype(np.uint8)
+    values = (groups * weights).sum(axis=1, dtype=np.uint8)
+
+    count = len(values)
+    mask = np.uint8((0xFF << n_bits) & 0xFF)
+    flat[:count] = (flat[:count] & mask) | values
+    return pixels
+
+def extract_bits(pixels, data_length_bytes, n_bits=1):
+    """
+    从像素数组中按LSB读取指定长度的二进制数据（向量化实现）
+    :param pixels: uint8 像素数组
+    :param data_length_bytes: 要读取的字节数
+    :param n_bits: 每个通道值嵌入的位数（与嵌入时一致）
+    :return: 提取出的二进制数据（bytes类型）
+    """
+    import numpy as np
+
+    flat = pixels.reshape(-1)
+    total_bits = data_length_bytes * 8
+    count = -(-total_bits // n_bits)
+    if count > flat.size:
+        raise ValueError(f"请求的数据超出图片容量: {data_length_bytes} 字节")
+    values = flat[:count] & np.uint8((1 << n_bits) - 1)
+    bits = np.unpackbits(values[:, None], axis=1)[:, 8 - n_bits:].reshape(-1)[:total_bits]
+    return np.packbits(bits).tobytes()
+
 def embed_data(image_path, data_bytes, output_path, n_bits=1):
     """
     将二进制数据嵌入到图片中
@@ -12,39 +59,14 @@ def embed_data(image_path, data_bytes, output_path, n_bits=1):
     :param output_path: 嵌入后图片保存路径
     :param n_bits: 每个像素嵌入的位数（1~8）
     """
+    import cv2
     # 读取图片
     img = cv2.imread(image_path, cv2.IMREAD_COLOR)
     if img is None:
         raise ValueError("无法读取图片，请检查路径是否正确")
     original_img = img.copy()
-    # 将二进制数据转换为比特流
-    bit_stream = ''.join([format(byte, '08b') for byte in data_bytes])
-    data_len = len(bit_stream)
-
-    # 计算图片可嵌入的最大比特数
-    max_bits = img.shape[0] * img.shape[1] * 3 * n_bits  # 3通道
-    if data_len > max_bits:
-        raise ValueError(f"数据过大，无法嵌入。最大可嵌入 {max_bits} 位，当前数据 {data_len} 位")
-
-    data_index = 0
-    for i in range(img.shape[0]):
-        for j in range(img.shape[1]):
-            for k in range(3):  # RGB三通道
-                if data_index < data_len:
-                    pixel = img[i, j, k]
-                    # 清除最低n位
-                    pixel = (pixel >> n_bits) << n_bits
-                    # 提取n位数据
-                    bits = bit_stream[data_index:data_index + n_bits]
-                    # 嵌入数据
-                    img[i, j, k] = pixel | int(bits, 2)
-                    data_index += n_bits
-                else:
-                    break
-            if data_index >= data_len:
-                break
-        if data_index >= data_len:
-            break
+    # 按RGB三通道逐像素嵌入
+    embed_bits(img, data_bytes, n_bits=n_bits)
 
     # 保存嵌入后的图片
     cv2.imwrite(output_path, img, [cv2.IMWRITE_PNG_COMPRESSION, 3])  # 启用压缩，默认级别为3，平衡速度和压缩率
@@ -67,40 +89,27 @@ def extract_data(image_path, data_length_bytes, n_bits=1):
     :param n_bits: 每个像素嵌入的位数（与嵌入时一致）
     :return: 提取出的二进制数据（bytes类型）
     """
+    import cv2
     # 读取图片
     img = cv2.imread(image_path, cv2.IMREAD_COLOR)
     if img is None:
         raise ValueError("无法读取图片，请检查路径是否正确")
+    return extract_bits(img, data_length_bytes, n_bits=n_bits)
 
-    # 计算需要提取的比特数
-    total_bits = data_length_bytes * 8
-    bit_stream = ''
-    data_index = 0
-
-    for i in range(img.shape[0]):
-        for j in range(img.shape[1]):
-            for k in range(3):  # RGB三通道
-                if data_index < total_bits:
-                    pixel = img[i, j, k]
-                    # 提取最低n位
-                    bits = format(pixel & ((1 << n_bits) - 1), f'0{n_bits}b')
-                    bit_stream += bits
-                    data_index += n_bits
-                else:
-                    break
-            if data_index >= total_bits:
-                break
-        if data_index >= total_bits:
-            break
-
-    # 将比特流转换为字节数据
-    data_bytes = bytearray()
-    for i in range(0, len(bit_stream), 8):
-        byte = bit_stream[i:i + 8]
-        if len(byte) == 8:
-            data_bytes.append(int(byte, 2))
-
-    return bytes(data_bytes)
+def embed_array(pixels, message: bytes, n_bits=1):
+    """
+    统一接口的数组版本：在像素数组（图片或视频帧）中原地嵌入 message
+    自动在数据前加4字节长度头部
+    """
+    length_bytes = len(message).to_bytes(4, 'big')
+    return embed_bits(pixels, length_bytes + message, n_bits=n_bits)
+
+def extract_array(pixels, n_bits=1) -> bytes:
+    """
+    统一接口的数组版本：从像素数组中提取 embed_array 嵌入的消息
+    """
+    data_length = int.from_bytes(extract_bits(pixels, 4, n_bits=n_bits), 'big')
+    return extract_bits(pixels, 4 + data_length, n_bits=n_bits)[4:]
 
 def embed_message(input_path, output_path, message: bytes, n_bits=1):
     """
@@ -132,6 +141,7 @@ def print_file_size(file_path):
     print(f"文件大小: {size} 字节")
 def calculate_psnr(img1, img2):
     """计算两幅图像的PSNR值"""
+    import numpy as np
     mse = np.mean((img1 - img2) ** 2)
     if mse == 0:
         return float('inf')
@@ -141,6 +151,8 @@ def calculate_psnr(img1, img2):
 
 def calculate_ssim(img1, img2):
     """计算两幅图像的SSIM值（多通道）"""
+    import cv2
+    from skimage.metrics import structural_similarity as ssim
     # 转换为灰度图像计算SSIM（单通道）
     gray1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
     gray2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
@@ -1,5 +1,4 @@
 import os
-from PyPDF2 import PdfReader, PdfWriter
 import binascii
 import zlib
 import hashlib
@@ -17,6 +16,8 @@ def embed_binary_in_pdf(input_pdf, binary_data, output_pdf, metadata_key="/Hidde
     :param output_pdf: 输出PDF路径
     :param metadata_key: 元数据键名
     """
+    from PyPDF2 import PdfReader, PdfWriter
+
     # 获取原始文件大小
     original_size = os.path.getsize(input_pdf)
     max_allowed = calculate_size_limit(original_size)
@@ -72,6 +73,8 @@ def embed_binary_in_pdf(input_pdf, binary_data, output_pdf, metadata_key="/Hidde
 
 def extract_binary_from_pdf(input_pdf, metadata_key="/HiddenData"):
     """从PDF提取二进制数据（自动处理压缩）"""
+    from PyPDF2 import PdfReader
+
     reader = PdfReader(input_pdf)
     if metadata_key not in reader.metadata:
         raise ValueError(f"未找到元数据键: {metadata_key}")
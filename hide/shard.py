@@ -0,0 +1,145 @@
+"""
+负载分片：把一个载体放不下的负载拆成带编号的分片，并行嵌入多个载体，
+接收端按任意到达顺序重组。
+
+分片格式（大端）:
+    MAGIC(4) | 版本(1) | 消息ID(8) | 分片序号(2) | 分片总数(2) | 负载总长(4) | CRC32(4) | 分片数据
+"""
+
+import os
+import struct
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+
+MAGIC = b'SHRD'
+VERSION = 1
+HEADER = struct.Struct('>4sB8sHHII')
+MAX_SHARDS = 0xFFFF
+COMPLETED_MAX = 1024  # 记住的已重组消息ID数量上限
+
+Shard = namedtuple('Shard', ['message_id', 'index', 'total', 'payload_len', 'data'])
+
+
+def split_payload(payload: bytes, count=None, shard_size=None, message_id=None):
+    """
+    把负载拆成分片字节串列表
+    count: 分片数；shard_size: 每片最大字节数（二选一，都不给时只拆成1片）
+    """
+    if shard_size:
+        count = max(1, -(-len(payload) // shard_size))
+    count = max(1, count or 1)
+    if count > MAX_SHARDS:
+        raise ValueError(f"分片数过多: {count} (最多 {MAX_SHARDS})")
+    message_id = message_id or os.urandom(8)
+    size = -(-len(payload) // count) if payload else 0
+
+    shards = []
+    for index in range(count):
+        data = payload[index * size:(index + 1) * size]
+        header = HEADER.pack(MAGIC, VERSION, message_id, index, count, len(payload), zlib.crc32(data))
+        shards.append(header + data)
+    return shards
+
+
+def is_shard(data) -> bool:
+    return len(data) >= HEADER.size and bytes(data[:4]) == MAGIC
+
+
+def parse_shard(data) -> Shard:
+    """解析分片字节串，校验失败抛出 ValueError"""
+    if not is_shard(data):
+        raise ValueError("不是有效的分片数据")
+    magic, version, message_id, index, total, payload_len, crc = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"不支持的分片版本: {version}")
+    body = bytes(data[HEADER.size:])
+    if zlib.crc32(body) != crc:
+        raise ValueError(f"分片 {index + 1}/{total} 校验失败")
+    if index >= total:
+        raise ValueError(f"分片序号越界: {index}/{total}")
+    return Shard(message_id, index, total, payload_len, body)
+
+
+class ShardAssembler:
+    """
+    按消息ID收集分片，集齐后按序号拼接；分片可按任意顺序到达，重复分片被忽略。
+    已重组的消息ID在 timeout 内保留（最多 COMPLETED_MAX 个），迟到的重复分片不会重新建立待重组条目
+    """
+
+    def __init__(self, timeout=600):
+        self.timeout = timeout
+        self._pending = {}  # message_id -> (首个分片到达时间, {index: data}, total, payload_len)
+        self._completed = OrderedDict()  # message_id -> 重组完成时间（按完成顺序）
+
+    def add(self, shard):
+        """加入一个分片（字节串或 Shard），集齐时返回完整负载，否则返回 None"""
+        if not isinstance(shard, Shard):
+            shard = parse_shard(shard)
+        self._expire()
+        if shard.message_id in self._completed:
+            return None
+
+        entry = self._pending.get(shard.message_id)
+        if entry is None:
+            entry = (time.monotonic(), {}, shard.total, shard.payload_len)
+            self._pending[shard.message_id] = entry
+        _, parts, total, payload_len = entry
+        if (shard.total, shard.payload_len) != (total, payload_len):
+            raise ValueError("分片头部与同一消息的其他分片不一致")
+        parts[shard.index] = shard.data
+
+        if len(parts) < total:
+            return None
+        del self._pending[shard.message_id]
+        payload = b''.join(parts[i] for i in range(total))
+        if len(payload) != payload_len:
+            raise ValueError(f"重组后长度不符: {len(payload)} != {payload_len}")
+        self._completed[shard.message_id] = time.monotonic()
+        if len(self._completed) > COMPLETED_MAX:
+            self._completed.popitem(last=False)
+        return payload
+
+    def is_completed(self, message_id):
+        """该消息是否已重组（迟到的分片会被忽略）"""
+        return message_id in self._completed
+
+    def progress(self, message_id):
+        """返回 (已收到分片数, 分片总数)，未知消息返回 None"""
+        entry = self._pending.get(message_id)
+        return (len(entry[1]), entry[2]) if entry else None
+
+    def _expire(self):
+        now = time.monotonic()
+        for message_id in [m for m, e in self._pending.items() if now - e[0] > self.timeout]:
+            del self._pending[message_id]
+        while self._completed and now - next(iter(self._completed.values())) > self.timeout:
+            self._completed.popitem(last=False)
+
+
+async def embed_sharded_async(carrier_type, input_paths, output_dir, payload: bytes, shard_size=None, **kwargs):
+    """
+    把 payload 拆成分片并行嵌入多个载体，返回隐写文件路径列表（按分片序号）
+    input_paths: 载体路径列表；给出 shard_size 时分片数按大小计算，载体循环使用
+    """
+    import asyncio
+    from .steg import embed_message_async
+
+    if not input_paths:
+        raise ValueError("至少需要一个载体文件")
+    count = None if shard_size else len(input_paths)
+    shards = split_payload(payload, count=count, shard_size=shard_size)
+    message_id = shards[0][5:13].hex()
+
+    os.makedirs(output_dir, exist_ok=True)
+    jobs, outputs = [], []
+    for index, shard in enumerate(shards):
+        cover = input_paths[index % len(input_paths)]
+        stem, ext = os.path.splitext(os.path.basename(cover))
+        if carrier_type == 'video':
+            ext = '.avi'  # FFV1 输出
+        output = os.path.join(output_dir, f"shard_{message_id}_{index}_{stem}{ext}")
+        outputs.append(output)
+        jobs.append(embed_message_async(carrier_type, cover, output, shard, **kwargs))
+    await asyncio.gather(*jobs)
+    return outputs
@@ -0,0 +1,144 @@
+"""
+共享内存传递：主进程与隐写工作进程之间通过 multiprocessing.shared_memory
+传递图像、视频帧和负载，跨进程边界只传递描述符（块名、形状、dtype），
+避免多MB的 ndarray 被 pickle 复制两次。
+"""
+
+import threading
+from collections import OrderedDict, deque, namedtuple
+from multiprocessing import shared_memory
+
+# 跨进程传递的描述符：块名、数组形状、dtype字符串、有效字节数
+ShmDescriptor = namedtuple('ShmDescriptor', ['name', 'shape', 'dtype', 'nbytes'])
+
+MIN_BLOCK_SIZE = 64 * 1024
+DEFAULT_MAX_BLOCKS = 8
+
+
+def _round_up(nbytes):
+    """按2的幂向上取整，便于不同大小的任务复用同一块"""
+    size = MIN_BLOCK_SIZE
+    while size < nbytes:
+        size <<= 1
+    return size
+
+
+class ShmRing:
+    """
+    共享内存块的小型环形分配器（主进程使用）
+
+    释放的块按释放顺序放回环中，下次申请时优先复用容量足够的空闲块；
+    块总数超过 max_blocks 时回收最早释放的空闲块。
+    """
+
+    def __init__(self, max_blocks=DEFAULT_MAX_BLOCKS):
+        self.max_blocks = max_blocks
+        self._free = deque()
+        self._in_use = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, nbytes):
+        """申请至少 nbytes 字节的共享内存块"""
+        with self._lock:
+            for shm in self._free:
+                if shm.size >= nbytes:
+                    self._free.remove(shm)
+                    self._in_use[shm.name] = shm
+                    return shm
+            # 没有合适的空闲块：必要时回收最旧的空闲块再新建
+            while self._free and len(self._free) + len(self._in_use) >= self.max_blocks:
+                self._destroy(self._free.popleft())
+            shm = shared_memory.SharedMemory(create=True, size=_round_up(max(nbytes, 1)))
+            self._in_use[shm.name] = shm
+            return shm
+
+    def release(self, shm):
+        """归还共享内存块，供后续任务复用"""
+        with self._lock:
+            if self._in_use.pop(shm.name, None) is not None:
+                self._free.append(shm)
+
+    def close(self):
+        """释放全部共享内存块"""
+        with self._lock:
+            blocks = list(self._free) + list(self._in_use.values())
+            self._free.clear()
+            self._in_use.clear()
+        for shm in blocks:
+            self._destroy(shm)
+
+    @property
+    def block_count(self):
+        with self._lock:
+            return len(self._free) + len(self._in_use)
+
+    @staticmethod
+    def _destroy(shm):
+        try:
+            shm.close()
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    # ------------------------------------------------------------------
+    # 数据写入
+    # ------------------------------------------------------------------
+
+    def put_array(self, array):
+        """复制 ndarray 到共享内存块，返回 (块, 描述符)"""
+        import numpy as np
+
+        shm = self.acquire(array.nbytes)
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+        view[...] = array
+        return shm, ShmDescriptor(shm.name, array.shape, array.dtype.str, array.nbytes)
+
+    def put_bytes(self, data):
+        """复制字节串到共享内存块，返回 (块, 描述符)"""
+        shm = self.acquire(len(data))
+        shm.buf[:len(data)] = data
+        return shm, ShmDescriptor(shm.name, (len(data),), '|u1', len(data))
+
+    def alloc(self, nbytes):
+        """申请供工作进程写入结果的空白块，返回 (块, 描述符)"""
+        shm = self.acquire(nbytes)
+        return shm, ShmDescriptor(shm.name, (nbytes,), '|u1', nbytes)
+
+
+# ---------------------------------------------------------------------------
+# 工作进程侧：按块名缓存映射，同一块被多个任务复用时不必重复打开
+# ---------------------------------------------------------------------------
+
+MAX_ATTACHED = 16
+_attached = OrderedDict()
+
+
+def _attach_block(name):
+    shm = _attached.get(name)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = shm
+        # 主进程回收的旧块在这里只是多占一个映射，超出上限时关闭最旧的
+        while len(_attached) > MAX_ATTACHED:
+            _, old = _attached.popitem(last=False)
+            try:
+                old.close()
+            except BufferError:
+                pass
+    else:
+        _attached.move_to_end(name)
+    return shm
+
+
+def attach_array(desc):
+    """按描述符获取共享内存中的 ndarray 视图（不复制）"""
+    import numpy as np
+
+    shm = _attach_block(desc.name)
+    return np.ndarray(desc.shape, dtype=np.dtype(desc.dtype), buffer=shm.buf)
+
+
+def attach_buffer(desc):
+    """按描述符获取共享内存中的 memoryview（不复制）"""
+    shm = _attach_block(desc.name)
+    return shm.buf[:desc.nbytes]
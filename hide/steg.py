@@ -1,38 +1,260 @@
 # hide/steg.py
 
-def embed_message(carrier_type, input_path, output_path, message: bytes):
+import atexit
+import os
+import threading
+
+def embed_message(carrier_type, input_path, output_path, message: bytes, **kwargs):
     """
     carrier_type: 'image' | 'pdf' | 'video'
     input_path: 原始载体文件路径
     output_path: 隐写输出文件路径
     message: 要嵌入的字节串
+    kwargs: 透传给具体载体实现的参数（如图像的 n_bits）
     """
     if carrier_type == 'image':
         from .image_steganography import embed_message as image_embed
-        return image_embed(input_path, output_path, message)
+        return image_embed(input_path, output_path, message, **kwargs)
     elif carrier_type == 'pdf':
         from .pdf_steganography import embed_message as pdf_embed
-        return pdf_embed(input_path, output_path, message)
+        return pdf_embed(input_path, output_path, message, **kwargs)
     elif carrier_type == 'video':
         from .video_steganography import embed_message as video_embed
-        return video_embed(input_path, output_path, message)
+        return video_embed(input_path, output_path, message, **kwargs)
     else:
         raise ValueError(f"不支持的载体类型: {carrier_type}")
 
-def extract_message(carrier_type, stego_path):
+def extract_message(carrier_type, stego_path, **kwargs):
     """
     carrier_type: 'image' | 'pdf' | 'video'
     stego_path: 隐写文件路径
+    kwargs: 透传给具体载体实现的参数（如图像的 n_bits）
     return: 提取出的字节串
     """
     if carrier_type == 'image':
         from .image_steganography import extract_message as image_extract
-        return image_extract(stego_path)
+        return image_extract(stego_path, **kwargs)
     elif carrier_type == 'pdf':
         from .pdf_steganography import extract_message as pdf_extract
-        return pdf_extract(stego_path)
+        return pdf_extract(stego_path, **kwargs)
     elif carrier_type == 'video':
         from .video_steganography import extract_message as video_extract
-        return video_extract(stego_path)
+        return video_extract(stego_path, **kwargs)
     else:
-        raise ValueError(f"不支持的载体类型: {carrier_type}")
\ No newline at end of file
+        raise ValueError(f"不支持的载体类型: {carrier_type}")
+
+# ---------------------------------------------------------------------------
+# 异步接口：在共享进程池中执行隐写，避免阻塞事件循环（心跳/ping）
+# asyncio / multiprocessing 在首次使用时才导入，保持纯文本聊天的启动速度；
+# 负载和提取结果经共享内存（hide.shm.ShmRing）传递，只有描述符跨越进程边界
+# ---------------------------------------------------------------------------
+
+# 进程池大小与同时进行的隐写任务数上限，可通过环境变量调整
+MAX_WORKERS = int(os.environ.get('E2E_STEG_WORKERS', 0)) or min(4, os.cpu_count() or 1)
+MAX_CONCURRENCY = int(os.environ.get('E2E_STEG_CONCURRENCY', 0)) or MAX_WORKERS
+EXTRACT_BLOCK_MAX = 64 * 1024 * 1024  # 提取结果共享内存块的上限，更大的结果直接 pickle 返回
+
+_executor = None
+_executor_lock = threading.Lock()
+_semaphore = None
+_semaphore_loop = None
+_ring = None
+
+
+def get_executor():
+    """获取共享进程池，首次调用时才启动"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn 避免在含事件循环/线程的进程中 fork
+            _executor = ProcessPoolExecutor(
+                max_workers=MAX_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def get_shm_ring():
+    """获取主进程的共享内存分配器，首次调用时创建"""
+    global _ring
+    with _executor_lock:
+        if _ring is None:
+            from .shm import ShmRing
+            _ring = ShmRing()
+        return _ring
+
+
+def shutdown_executor(wait=True):
+    """关闭共享进程池，未开始的任务会被取消，并释放共享内存块"""
+    global _executor, _ring
+    with _executor_lock:
+        executor, _executor = _executor, None
+        ring, _ring = _ring, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+    if ring is not None:
+        ring.close()
+
+
+atexit.register(shutdown_executor, wait=False)
+
+
+def set_concurrency_limit(limit):
+    """设置同时进行的异步隐写任务上限（对之后获取的信号量生效）"""
+    global MAX_CONCURRENCY, _semaphore
+    MAX_CONCURRENCY = max(1, int(limit))
+    _semaphore = None
+
+
+def _get_semaphore():
+    """每个事件循环一个信号量，限制并发任务数"""
+    global _semaphore, _semaphore_loop
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+async def _run_in_pool(func, *args, timeout=None, cleanup=None, **kwargs):
+    """在进程池中执行 func，支持取消和超时
+
+    取消时若任务尚未开始则直接从队列移除；已在子进程中运行的任务会继续执行完，
+    但结果被丢弃，调用方立即收到 CancelledError。
+    cleanup: 出错/取消时，在子进程真正结束该任务后调用（用于归还共享内存块）；
+    正常返回时由调用方读取结果后自行清理。
+    """
+    import asyncio
+
+    async with _get_semaphore():
+        future = get_executor().submit(func, *args, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except BaseException:
+            future.cancel()
+            if cleanup is not None:
+                future.add_done_callback(lambda _: cleanup())
+            raise
+
+
+def _embed_message_job(carrier_type, input_path, output_path, payload_desc, **kwargs):
+    """工作进程：负载从共享内存块读取，不经 pickle 传递"""
+    from .shm import attach_buffer
+
+    return embed_message(carrier_type, input_path, output_path, bytes(attach_buffer(payload_desc)), **kwargs)
+
+
+def _extract_message_job(carrier_type, stego_path, out_desc, **kwargs):
+    """工作进程：提取结果写入共享内存块并返回长度；超出块大小时直接返回字节串"""
+    from .shm import attach_buffer
+
+    data = extract_message(carrier_type, stego_path, **kwargs)
+    out = attach_buffer(out_desc)
+    if len(data) > len(out):
+        return bytes(data)
+    out[:len(data)] = data
+    return len(data)
+
+
+async def embed_message_async(carrier_type, input_path, output_path, message: bytes, timeout=None, **kwargs):
+    """embed_message 的异步版本，在共享进程池中执行；负载经共享内存传给工作进程"""
+    ring = get_shm_ring()
+    payload_shm, payload_desc = ring.put_bytes(message)
+
+    def cleanup():
+        ring.release(payload_shm)
+
+    result = await _run_in_pool(_embed_message_job, carrier_type, input_path, output_path, payload_desc,
+                                timeout=timeout, cleanup=cleanup, **kwargs)
+    cleanup()
+    return result
+
+
+async def extract_message_async(carrier_type, stego_path, timeout=None, **kwargs):
+    """
+    extract_message 的异步版本，在共享进程池中执行；结果经共享内存传回。
+    加密负载不可压缩，嵌入的数据不会超过隐写文件本身的大小，结果块按文件大小申请（有上限）
+    """
+    ring = get_shm_ring()
+    out_shm, out_desc = ring.alloc(min(os.path.getsize(stego_path), EXTRACT_BLOCK_MAX))
+
+    def cleanup():
+        ring.release(out_shm)
+
+    result = await _run_in_pool(_extract_message_job, carrier_type, stego_path, out_desc,
+                                timeout=timeout, cleanup=cleanup, **kwargs)
+    try:
+        return result if isinstance(result, bytes) else bytes(out_shm.buf[:result])
+    finally:
+        cleanup()
+
+
+# ---------------------------------------------------------------------------
+# 数组接口：图像/视频帧和负载经共享内存传给工作进程，只有描述符跨越进程边界
+# ---------------------------------------------------------------------------
+
+def _embed_array_job(pixels_desc, payload_desc, n_bits):
+    """工作进程：在共享内存中的像素数组上原地嵌入"""
+    from .image_steganography import embed_array
+    from .shm import attach_array, attach_buffer
+
+    embed_array(attach_array(pixels_desc), attach_buffer(payload_desc), n_bits=n_bits)
+
+
+def _extract_array_job(pixels_desc, out_desc, n_bits):
+    """工作进程：从共享内存中的像素数组提取消息，写入结果块，返回消息长度"""
+    from .image_steganography import extract_array
+    from .shm import attach_array, attach_buffer
+
+    data = extract_array(attach_array(pixels_desc), n_bits=n_bits)
+    out = attach_buffer(out_desc)
+    if len(data) > len(out):
+        raise ValueError(f"提取的数据长度 {len(data)} 超出载体容量 {len(out)}")
+    out[:len(data)] = data
+    return len(data)
+
+
+async def embed_array_async(pixels, message: bytes, n_bits=1, timeout=None):
+    """
+    在图像或视频帧数组中嵌入 message（自动加4字节长度头部），返回嵌入后的新数组
+    pixels: uint8 ndarray，输入数组不会被修改
+    """
+    import numpy as np
+
+    ring = get_shm_ring()
+    pixels_shm, pixels_desc = ring.put_array(pixels)
+    payload_shm, payload_desc = ring.put_bytes(message)
+
+    def cleanup():
+        ring.release(pixels_shm)
+        ring.release(payload_shm)
+
+    await _run_in_pool(_embed_array_job, pixels_desc, payload_desc, n_bits,
+                       timeout=timeout, cleanup=cleanup)
+    try:
+        return np.ndarray(pixels.shape, dtype=pixels.dtype, buffer=pixels_shm.buf).copy()
+    finally:
+        cleanup()
+
+
+async def extract_array_async(pixels, n_bits=1, timeout=None) -> bytes:
+    """从图像或视频帧数组中提取 embed_array_async 嵌入的消息"""
+    ring = get_shm_ring()
+    pixels_shm, pixels_desc = ring.put_array(pixels)
+    out_shm, out_desc = ring.alloc(pixels.size * n_bits // 8)
+
+    def cleanup():
+        ring.release(pixels_shm)
+        ring.release(out_shm)
+
+    length = await _run_in_pool(_extract_array_job, pixels_desc, out_desc, n_bits,
+                                timeout=timeout, cleanup=cleanup)
+    try:
+        return bytes(out_shm.buf[:length])
+    finally:
+        cleanup()
@@ -1,5 +1,3 @@
-import cv2
-import numpy as np
 import subprocess
 import os
 import time
@@ -13,6 +11,9 @@ EXTRACTED_FILE = get_extracted_video_path('extracted_secret.bin')
 
 def ffv1_embed(input_video, data_bytes, output_video):
     """使用FFV1编码的极速隐写方案，data_bytes为bytes"""
+    import cv2
+    import numpy as np
+
     # 1. 读取并处理第一帧
     start_time = time.time()
     cap = cv2.VideoCapture(input_video)
@@ -40,7 +41,9 @@ def ffv1_embed(input_video, data_bytes, output_video):
     start_time = time.time()
     height, width = frame.shape[:2]
     fourcc = cv2.VideoWriter_fourcc(*'FFV1')  # 修改为FFV1
-    writer = cv2.VideoWriter('temp.avi', fourcc, 30, (width, height), isColor=True)
+    # 临时文件放在输出文件旁，避免并发嵌入时互相覆盖
+    temp_path = output_video + '.tmp.avi'
+    writer = cv2.VideoWriter(temp_path, fourcc, 30, (width, height), isColor=True)
     if not writer.isOpened():
         raise RuntimeError("FFV1编码器初始化失败，请检查OpenCV支持")
     writer.write(embedded_frame)
@@ -49,9 +52,7 @@ def ffv1_embed(input_video, data_bytes, output_video):
 
     # 4. 简化处理：直接使用嵌入的帧
     start_time = time.time()
-    import shutil
-    shutil.copy('temp.avi', output_video)
-    os.remove('temp.avi')
+    os.replace(temp_path, output_video)
     print(f"使用简化处理耗时: {time.time() - start_time:.2f} 秒")
 
     # 验证
@@ -61,6 +62,9 @@ def ffv1_embed(input_video, data_bytes, output_video):
 
 def ffv1_extract(stego_video, data_length):
     """从视频第一帧提取指定长度的二进制数据"""
+    import cv2
+    import numpy as np
+
     cap = cv2.VideoCapture(stego_video)
     ret, frame = cap.read()
     cap.release()
@@ -93,6 +97,9 @@ def extract_message(stego_path) -> bytes:
 
 def verify_embedding(original_video, embedded_video, data_bytes):
     """验证数据完整性"""
+    import cv2
+    import numpy as np
+
     # 提取第一帧
     start_time = time.time()
     cap = cv2.VideoCapture(embedded_video)
@@ -1,15 +1,44 @@
 #ifndef SM2_ECDH_H
 #define SM2_ECDH_H
 
+#include <stdint.h>
+
 #ifdef __cplusplus
 extern "C" {
 #endif
 
+// 编译为 Windows 动态库时导出符号（CMake 共享库目标会定义 SM2_ECDH_SHARED）
+#if defined(_WIN32) && defined(SM2_ECDH_SHARED)
+#define SM2_ECDH_API __declspec(dllexport)
+#else
+#define SM2_ECDH_API
+#endif
+
+#define SM2_RAW_PRIVATE_KEY_SIZE 32 // 私钥 d，大端
+#define SM2_RAW_PUBLIC_KEY_SIZE  64 // 公钥 x || y，大端，不含 0x04 前缀
+#define SM2_RAW_SHARED_SIZE      64 // ECDH 共享点 x || y
+
 // 生成SM2密钥对，并保存为私钥和公钥文件
-int sm2_generate_keypair(const char *privkey_path, const char *pubkey_path);
+SM2_ECDH_API int sm2_generate_keypair(const char *privkey_path, const char *pubkey_path);
 
 // 使用ECDH协商共享密钥，输出为64字节（512位）session key
-int sm2_derive_session_key(const char *privkey_path, const char *peer_pubkey_path, const char *out_keyfile);
+SM2_ECDH_API int sm2_derive_session_key(const char *privkey_path, const char *peer_pubkey_path, const char *out_keyfile);
+
+// 以下接口直接使用内存缓冲区，不读写PEM文件（供 Python ctypes 绑定调用）。成功返回0，失败返回-1
+
+// 生成SM2密钥对
+SM2_ECDH_API int sm2_generate_keypair_raw(uint8_t priv[SM2_RAW_PRIVATE_KEY_SIZE], uint8_t pub[SM2_RAW_PUBLIC_KEY_SIZE]);
+
+// 由私钥计算公钥
+SM2_ECDH_API int sm2_compute_public_key_raw(const uint8_t priv[SM2_RAW_PRIVATE_KEY_SIZE], uint8_t pub[SM2_RAW_PUBLIC_KEY_SIZE]);
+
+// 编译时使用的 GmSSL 版本号（GMSSL_VERSION_NUM），3.1.2 起为更快的 SM2_Z256 实现
+SM2_ECDH_API int sm2_ecdh_gmssl_version(void);
+
+// ECDH：输出共享点 x || y（与 e2e-tool key-exchange 写出的64字节 session key 相同）
+SM2_ECDH_API int sm2_derive_session_key_raw(const uint8_t priv[SM2_RAW_PRIVATE_KEY_SIZE],
+                                            const uint8_t peer_pub[SM2_RAW_PUBLIC_KEY_SIZE],
+                                            uint8_t shared[SM2_RAW_SHARED_SIZE]);
 
 #ifdef __cplusplus
 }
@@ -3,84 +3,25 @@ import threading
 import errno
 import os
 import json
-from gmssl import sm2, func
-import gmalg
+from crypto import sm2_ec
+from crypto.envelope import decrypt_text as decrypt_message, encrypt_text as encrypt_message, seal
+from crypto.keystore import get_keystore
 
 SERVER_HOST = '127.0.0.1'
 SERVER_PORT = 50000
 
 def ensure_sm2_keypair(username):
-    key_dir = os.path.join(os.path.dirname(__file__), '..', 'keys')
-    os.makedirs(key_dir, exist_ok=True)
-    priv_path = os.path.join(key_dir, f"{username}_priv.hex")
-    pub_path = os.path.join(key_dir, f"{username}_pub.hex")
-    if not (os.path.exists(priv_path) and os.path.exists(pub_path)):
-        private_key = func.random_hex(64)
-        sm2_crypt = sm2.CryptSM2(public_key='', private_key=private_key)
-        public_key = sm2_crypt._kg(int(private_key, 16), sm2.default_ecc_table['g'])
-        with open(priv_path, 'w') as f:
-            f.write(private_key)
-        with open(pub_path, 'w') as f:
-            f.write(public_key)
-        print(f"[系统] 已为 {username} 生成SM2密钥对")
-    else:
-        print(f"[系统] 已加载 {username} 的SM2密钥对")
-    with open(priv_path, 'r') as f:
-        priv = f.read()
-    with open(pub_path, 'r') as f:
-        pub = f.read()
-    return priv, pub
-
-def get_session_key_path(me, peer):
-    base_dir = os.path.join(os.path.dirname(__file__), '..', 'session_keys')
-    os.makedirs(base_dir, exist_ok=True)
-    users = sorted([me, peer])
-    return os.path.join(base_dir, f"{users[0]}_{users[1]}_session.key")
+    return get_keystore().ensure_keypair(username)
 
 def save_session_key(me, peer, session_key):
-    path = get_session_key_path(me, peer)
     try:
-        with open(path, 'w') as f:
-            f.write(session_key)
-        print(f"[系统] 会话密钥已保存到 {path}")
-        print(f"[系统] 会话密钥内容: {session_key}")
+        get_keystore().set_session_key(me, peer, session_key)
+        print(f"[系统] 与 {peer} 的会话密钥已保存")
     except Exception as e:
         print(f"[错误] 保存会话密钥失败: {e}")
 
 def load_session_key(me, peer):
-    path = get_session_key_path(me, peer)
-    if os.path.exists(path):
-        with open(path, 'r') as f:
-            session_key = f.read()
-        print(f"[系统] 已加载会话密钥: {path}")
-        print(f"[系统] 会话密钥内容: {session_key}")
-        return session_key
-    return None
-
-def zuc_keystream(zuc, length):
-    stream = b''
-    while len(stream) < length:
-        stream += zuc.generate()
-    return stream[:length]
-
-def encrypt_message(session_key, plaintext):
-    key = bytes.fromhex(session_key[:32])  # 16字节
-    iv = os.urandom(16)
-    zuc = gmalg.ZUC(key, iv)
-    pt_bytes = plaintext.encode()
-    keystream = zuc_keystream(zuc, len(pt_bytes))
-    ciphertext = bytes([a ^ b for a, b in zip(pt_bytes, keystream)])
-    return iv.hex() + ':' + ciphertext.hex()
-
-def decrypt_message(session_key, msg):
-    key = bytes.fromhex(session_key[:32])  # 16字节
-    iv_hex, ct_hex = msg.split(':', 1)
-    iv = bytes.fromhex(iv_hex)
-    ciphertext = bytes.fromhex(ct_hex)
-    zuc = gmalg.ZUC(key, iv)
-    keystream = zuc_keystream(zuc, len(ciphertext))
-    plaintext = bytes([a ^ b for a, b in zip(ciphertext, keystream)])
-    return plaintext.decode()
+    return get_keystore().get_session_key_bytes(me, peer)
 
 def send_file(sock, filepath, filetype, from_user, to_user):
     filesize = os.path.getsize(filepath)
@@ -173,8 +114,7 @@ def recv_thread(sock, username, state):
                 elif msg.startswith("[KEYEXCHANGE]"):
                     _, peer, peer_pub = msg.split(":", 2)
                     priv, pub = ensure_sm2_keypair(username)
-                    sm2_crypt = sm2.CryptSM2(public_key=peer_pub, private_key=priv)
-                    session_key = sm2_crypt._kg(int(priv, 16), peer_pub)[:32]
+                    session_key = sm2_ec.ecdh_hex(priv, peer_pub)[:32]
                     save_session_key(username, peer, session_key)
                     print(f"[系统] 与 {peer} 的密钥交换完成，可以安全通信。")
                     state['session_peer'] = peer
@@ -200,6 +140,9 @@ def recv_thread(sock, username, state):
         except Exception as e:
             print(f"[错误] 接收消息异常: {e}")
             break
+    # 连接断开，会话结束：丢弃密钥缓存与预计算密钥流
+    if state['session_peer']:
+        get_keystore().invalidate(username, state['session_peer'])
 
 def main():
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
@@ -235,10 +178,10 @@ def main():
                 plaintext = input("请输入要发送的明文消息: ").strip()
                 # 5. 加密
                 session_key = load_session_key(username, state['session_peer'])
-                ciphertext = encrypt_message(session_key, plaintext)
+                ciphertext = seal(session_key, plaintext.encode())
                 # 6. 隐写
                 from hide.steg import embed_message
-                embed_message(carrier_type, input_path, output_path, ciphertext.encode())
+                embed_message(carrier_type, input_path, output_path, ciphertext)
                 # 7. 发送文件
                 send_file(sock, output_path, carrier_type, username, state['session_peer'])
                 continue
@@ -252,7 +195,7 @@ def main():
                 ciphertext = extract_message(carrier_type, stego_path)
                 # 4. 解密
                 session_key = load_session_key(username, state['session_peer'])
-                plaintext = decrypt_message(session_key, ciphertext.decode())
+                plaintext = decrypt_message(session_key, ciphertext)
                 print(f"[系统] 解密得到明文: {plaintext}")
                 continue
             elif state['session_peer']:
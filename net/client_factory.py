@@ -3,9 +3,17 @@
 支持条件导入和依赖检查
 """
 
+import importlib.util
 import os
 import sys
 
+def is_installed(module_name):
+    """只查找模块规格而不真正导入，避免为检查依赖加载重量级模块"""
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
 def check_dependencies():
     """检查各种即时通信方案的依赖"""
     dependencies = {
@@ -15,27 +23,24 @@ def check_dependencies():
     }
     
     # 检查 WebSocket
-    try:
-        import websockets
+    if is_installed('websockets'):
         dependencies['websocket'] = True
         print("✅ WebSocket 依赖已安装")
-    except ImportError:
+    else:
         print("❌ WebSocket 依赖未安装，运行: pip install websockets")
     
     # 检查 Socket.IO
-    try:
-        import socketio
+    if is_installed('socketio'):
         dependencies['socketio'] = True
         print("✅ Socket.IO 依赖已安装")
-    except ImportError:
+    else:
         print("❌ Socket.IO 依赖未安装，运行: pip install python-socketio python-engineio")
     
     # 检查 Firebase
-    try:
-        import firebase_admin
+    if is_installed('firebase_admin'):
         dependencies['firebase'] = True
         print("✅ Firebase 依赖已安装")
-    except ImportError:
+    else:
         print("❌ Firebase 依赖未安装，运行: pip install firebase-admin")
     
     return dependencies
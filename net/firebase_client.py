@@ -4,9 +4,9 @@ import json
 import os
 import time
 import threading
-from gmssl import sm2, func
-import gmalg
 from hide.steg import embed_message, extract_message
+from crypto import envelope, sm2_ec
+from crypto.keystore import get_keystore
 
 class FirebaseClient:
     def __init__(self, config_path="firebase_config.json"):
@@ -40,80 +40,36 @@ class FirebaseClient:
             print("请确保firebase_config.json文件存在且配置正确")
     
     def ensure_sm2_keypair(self, username):
-        """确保SM2密钥对存在"""
-        key_dir = os.path.join(os.path.dirname(__file__), '..', 'keys')
-        os.makedirs(key_dir, exist_ok=True)
-        priv_path = os.path.join(key_dir, f"{username}_priv.hex")
-        pub_path = os.path.join(key_dir, f"{username}_pub.hex")
-        
-        if not (os.path.exists(priv_path) and os.path.exists(pub_path)):
-            private_key = func.random_hex(64)
-            sm2_crypt = sm2.CryptSM2(public_key='', private_key=private_key)
-            public_key = sm2_crypt._kg(int(private_key, 16), sm2.default_ecc_table['g'])
-            with open(priv_path, 'w') as f:
-                f.write(private_key)
-            with open(pub_path, 'w') as f:
-                f.write(public_key)
-            print(f"[系统] 已为 {username} 生成SM2密钥对")
-        else:
-            print(f"[系统] 已加载 {username} 的SM2密钥对")
-            
-        with open(priv_path, 'r') as f:
-            priv = f.read()
-        with open(pub_path, 'r') as f:
-            pub = f.read()
-        return priv, pub
-    
-    def get_session_key_path(self, me, peer):
-        base_dir = os.path.join(os.path.dirname(__file__), '..', 'session_keys')
-        os.makedirs(base_dir, exist_ok=True)
-        users = sorted([me, peer])
-        return os.path.join(base_dir, f"{users[0]}_{users[1]}_session.key")
+        """确保SM2密钥对存在（共享密钥库缓存，重连时不再读盘）"""
+        return get_keystore().ensure_keypair(username)
     
     def save_session_key(self, me, peer, session_key):
-        path = self.get_session_key_path(me, peer)
         try:
-            with open(path, 'w') as f:
-                f.write(session_key)
-            print(f"[系统] 会话密钥已保存到 {path}")
+            get_keystore().set_session_key(me, peer, session_key)
+            print(f"[系统] 与 {peer} 的会话密钥已保存")
         except Exception as e:
             print(f"[错误] 保存会话密钥失败: {e}")
     
     def load_session_key(self, me, peer):
-        path = self.get_session_key_path(me, peer)
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                session_key = f.read()
-            print(f"[系统] 已加载会话密钥: {path}")
-            return session_key
-        return None
+        """返回解析好的16字节会话密钥（内存缓存，不读盘）"""
+        return get_keystore().get_session_key_bytes(me, peer)
     
-    def zuc_keystream(self, zuc, length):
-        stream = b''
-        while len(stream) < length:
-            stream += zuc.generate()
-        return stream[:length]
+    def end_session(self, peer):
+        """会话结束（对端下线、断开连接或退出）：丢弃该会话的密钥缓存，停止后台密钥流预计算"""
+        if peer and self.username:
+            get_keystore().invalidate(self.username, peer)
     
     def encrypt_message(self, session_key, plaintext):
-        """使用ZUC加密消息"""
-        key = bytes.fromhex(session_key[:32])  # 16字节
-        iv = os.urandom(16)
-        zuc = gmalg.ZUC(key, iv)
-        pt_bytes = plaintext.encode()
-        keystream = self.zuc_keystream(zuc, len(pt_bytes))
-        ciphertext = bytes([a ^ b for a, b in zip(pt_bytes, keystream)])
-        return iv.hex() + ':' + ciphertext.hex()
+        """使用ZUC加密文本消息，返回 base64 编码的二进制信封"""
+        return envelope.encrypt_text(session_key, plaintext)
+    
+    def encrypt_payload(self, session_key, plaintext):
+        """使用ZUC加密隐写负载，返回二进制信封（直接嵌入载体）"""
+        return envelope.seal(session_key, plaintext.encode())
     
     def decrypt_message(self, session_key, msg):
-        """使用ZUC解密消息"""
-        key = bytes.fromhex(session_key[:32])  # 16字节
-        iv_hex, ct_hex = msg.split(':', 1)
-        iv = bytes.fromhex(iv_hex)
-        ciphertext = bytes.fromhex(ct_hex)
-        zuc = gmalg.ZUC(key, iv)
-        keystream = self.zuc_keystream(zuc, len(ciphertext))
-        plaintext = bytes([a ^ b for a, b in zip(ciphertext, keystream)])
-        return plaintext.decode()
+        """使用ZUC解密消息，兼容二进制信封、base64 信封和旧的 'iv:ct' 格式"""
+        return envelope.decrypt_text(session_key, msg)
     
     def on_message_received(self, event):
         """处理接收到的消息"""
@@ -154,7 +110,7 @@ class FirebaseClient:
                                 extracted_data = extract_message(filetype, save_path)
                                 session_key = self.load_session_key(self.username, peer)
                                 if session_key:
-                                    plaintext = self.decrypt_message(session_key, extracted_data.decode())
+                                    plaintext = self.decrypt_message(session_key, extracted_data)
                                     print(f"[{peer}] (隐写消息) {plaintext}")
                             except Exception as e:
                                 print(f"[系统] 隐写提取失败: {e}")
@@ -165,8 +121,7 @@ class FirebaseClient:
                         peer_pub = data['peer_pub']
                         
                         priv, pub = self.ensure_sm2_keypair(self.username)
-                        sm2_crypt = sm2.CryptSM2(public_key=peer_pub, private_key=priv)
-                        session_key = sm2_crypt._kg(int(priv, 16), peer_pub)[:32]
+                        session_key = sm2_ec.ecdh_hex(priv, peer_pub)[:32]
                         
                         self.save_session_key(self.username, peer, session_key)
                         print(f"[系统] 与 {peer} 的密钥交换完成")
@@ -299,10 +254,10 @@ class FirebaseClient:
                 print("[错误] 未找到会话密钥")
                 return
                 
-            ciphertext = self.encrypt_message(session_key, plaintext)
+            ciphertext = self.encrypt_payload(session_key, plaintext)
             
             # 隐写处理
-            embed_message(carrier_type, input_path, output_path, ciphertext.encode())
+            embed_message(carrier_type, input_path, output_path, ciphertext)
             
             # 发送文件
             self.send_file(output_path, carrier_type)
@@ -367,6 +322,7 @@ class FirebaseClient:
             
             # 停止监听
             self.stop_listening()
+            self.end_session(self.session_peer)
             
             print(f"[系统] 用户 {self.username} 已登出")
     
@@ -412,7 +368,7 @@ class FirebaseClient:
                             extracted_data = extract_message(carrier_type, stego_path)
                             session_key = self.load_session_key(self.username, self.session_peer)
                             if session_key:
-                                plaintext = self.decrypt_message(session_key, extracted_data.decode())
+                                plaintext = self.decrypt_message(session_key, extracted_data)
                                 print(f"[系统] 解密得到明文: {plaintext}")
                         except Exception as e:
                             print(f"[错误] 提取隐写消息失败: {e}")
@@ -3,6 +3,7 @@
 快速启动脚本 - 优先使用WebSocket方案
 """
 
+import importlib.util
 import sys
 import os
 
@@ -11,20 +12,12 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
 def check_websocket():
-    """检查WebSocket依赖"""
-    try:
-        import websockets
-        return True
-    except ImportError:
-        return False
+    """检查WebSocket依赖（只查找不导入）"""
+    return importlib.util.find_spec('websockets') is not None
 
 def check_hide_module():
-    """检查hide模块是否可用"""
-    try:
-        import hide
-        return True
-    except ImportError:
-        return False
+    """检查hide模块是否可用（只查找不导入）"""
+    return importlib.util.find_spec('hide') is not None
 
 def main():
     """主函数"""
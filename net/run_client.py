@@ -10,6 +10,8 @@ import os
 # 添加当前目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+from client_factory import is_installed
+
 def check_dependencies():
     """检查各种即时通信方案的依赖"""
     dependencies = {
@@ -19,27 +21,24 @@ def check_dependencies():
     }
     
     # 检查 WebSocket
-    try:
-        import websockets
+    if is_installed('websockets'):
         dependencies['websocket'] = True
         print("✅ WebSocket 依赖已安装")
-    except ImportError:
+    else:
         print("❌ WebSocket 依赖未安装，运行: pip install websockets")
     
     # 检查 Socket.IO
-    try:
-        import socketio
+    if is_installed('socketio'):
         dependencies['socketio'] = True
         print("✅ Socket.IO 依赖已安装")
-    except ImportError:
+    else:
         print("❌ Socket.IO 依赖未安装，运行: pip install python-socketio python-engineio")
     
     # 检查 Firebase
-    try:
-        import firebase_admin
+    if is_installed('firebase_admin'):
         dependencies['firebase'] = True
         print("✅ Firebase 依赖已安装")
-    except ImportError:
+    else:
         print("❌ Firebase 依赖未安装，运行: pip install firebase-admin")
     
     return dependencies
@@ -3,7 +3,6 @@ import os
 import sys
 import threading
 import asyncio
-import readline  # 用于自动补全
 import glob
 import websockets
 import time
@@ -12,9 +11,10 @@ import time
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from gmssl import sm2, func
-import gmalg
-from hide.steg import embed_message, extract_message
+from hide.steg import embed_message_async, extract_message_async
+from hide.shard import ShardAssembler, embed_sharded_async, is_shard, parse_shard
+from crypto import envelope, ephemeral, sm2_ec
+from crypto.keystore import get_keystore
 
 class PathCompleter:
     """路径自动补全器"""
@@ -75,6 +75,13 @@ class WebSocketClient:
         self.websocket = None
         self.username = None
         self.session_peer = None
+        self.login_peer = None  # 登录时指定的配对对象（两人会话）
+        self.login_room = None  # 登录时加入的多人房间
+        self.room_members = []  # 多人房间内的其他成员
+        self.shard_assembler = ShardAssembler()  # 分片隐写消息重组
+        self.ephemeral_priv = None  # 会话建立时上报的临时公钥对应的私钥
+        self.pending_rekeys = {}  # 对端 -> 本端发起密钥更新时使用的临时私钥
+        self.previous_keys = {}  # 对端 -> 密钥更新前的会话密钥，解密仍在途的旧密钥消息
         
         # 设置固定路径
         self.input_dir = os.path.join(project_root, "test")  # 输入文件目录
@@ -86,7 +93,8 @@ class WebSocketClient:
         os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(self.received_dir, exist_ok=True)
         
-        # 设置自动补全
+        # 设置自动补全（readline 在创建客户端时才加载）
+        import readline
         self.completer = PathCompleter()
         readline.set_completer(self.completer.complete)
         readline.parse_and_bind("tab: complete")
@@ -154,80 +162,99 @@ class WebSocketClient:
                 return user_input
         
     def ensure_sm2_keypair(self, username):
-        """确保SM2密钥对存在"""
-        key_dir = os.path.join(os.path.dirname(__file__), '..', 'keys')
-        os.makedirs(key_dir, exist_ok=True)
-        priv_path = os.path.join(key_dir, f"{username}_priv.hex")
-        pub_path = os.path.join(key_dir, f"{username}_pub.hex")
-        
-        if not (os.path.exists(priv_path) and os.path.exists(pub_path)):
-            private_key = func.random_hex(64)
-            sm2_crypt = sm2.CryptSM2(public_key='', private_key=private_key)
-            public_key = sm2_crypt._kg(int(private_key, 16), sm2.default_ecc_table['g'])
-            with open(priv_path, 'w') as f:
-                f.write(private_key)
-            with open(pub_path, 'w') as f:
-                f.write(public_key)
-            print(f"[系统] 已为 {username} 生成SM2密钥对")
-        else:
-            print(f"[系统] 已加载 {username} 的SM2密钥对")
-            
-        with open(priv_path, 'r') as f:
-            priv = f.read()
-        with open(pub_path, 'r') as f:
-            pub = f.read()
-        return priv, pub
-    
-    def get_session_key_path(self, me, peer):
-        base_dir = os.path.join(os.path.dirname(__file__), '..', 'session_keys')
-        os.makedirs(base_dir, exist_ok=True)
-        users = sorted([me, peer])
-        return os.path.join(base_dir, f"{users[0]}_{users[1]}_session.key")
+        """确保SM2密钥对存在（共享密钥库缓存，重连时不再读盘）"""
+        return get_keystore().ensure_keypair(username)
     
     def save_session_key(self, me, peer, session_key):
-        path = self.get_session_key_path(me, peer)
         try:
-            with open(path, 'w') as f:
-                f.write(session_key)
-            print(f"[系统] 会话密钥已保存到 {path}")
+            get_keystore().set_session_key(me, peer, session_key)
+            print(f"[系统] 与 {peer} 的会话密钥已保存")
         except Exception as e:
             print(f"[错误] 保存会话密钥失败: {e}")
     
     def load_session_key(self, me, peer):
-        path = self.get_session_key_path(me, peer)
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                session_key = f.read()
-            print(f"[系统] 已加载会话密钥: {path}")
-            return session_key
-        return None
+        """返回解析好的16字节会话密钥（内存缓存，不读盘）"""
+        return get_keystore().get_session_key_bytes(me, peer)
     
-    def zuc_keystream(self, zuc, length):
-        stream = b''
-        while len(stream) < length:
-            stream += zuc.generate()
-        return stream[:length]
+    def rotate_session_key(self, peer, session_key):
+        """密钥更新：保存新会话密钥，旧密钥留作解密回退，直到新密钥第一次解密成功"""
+        previous = self.load_session_key(self.username, peer)
+        if previous:
+            self.previous_keys[peer] = previous
+        self.save_session_key(self.username, peer, session_key)
+    
+    def decrypt_from_peer(self, peer, session_key, msg):
+        """
+        解密对端消息。对端在发出 rekey 之后、收到 rekey_ack 之前发送的消息仍用旧密钥加密，
+        新密钥解密失败（校验值不符）时用旧密钥再试；新密钥解密成功说明对端已切换，丢弃旧密钥
+        """
+        previous = self.previous_keys.get(peer)
+        try:
+            plaintext = self.decrypt_message(session_key, msg)
+        except Exception:
+            if previous is None:
+                raise
+            return self.decrypt_message(previous, msg)
+        self.previous_keys.pop(peer, None)
+        return plaintext
+    
+    def end_session(self, peer):
+        """会话结束（对端下线、断开连接或退出）：丢弃该会话的密钥缓存，停止后台密钥流预计算"""
+        self.previous_keys.pop(peer, None)
+        if peer and self.username:
+            get_keystore().invalidate(self.username, peer)
+    
+    def set_session_target(self, target):
+        """登录时的会话：用户名为与其配对，#房间名 为加入多人房间，留空由服务器自动配对"""
+        target = (target or '').strip()
+        if target.startswith('#'):
+            self.login_room = target[1:] or None
+        elif target:
+            self.login_peer = target
+    
+    def login_message(self):
+        """登录消息，指定了配对对象或房间时带上 peer / session 字段"""
+        message = {"type": "login", "username": self.username}
+        if self.login_peer:
+            message["peer"] = self.login_peer
+        elif self.login_room:
+            message["session"] = self.login_room
+        return message
+    
+    def session_keypair(self):
+        """会话建立时上报的密钥对：设置 E2E_EPHEMERAL_SM2=1 时从池中取临时密钥对，否则用长期密钥对"""
+        if ephemeral.enabled():
+            priv, pub = ephemeral.take()
+            self.ephemeral_priv = priv
+            return priv, pub
+        return self.ensure_sm2_keypair(self.username)
+    
+    async def request_rekey(self):
+        """用临时密钥对向当前会话对端发起密钥更新，收到 rekey_ack 后切换到新会话密钥"""
+        if not self.session_peer:
+            print("[错误] 未建立会话")
+            return
+        priv, pub = ephemeral.take()
+        self.pending_rekeys[self.session_peer] = priv
+        await self.websocket.send(json.dumps({
+            "type": "rekey",
+            "from": self.username,
+            "to": self.session_peer,
+            "pubkey": pub
+        }))
+        print(f"[系统] 已向 {self.session_peer} 发起密钥更新")
     
     def encrypt_message(self, session_key, plaintext):
-        """使用ZUC加密消息"""
-        key = bytes.fromhex(session_key[:32])  # 16字节
-        iv = os.urandom(16)
-        zuc = gmalg.ZUC(key, iv)
-        pt_bytes = plaintext.encode()
-        keystream = self.zuc_keystream(zuc, len(pt_bytes))
-        ciphertext = bytes([a ^ b for a, b in zip(pt_bytes, keystream)])
-        return iv.hex() + ':' + ciphertext.hex()
+        """使用ZUC加密文本消息，返回 base64 编码的二进制信封"""
+        return envelope.encrypt_text(session_key, plaintext)
+    
+    def encrypt_payload(self, session_key, plaintext):
+        """使用ZUC加密隐写负载，返回二进制信封（直接嵌入载体）"""
+        return envelope.seal(session_key, plaintext.encode())
     
     def decrypt_message(self, session_key, msg):
-        """使用ZUC解密消息"""
-        key = bytes.fromhex(session_key[:32])  # 16字节
-        iv_hex, ct_hex = msg.split(':', 1)
-        iv = bytes.fromhex(iv_hex)
-        ciphertext = bytes.fromhex(ct_hex)
-        zuc = gmalg.ZUC(key, iv)
-        keystream = self.zuc_keystream(zuc, len(ciphertext))
-        plaintext = bytes([a ^ b for a, b in zip(ciphertext, keystream)])
-        return plaintext.decode()
+        """使用ZUC解密消息，兼容二进制信封、base64 信封和旧的 'iv:ct' 格式"""
+        return envelope.decrypt_text(session_key, msg)
     
     async def send_stego_message(self, carrier_type, input_path, output_path, plaintext):
         """发送隐写消息"""
@@ -249,12 +276,12 @@ class WebSocketClient:
                 return
                 
             print(f"[系统] 加密消息...")
-            ciphertext = self.encrypt_message(session_key, plaintext)
+            ciphertext = self.encrypt_payload(session_key, plaintext)
             
             # 隐写处理
             print(f"[系统] 执行隐写处理...")
             try:
-                embed_message(carrier_type, input_path, output_path, ciphertext.encode())
+                await embed_message_async(carrier_type, input_path, output_path, ciphertext)
             except Exception as stego_error:
                 print(f"[错误] 隐写处理失败: {stego_error}")
                 print("[系统] 隐写失败，但客户端将继续运行")
@@ -271,6 +298,34 @@ class WebSocketClient:
             import traceback
             traceback.print_exc()
     
+    async def send_sharded_stego_message(self, carrier_type, input_paths, plaintext):
+        """分片发送隐写消息：密文拆成分片并行嵌入多个载体，再并发发送"""
+        try:
+            session_key = self.load_session_key(self.username, self.session_peer)
+            if not session_key:
+                print("[错误] 未找到会话密钥")
+                return
+
+            print(f"[系统] 加密消息...")
+            ciphertext = self.encrypt_payload(session_key, plaintext)
+
+            print(f"[系统] 分片并行嵌入 {len(input_paths)} 个载体...")
+            try:
+                outputs = await embed_sharded_async(carrier_type, input_paths, self.output_dir, ciphertext)
+            except Exception as stego_error:
+                print(f"[错误] 隐写处理失败: {stego_error}")
+                print("[系统] 隐写失败，但客户端将继续运行")
+                return
+
+            print(f"[系统] 并发发送 {len(outputs)} 个分片文件...")
+            await asyncio.gather(*(self.send_file(path, carrier_type) for path in outputs))
+            print(f"[系统] 分片隐写消息已发送")
+
+        except Exception as e:
+            print(f"[错误] 发送分片隐写消息失败: {e}")
+            import traceback
+            traceback.print_exc()
+    
     async def send_file(self, filepath, filetype):
         """发送文件"""
         try:
@@ -299,11 +354,11 @@ class WebSocketClient:
                 
                 fileinfo = {
                     "type": "file",
+                    "from": self.username,
+                    "to": self.session_peer,
                     "filename": filename,
                     "filetype": filetype,
                     "filesize": filesize,
-                    "from": self.username,
-                    "to": self.session_peer,
                     "data": file_data.hex()  # 转换为hex传输
                 }
                 
@@ -331,12 +386,12 @@ class WebSocketClient:
             # 发送文件开始消息
             start_msg = {
                 "type": "file_start",
+                "from": self.username,
+                "to": self.session_peer,
                 "filename": filename,
                 "filetype": filetype,
                 "filesize": filesize,
-                "chunks": total_chunks,
-                "from": self.username,
-                "to": self.session_peer
+                "chunks": total_chunks
             }
             await self.websocket.send(json.dumps(start_msg))
             print(f"[系统] 发送文件开始消息: {filename} ({filesize} bytes, {total_chunks} chunks)")
@@ -363,11 +418,11 @@ class WebSocketClient:
                     
                     chunk_msg = {
                         "type": "file_chunk",
+                        "from": self.username,
+                        "to": self.session_peer,
                         "filename": filename,
                         "chunk_index": chunk_index,
-                        "chunk_data": chunk_data.hex(),
-                        "from": self.username,
-                        "to": self.session_peer
+                        "chunk_data": chunk_data.hex()
                     }
                     await self.websocket.send(json.dumps(chunk_msg))
                     print(f"[系统] 发送块 {chunk_index + 1}/{total_chunks}: {len(chunk_data)} bytes")
@@ -383,9 +438,9 @@ class WebSocketClient:
             # 发送文件结束消息
             end_msg = {
                 "type": "file_end",
-                "filename": filename,
                 "from": self.username,
-                "to": self.session_peer
+                "to": self.session_peer,
+                "filename": filename
             }
             await self.websocket.send(json.dumps(end_msg))
             print(f"[系统] 文件传输完成: {filename}")
@@ -406,6 +461,47 @@ class WebSocketClient:
             except Exception as retry_e:
                 print(f"[错误] 重新发送也失败: {retry_e}")
     
+    def start_background(self, coro):
+        """启动后台任务并保留引用，避免任务被提前回收"""
+        if not hasattr(self, 'background_tasks'):
+            self.background_tasks = set()
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+    
+    async def extract_stego_file(self, peer, filetype, save_path):
+        """提取隐写文件中的消息并解密显示"""
+        try:
+            extracted_data = await extract_message_async(filetype, save_path)
+            print(f"[系统] 隐写提取成功，数据大小: {len(extracted_data)} bytes")
+            self.show_stego_message(peer, extracted_data)
+        except Exception as e:
+            print(f"[系统] 隐写提取失败: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    def show_stego_message(self, peer, extracted_data):
+        """解密并显示隐写消息；分片先交给重组器，集齐后再解密"""
+        if is_shard(extracted_data):
+            shard = parse_shard(extracted_data)
+            extracted_data = self.shard_assembler.add(shard)
+            if extracted_data is None:
+                if self.shard_assembler.is_completed(shard.message_id):
+                    print(f"[系统] 忽略已重组消息的重复分片 {shard.index + 1}/{shard.total}")
+                    return
+                received, total = self.shard_assembler.progress(shard.message_id)
+                print(f"[系统] 收到分片 {shard.index + 1}/{shard.total}（已收到 {received}/{total}）")
+                return
+            print(f"[系统] 分片已集齐，重组数据大小: {len(extracted_data)} bytes")
+        
+        session_key = self.load_session_key(self.username, peer)
+        if session_key:
+            plaintext = self.decrypt_from_peer(peer, session_key, extracted_data)
+            print(f"[{peer}] (隐写消息) {plaintext}")
+        else:
+            print(f"[系统] 未找到与 {peer} 的会话密钥")
+    
     async def handle_message(self, message):
         """处理接收到的消息"""
         try:
@@ -419,7 +515,7 @@ class WebSocketClient:
                 session_key = self.load_session_key(self.username, peer)
                 if session_key:
                     try:
-                        plaintext = self.decrypt_message(session_key, data['content'])
+                        plaintext = self.decrypt_from_peer(peer, session_key, data['content'])
                         print(f"[{peer}] {plaintext}")
                     except Exception as e:
                         print(f"[系统] 解密失败: {e}")
@@ -450,20 +546,8 @@ class WebSocketClient:
                     # 如果是隐写文件，自动提取
                     if filetype in ['image', 'pdf', 'video']:
                         print(f"[系统] 检测到隐写文件，开始提取...")
-                        try:
-                            extracted_data = extract_message(filetype, save_path)
-                            print(f"[系统] 隐写提取成功，数据大小: {len(extracted_data)} bytes")
-                            
-                            session_key = self.load_session_key(self.username, peer)
-                            if session_key:
-                                plaintext = self.decrypt_message(session_key, extracted_data.decode())
-                                print(f"[{peer}] (隐写消息) {plaintext}")
-                            else:
-                                print(f"[系统] 未找到与 {peer} 的会话密钥")
-                        except Exception as e:
-                            print(f"[系统] 隐写提取失败: {e}")
-                            import traceback
-                            traceback.print_exc()
+                        # 在后台提取，接收循环可继续处理其他文件和分片
+                        self.start_background(self.extract_stego_file(peer, filetype, save_path))
                 except Exception as e:
                     print(f"[系统] 处理文件失败: {e}")
                     import traceback
@@ -530,20 +614,8 @@ class WebSocketClient:
                         # 如果是隐写文件，自动提取
                         if file_info['filetype'] in ['image', 'pdf', 'video']:
                             print(f"[系统] 检测到隐写文件，开始提取...")
-                            try:
-                                extracted_data = extract_message(file_info['filetype'], save_path)
-                                print(f"[系统] 隐写提取成功，数据大小: {len(extracted_data)} bytes")
-                                
-                                session_key = self.load_session_key(self.username, peer)
-                                if session_key:
-                                    plaintext = self.decrypt_message(session_key, extracted_data.decode())
-                                    print(f"[{peer}] (隐写消息) {plaintext}")
-                                else:
-                                    print(f"[系统] 未找到与 {peer} 的会话密钥")
-                            except Exception as e:
-                                print(f"[系统] 隐写提取失败: {e}")
-                                import traceback
-                                traceback.print_exc()
+                            # 在后台提取，接收循环可继续处理其他文件和分片
+                            self.start_background(self.extract_stego_file(peer, file_info['filetype'], save_path))
                     else:
                         print(f"[错误] 文件传输不完整: {received_chunks}/{expected_chunks} chunks")
                     
@@ -555,9 +627,9 @@ class WebSocketClient:
                 peer = data['peer']
                 peer_pub = data['peer_pub']
                 
-                priv, pub = self.ensure_sm2_keypair(self.username)
-                sm2_crypt = sm2.CryptSM2(public_key=peer_pub, private_key=priv)
-                session_key = sm2_crypt._kg(int(priv, 16), peer_pub)[:32]
+                # 临时私钥在会话建立前已由后台池生成，这里只需一次标量乘
+                priv = self.ephemeral_priv or self.ensure_sm2_keypair(self.username)[0]
+                session_key = sm2_ec.ecdh_hex(priv, peer_pub)[:32]
                 
                 self.save_session_key(self.username, peer, session_key)
                 print(f"[系统] 与 {peer} 的密钥交换完成")
@@ -567,6 +639,54 @@ class WebSocketClient:
                 peer = data['peer']
                 self.session_peer = peer
                 print(f"[系统] 已与 {peer} 建立会话")
+                # 后台预生成临时密钥对，供密钥更新使用
+                ephemeral.get_pool()
+                
+            elif data.get('type') == 'rekey':
+                # 对端发起密钥更新：取一对临时密钥，一次标量乘得到新会话密钥并回复公钥
+                peer = data['from']
+                priv, pub = ephemeral.take()
+                session_key = sm2_ec.ecdh_hex(priv, data['pubkey'])[:32]
+                # 对端收到 rekey_ack 之前发来的消息仍用旧密钥加密，旧密钥保留为回退
+                self.rotate_session_key(peer, session_key)
+                await self.websocket.send(json.dumps({
+                    "type": "rekey_ack",
+                    "from": self.username,
+                    "to": peer,
+                    "pubkey": pub
+                }))
+                print(f"[系统] 已响应 {peer} 的密钥更新")
+                
+            elif data.get('type') == 'rekey_ack':
+                # 本端发起的密钥更新得到回复
+                peer = data['from']
+                priv = self.pending_rekeys.pop(peer, None)
+                if priv is None:
+                    print(f"[警告] 收到来自 {peer} 的意外密钥更新回复，已忽略")
+                else:
+                    session_key = sm2_ec.ecdh_hex(priv, data['pubkey'])[:32]
+                    self.rotate_session_key(peer, session_key)
+                    print(f"[系统] 与 {peer} 的密钥更新完成")
+                
+            elif data.get('type') == 'session_members':
+                # 多人房间成员变化（会话密钥仍由 key_exchange 两两协商）
+                self.room_members = [member for member in data['members'] if member != self.username]
+                print(f"[系统] 房间 {data['session']} 成员: {', '.join(data['members'])}")
+                
+            elif data.get('type') == 'delivery_report':
+                # 群发时部分成员没有收到
+                failed = ', '.join(f"{user}({reason})" for user, reason in data['failed'].items())
+                print(f"[警告] {data['msg_type']} 已送达 {data['delivered']} 人，未送达: {failed}")
+                
+            elif data.get('type') == 'user_offline':
+                # 对端下线，会话结束
+                peer = data['username']
+                self.end_session(peer)
+                if peer == self.session_peer:
+                    self.session_peer = None
+                if peer in self.room_members:
+                    self.room_members.remove(peer)
+                print(f"[系统] {peer} 已下线")
                 
             elif data.get('type') == 'user_list':
                 print(f"[系统] 在线用户: {', '.join(data['users'])}")
@@ -588,13 +708,10 @@ class WebSocketClient:
             print(f"[系统] 已连接到服务器: {self.server_url}")
             
             # 发送用户名
-            await self.websocket.send(json.dumps({
-                "type": "login",
-                "username": self.username
-            }))
+            await self.websocket.send(json.dumps(self.login_message()))
             
             # 发送公钥
-            priv, pub = self.ensure_sm2_keypair(self.username)
+            priv, pub = self.session_keypair()
             await self.websocket.send(json.dumps({
                 "type": "pubkey",
                 "username": self.username,
@@ -607,6 +724,9 @@ class WebSocketClient:
                 
         except Exception as e:
             print(f"[错误] 连接失败: {e}")
+        finally:
+            # 连接断开或客户端退出，会话随之结束
+            self.end_session(self.session_peer)
     
     async def send_heartbeat(self):
         """发送心跳消息"""
@@ -637,6 +757,8 @@ class WebSocketClient:
             print(f"[系统] 尝试重新连接...")
             if self.websocket and not self.websocket.closed:
                 await self.websocket.close()
+            # 旧连接上的会话已结束，重连后由新的密钥交换重新建立
+            self.end_session(self.session_peer)
             
             # 重新建立连接
             self.websocket = await websockets.connect(
@@ -647,10 +769,7 @@ class WebSocketClient:
             )
             
             # 重新登录
-            await self.websocket.send(json.dumps({
-                "type": "login",
-                "username": self.username
-            }))
+            await self.websocket.send(json.dumps(self.login_message()))
             
             print(f"[系统] 重连成功")
             return True
@@ -658,8 +777,28 @@ class WebSocketClient:
             print(f"[错误] 重连失败: {e}")
             return False
     
+    async def send_room_message(self, text):
+        """房间消息：会话密钥两两协商，按成员分别加密，各发一帧"""
+        sent = []
+        for member in self.room_members:
+            session_key = self.load_session_key(self.username, member)
+            if not session_key:
+                print(f"[警告] 未找到与 {member} 的会话密钥，跳过")
+                continue
+            await self.websocket.send(json.dumps({
+                "type": "msg",
+                "from": self.username,
+                "to": member,
+                "content": self.encrypt_message(session_key, text)
+            }))
+            sent.append(member)
+        print(f"[我 -> {', '.join(sent) or '无人'}] {text}")
+    
     async def send_text_message(self, text):
-        """发送文本消息"""
+        """发送文本消息（在多人房间中发给房间内所有成员）"""
+        if not self.session_peer and self.room_members:
+            await self.send_room_message(text)
+            return
         if not self.session_peer:
             print("[错误] 未建立会话")
             return
@@ -674,8 +813,8 @@ class WebSocketClient:
             
             message = {
                 "type": "msg",
-                "to": self.session_peer,
                 "from": self.username,
+                "to": self.session_peer,
                 "content": encrypted
             }
             
@@ -758,6 +897,29 @@ class WebSocketClient:
                             continue
                         
                         await self.send_stego_message(carrier_type, input_path, output_path, plaintext)
+                    elif user_input == "sendshards":
+                        # 分片发送隐写消息（多个载体）
+                        print("\n=== 分片发送隐写消息 ===")
+                        carrier_type = input("请选择隐写类型（image/pdf/video）: ").strip().lower()
+                        if carrier_type not in ['image', 'pdf', 'video']:
+                            print("❌ 不支持的隐写类型")
+                            continue
+                        
+                        cover_files = input("请输入多个载体文件名（逗号分隔）: ").strip()
+                        input_paths = [self.resolve_input_path(name.strip()) for name in cover_files.split(',') if name.strip()]
+                        if not input_paths or not all(input_paths):
+                            print("❌ 无法找到载体文件")
+                            continue
+                        
+                        plaintext = input("请输入要发送的明文消息: ").strip()
+                        if not plaintext:
+                            print("❌ 消息不能为空")
+                            continue
+                        
+                        await self.send_sharded_stego_message(carrier_type, input_paths, plaintext)
+                    elif user_input.strip() == "rekey":
+                        # 更新会话密钥
+                        await self.request_rekey()
                     elif user_input == "files":
                         # 显示可用文件
                         print("\n=== 可用文件 ===")
@@ -813,10 +975,10 @@ class WebSocketClient:
                                 continue
                         
                         try:
-                            extracted_data = extract_message(carrier_type, stego_path)
+                            extracted_data = await extract_message_async(carrier_type, stego_path)
                             session_key = self.load_session_key(self.username, self.session_peer)
                             if session_key:
-                                plaintext = self.decrypt_message(session_key, extracted_data.decode())
+                                plaintext = self.decrypt_message(session_key, extracted_data)
                                 print(f"[系统] 解密得到明文: {plaintext}")
                             else:
                                 print("[系统] 未找到会话密钥")
@@ -842,9 +1004,12 @@ class WebSocketClient:
             if not self.username:
                 print("[错误] 用户名不能为空")
                 return
+            self.set_session_target(input("配对对象（用户名；#房间名 加入多人房间；留空自动配对）: "))
                 
             print("\n=== 命令说明 ===")
             print("sendmsg - 发送隐写消息")
+            print("sendshards - 分片发送隐写消息（多个载体并行）")
+            print("rekey - 更新会话密钥（临时SM2密钥对）")
             print("sendfile <文件名> <文件类型> - 发送文件")
             print("files - 显示可用文件")
             print("extractmsg - 提取隐写消息")
@@ -870,6 +1035,7 @@ class WebSocketClient:
 async def main():
     client = WebSocketClient()
     client.username = input("请输入用户名: ").strip()
+    client.set_session_target(input("配对对象（用户名；#房间名 加入多人房间；留空自动配对）: "))
     
     # 启动输入循环
     client.start_input_loop()
@@ -884,7 +1050,6 @@ import os
 import sys
 import threading
 import asyncio
-import readline  # 用于自动补全
 import glob
 import websockets
 import time
@@ -893,9 +1058,10 @@ import time
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-from gmssl import sm2, func
-import gmalg
-from hide.steg import embed_message, extract_message
+from hide.steg import embed_message_async, extract_message_async
+from hide.shard import ShardAssembler, embed_sharded_async, is_shard, parse_shard
+from crypto import envelope, ephemeral, sm2_ec
+from crypto.keystore import get_keystore
 
 class PathCompleter:
     """路径自动补全器"""
@@ -956,6 +1122,13 @@ class WebSocketClient:
         self.websocket = None
         self.username = None
         self.session_peer = None
+        self.login_peer = None  # 登录时指定的配对对象（两人会话）
+        self.login_room = None  # 登录时加入的多人房间
+        self.room_members = []  # 多人房间内的其他成员
+        self.shard_assembler = ShardAssembler()  # 分片隐写消息重组
+        self.ephemeral_priv = None  # 会话建立时上报的临时公钥对应的私钥
+        self.pending_rekeys = {}  # 对端 -> 本端发起密钥更新时使用的临时私钥
+        self.previous_keys = {}  # 对端 -> 密钥更新前的会话密钥，解密仍在途的旧密钥消息
         
         # 设置固定路径
         self.input_dir = os.path.join(project_root, "test")  # 输入文件目录
@@ -967,7 +1140,8 @@ class WebSocketClient:
         os.makedirs(self.output_dir, exist_ok=True)
         os.makedirs(self.received_dir, exist_ok=True)
         
-        # 设置自动补全
+        # 设置自动补全（readline 在创建客户端时才加载）
+        import readline
         self.completer = PathCompleter()
         readline.set_completer(self.completer.complete)
         readline.parse_and_bind("tab: complete")
@@ -1035,80 +1209,99 @@ class WebSocketClient:
                 return user_input
         
     def ensure_sm2_keypair(self, username):
-        """确保SM2密钥对存在"""
-        key_dir = os.path.join(os.path.dirname(__file__), '..', 'keys')
-        os.makedirs(key_dir, exist_ok=True)
-        priv_path = os.path.join(key_dir, f"{username}_priv.hex")
-        pub_path = os.path.join(key_dir, f"{username}_pub.hex")
-        
-        if not (os.path.exists(priv_path) and os.path.exists(pub_path)):
-            private_key = func.random_hex(64)
-            sm2_crypt = sm2.CryptSM2(public_key='', private_key=private_key)
-            public_key = sm2_crypt._kg(int(private_key, 16), sm2.default_ecc_table['g'])
-            with open(priv_path, 'w') as f:
-                f.write(private_key)
-            with open(pub_path, 'w') as f:
-                f.write(public_key)
-            print(f"[系统] 已为 {username} 生成SM2密钥对")
-        else:
-            print(f"[系统] 已加载 {username} 的SM2密钥对")
-            
-        with open(priv_path, 'r') as f:
-            priv = f.read()
-        with open(pub_path, 'r') as f:
-            pub = f.read()
-        return priv, pub
-    
-    def get_session_key_path(self, me, peer):
-        base_dir = os.path.join(os.path.dirname(__file__), '..', 'session_keys')
-        os.makedirs(base_dir, exist_ok=True)
-        users = sorted([me, peer])
-        return os.path.join(base_dir, f"{users[0]}_{users[1]}_session.key")
+        """确保SM2密钥对存在（共享密钥库缓存，重连时不再读盘）"""
+        return get_keystore().ensure_keypair(username)
     
     def save_session_key(self, me, peer, session_key):
-        path = self.get_session_key_path(me, peer)
         try:
-            with open(path, 'w') as f:
-                f.write(session_key)
-            print(f"[系统] 会话密钥已保存到 {path}")
+            get_keystore().set_session_key(me, peer, session_key)
+            print(f"[系统] 与 {peer} 的会话密钥已保存")
         except Exception as e:
             print(f"[错误] 保存会话密钥失败: {e}")
     
     def load_session_key(self, me, peer):
-        path = self.get_session_key_path(me, peer)
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                session_key = f.read()
-            print(f"[系统] 已加载会话密钥: {path}")
-            return session_key
-        return None
+        """返回解析好的16字节会话密钥（内存缓存，不读盘）"""
+        return get_keystore().get_session_key_bytes(me, peer)
     
-    def zuc_keystream(self, zuc, length):
-        stream = b''
-        while len(stream) < length:
-            stream += zuc.generate()
-        return stream[:length]
+    def rotate_session_key(self, peer, session_key):
+        """密钥更新：保存新会话密钥，旧密钥留作解密回退，直到新密钥第一次解密成功"""
+        previous = self.load_session_key(self.username, peer)
+        if previous:
+            self.previous_keys[peer] = previous
+        self.save_session_key(self.username, peer, session_key)
+    
+    def decrypt_from_peer(self, peer, session_key, msg):
+        """
+        解密对端消息。对端在发出 rekey 之后、收到 rekey_ack 之前发送的消息仍用旧密钥加密，
+        新密钥解密失败（校验值不符）时用旧密钥再试；新密钥解密成功说明对端已切换，丢弃旧密钥
+        """
+        previous = self.previous_keys.get(peer)
+        try:
+            plaintext = self.decrypt_message(session_key, msg)
+        except Exception:
+            if previous is None:
+                raise
+            return self.decrypt_message(previous, msg)
+        self.previous_keys.pop(peer, None)
+        return plaintext
+    
+    def end_session(self, peer):
+        """会话结束（对端下线、断开连接或退出）：丢弃该会话的密钥缓存，停止后台密钥流预计算"""
+        self.previous_keys.pop(peer, None)
+        if peer and self.username:
+            get_keystore().invalidate(self.username, peer)
+    
+    def set_session_target(self, target):
+        """登录时的会话：用户名为与其配对，#房间名 为加入多人房间，留空由服务器自动配对"""
+        target = (target or '').strip()
+        if target.startswith('#'):
+            self.login_room = target[1:] or None
+        elif target:
+            self.login_peer = target
+    
+    def login_message(self):
+        """登录消息，指定了配对对象或房间时带上 peer / session 字段"""
+        message = {"type": "login", "username": self.username}
+        if self.login_peer:
+            message["peer"] = self.login_peer
+        elif self.login_room:
+            message["session"] = self.login_room
+        return message
+    
+    def session_keypair(self):
+        """会话建立时上报的密钥对：设置 E2E_EPHEMERAL_SM2=1 时从池中取临时密钥对，否则用长期密钥对"""
+        if ephemeral.enabled():
+            priv, pub = ephemeral.take()
+            self.ephemeral_priv = priv
+            return priv, pub
+        return self.ensure_sm2_keypair(self.username)
+    
+    async def request_rekey(self):
+        """用临时密钥对向当前会话对端发起密钥更新，收到 rekey_ack 后切换到新会话密钥"""
+        if not self.session_peer:
+            print("[错误] 未建立会话")
+            return
+        priv, pub = ephemeral.take()
+        self.pending_rekeys[self.session_peer] = priv
+        await self.websocket.send(json.dumps({
+            "type": "rekey",
+            "from": self.username,
+            "to": self.session_peer,
+            "pubkey": pub
+        }))
+        print(f"[系统] 已向 {self.session_peer} 发起密钥更新")
     
     def encrypt_message(self, session_key, plaintext):
-        """使用ZUC加密消息"""
-        key = bytes.fromhex(session_key[:32])  # 16字节
-        iv = os.urandom(16)
-        zuc = gmalg.ZUC(key, iv)
-        pt_bytes = plaintext.encode()
-        keystream = self.zuc_keystream(zuc, len(pt_bytes))
-        ciphertext = bytes([a ^ b for a, b in zip(pt_bytes, keystream)])
-        return iv.hex() + ':' + ciphertext.hex()
+        """使用ZUC加密文本消息，返回 base64 编码的二进制信封"""
+        return envelope.encrypt_text(session_key, plaintext)
+    
+    def encrypt_payload(self, session_key, plaintext):
+        """使用ZUC加密隐写负载，返回二进制信封（直接嵌入载体）"""
+        return envelope.seal(session_key, plaintext.encode())
     
     def decrypt_message(self, session_key, msg):
-        """使用ZUC解密消息"""
-        key = bytes.fromhex(session_key[:32])  # 16字节
-        iv_hex, ct_hex = msg.split(':', 1)
-        iv = bytes.fromhex(iv_hex)
-        ciphertext = bytes.fromhex(ct_hex)
-        zuc = gmalg.ZUC(key, iv)
-        keystream = self.zuc_keystream(zuc, len(ciphertext))
-        plaintext = bytes([a ^ b for a, b in zip(ciphertext, keystream)])
-        return plaintext.decode()
+        """使用ZUC解密消息，兼容二进制信封、base64 信封和旧的 'iv:ct' 格式"""
+        return envelope.decrypt_text(session_key, msg)
     
     async def send_stego_message(self, carrier_type, input_path, output_path, plaintext):
         """发送隐写消息"""
@@ -1122,12 +1315,12 @@ class WebSocketClient:
                 return
                 
             print(f"[系统] 加密消息...")
-            ciphertext = self.encrypt_message(session_key, plaintext)
+            ciphertext = self.encrypt_payload(session_key, plaintext)
             
             # 隐写处理
             print(f"[系统] 执行隐写处理...")
             try:
-                embed_message(carrier_type, input_path, output_path, ciphertext.encode())
+                await embed_message_async(carrier_type, input_path, output_path, ciphertext)
             except Exception as stego_error:
                 print(f"[错误] 隐写处理失败: {stego_error}")
                 print("[系统] 隐写失败，但客户端将继续运行")
@@ -1144,6 +1337,34 @@ class WebSocketClient:
             import traceback
             traceback.print_exc()
     
+    async def send_sharded_stego_message(self, carrier_type, input_paths, plaintext):
+        """分片发送隐写消息：密文拆成分片并行嵌入多个载体，再并发发送"""
+        try:
+            session_key = self.load_session_key(self.username, self.session_peer)
+            if not session_key:
+                print("[错误] 未找到会话密钥")
+                return
+
+            print(f"[系统] 加密消息...")
+            ciphertext = self.encrypt_payload(session_key, plaintext)
+
+            print(f"[系统] 分片并行嵌入 {len(input_paths)} 个载体...")
+            try:
+                outputs = await embed_sharded_async(carrier_type, input_paths, self.output_dir, ciphertext)
+            except Exception as stego_error:
+                print(f"[错误] 隐写处理失败: {stego_error}")
+                print("[系统] 隐写失败，但客户端将继续运行")
+                return
+
+            print(f"[系统] 并发发送 {len(outputs)} 个分片文件...")
+            await asyncio.gather(*(self.send_file(path, carrier_type) for path in outputs))
+            print(f"[系统] 分片隐写消息已发送")
+
+        except Exception as e:
+            print(f"[错误] 发送分片隐写消息失败: {e}")
+            import traceback
+            traceback.print_exc()
+    
     async def send_file(self, filepath, filetype):
         """发送文件"""
         try:
@@ -1172,11 +1393,11 @@ class WebSocketClient:
                 
                 fileinfo = {
                     "type": "file",
+                    "from": self.username,
+                    "to": self.session_peer,
                     "filename": filename,
                     "filetype": filetype,
                     "filesize": filesize,
-                    "from": self.username,
-                    "to": self.session_peer,
                     "data": file_data.hex()  # 转换为hex传输
                 }
                 
@@ -1197,12 +1418,12 @@ class WebSocketClient:
             # 发送文件开始消息
             start_msg = {
                 "type": "file_start",
+                "from": self.username,
+                "to": self.session_peer,
                 "filename": filename,
                 "filetype": filetype,
                 "filesize": filesize,
-                "chunks": (filesize + CHUNK_SIZE - 1) // CHUNK_SIZE,
-                "from": self.username,
-                "to": self.session_peer
+                "chunks": (filesize + CHUNK_SIZE - 1) // CHUNK_SIZE
             }
             await self.websocket.send(json.dumps(start_msg))
             print(f"[系统] 发送文件开始消息: {filename} ({filesize} bytes, {(filesize + CHUNK_SIZE - 1) // CHUNK_SIZE} chunks)")
@@ -1217,11 +1438,11 @@ class WebSocketClient:
                     
                     chunk_msg = {
                         "type": "file_chunk",
+                        "from": self.username,
+                        "to": self.session_peer,
                         "filename": filename,
                         "chunk_index": chunk_index,
-                        "chunk_data": chunk_data.hex(),
-                        "from": self.username,
-                        "to": self.session_peer
+                        "chunk_data": chunk_data.hex()
                     }
                     await self.websocket.send(json.dumps(chunk_msg))
                     print(f"[系统] 发送块 {chunk_index + 1}: {len(chunk_data)} bytes")
@@ -1230,9 +1451,9 @@ class WebSocketClient:
             # 发送文件结束消息
             end_msg = {
                 "type": "file_end",
-                "filename": filename,
                 "from": self.username,
-                "to": self.session_peer
+                "to": self.session_peer,
+                "filename": filename
             }
             await self.websocket.send(json.dumps(end_msg))
             print(f"[系统] 文件传输完成: {filename}")
@@ -1242,6 +1463,47 @@ class WebSocketClient:
             import traceback
             traceback.print_exc()
     
+    def start_background(self, coro):
+        """启动后台任务并保留引用，避免任务被提前回收"""
+        if not hasattr(self, 'background_tasks'):
+            self.background_tasks = set()
+        task = asyncio.create_task(coro)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+        return task
+    
+    async def extract_stego_file(self, peer, filetype, save_path):
+        """提取隐写文件中的消息并解密显示"""
+        try:
+            extracted_data = await extract_message_async(filetype, save_path)
+            print(f"[系统] 隐写提取成功，数据大小: {len(extracted_data)} bytes")
+            self.show_stego_message(peer, extracted_data)
+        except Exception as e:
+            print(f"[系统] 隐写提取失败: {e}")
+            import traceback
+            traceback.print_exc()
+    
+    def show_stego_message(self, peer, extracted_data):
+        """解密并显示隐写消息；分片先交给重组器，集齐后再解密"""
+        if is_shard(extracted_data):
+            shard = parse_shard(extracted_data)
+            extracted_data = self.shard_assembler.add(shard)
+            if extracted_data is None:
+                if self.shard_assembler.is_completed(shard.message_id):
+                    print(f"[系统] 忽略已重组消息的重复分片 {shard.index + 1}/{shard.total}")
+                    return
+                received, total = self.shard_assembler.progress(shard.message_id)
+                print(f"[系统] 收到分片 {shard.index + 1}/{shard.total}（已收到 {received}/{total}）")
+                return
+            print(f"[系统] 分片已集齐，重组数据大小: {len(extracted_data)} bytes")
+        
+        session_key = self.load_session_key(self.username, peer)
+        if session_key:
+            plaintext = self.decrypt_from_peer(peer, session_key, extracted_data)
+            print(f"[{peer}] (隐写消息) {plaintext}")
+        else:
+            print(f"[系统] 未找到与 {peer} 的会话密钥")
+    
     async def handle_message(self, message):
         """处理接收到的消息"""
         try:
@@ -1255,7 +1517,7 @@ class WebSocketClient:
                 session_key = self.load_session_key(self.username, peer)
                 if session_key:
                     try:
-                        plaintext = self.decrypt_message(session_key, data['content'])
+                        plaintext = self.decrypt_from_peer(peer, session_key, data['content'])
                         print(f"[{peer}] {plaintext}")
                     except Exception as e:
                         print(f"[系统] 解密失败: {e}")
@@ -1286,20 +1548,8 @@ class WebSocketClient:
                     # 如果是隐写文件，自动提取
                     if filetype in ['image', 'pdf', 'video']:
                         print(f"[系统] 检测到隐写文件，开始提取...")
-                        try:
-                            extracted_data = extract_message(filetype, save_path)
-                            print(f"[系统] 隐写提取成功，数据大小: {len(extracted_data)} bytes")
-                            
-                            session_key = self.load_session_key(self.username, peer)
-                            if session_key:
-                                plaintext = self.decrypt_message(session_key, extracted_data.decode())
-                                print(f"[{peer}] (隐写消息) {plaintext}")
-                            else:
-                                print(f"[系统] 未找到与 {peer} 的会话密钥")
-                        except Exception as e:
-                            print(f"[系统] 隐写提取失败: {e}")
-                            import traceback
-                            traceback.print_exc()
+                        # 在后台提取，接收循环可继续处理其他文件和分片
+                        self.start_background(self.extract_stego_file(peer, filetype, save_path))
                 except Exception as e:
                     print(f"[系统] 处理文件失败: {e}")
                     import traceback
@@ -1366,20 +1616,8 @@ class WebSocketClient:
                         # 如果是隐写文件，自动提取
                         if file_info['filetype'] in ['image', 'pdf', 'video']:
                             print(f"[系统] 检测到隐写文件，开始提取...")
-                            try:
-                                extracted_data = extract_message(file_info['filetype'], save_path)
-                                print(f"[系统] 隐写提取成功，数据大小: {len(extracted_data)} bytes")
-                                
-                                session_key = self.load_session_key(self.username, peer)
-                                if session_key:
-                                    plaintext = self.decrypt_message(session_key, extracted_data.decode())
-                                    print(f"[{peer}] (隐写消息) {plaintext}")
-                                else:
-                                    print(f"[系统] 未找到与 {peer} 的会话密钥")
-                            except Exception as e:
-                                print(f"[系统] 隐写提取失败: {e}")
-                                import traceback
-                                traceback.print_exc()
+                            # 在后台提取，接收循环可继续处理其他文件和分片
+                            self.start_background(self.extract_stego_file(peer, file_info['filetype'], save_path))
                     else:
                         print(f"[错误] 文件传输不完整: {received_chunks}/{expected_chunks} chunks")
                     
@@ -1391,9 +1629,9 @@ class WebSocketClient:
                 peer = data['peer']
                 peer_pub = data['peer_pub']
                 
-                priv, pub = self.ensure_sm2_keypair(self.username)
-                sm2_crypt = sm2.CryptSM2(public_key=peer_pub, private_key=priv)
-                session_key = sm2_crypt._kg(int(priv, 16), peer_pub)[:32]
+                # 临时私钥在会话建立前已由后台池生成，这里只需一次标量乘
+                priv = self.ephemeral_priv or self.ensure_sm2_keypair(self.username)[0]
+                session_key = sm2_ec.ecdh_hex(priv, peer_pub)[:32]
                 
                 self.save_session_key(self.username, peer, session_key)
                 print(f"[系统] 与 {peer} 的密钥交换完成")
@@ -1403,6 +1641,54 @@ class WebSocketClient:
                 peer = data['peer']
                 self.session_peer = peer
                 print(f"[系统] 已与 {peer} 建立会话")
+                # 后台预生成临时密钥对，供密钥更新使用
+                ephemeral.get_pool()
+                
+            elif data.get('type') == 'rekey':
+                # 对端发起密钥更新：取一对临时密钥，一次标量乘得到新会话密钥并回复公钥
+                peer = data['from']
+                priv, pub = ephemeral.take()
+                session_key = sm2_ec.ecdh_hex(priv, data['pubkey'])[:32]
+                # 对端收到 rekey_ack 之前发来的消息仍用旧密钥加密，旧密钥保留为回退
+                self.rotate_session_key(peer, session_key)
+                await self.websocket.send(json.dumps({
+                    "type": "rekey_ack",
+                    "from": self.username,
+                    "to": peer,
+                    "pubkey": pub
+                }))
+                print(f"[系统] 已响应 {peer} 的密钥更新")
+                
+            elif data.get('type') == 'rekey_ack':
+                # 本端发起的密钥更新得到回复
+                peer = data['from']
+                priv = self.pending_rekeys.pop(peer, None)
+                if priv is None:
+                    print(f"[警告] 收到来自 {peer} 的意外密钥更新回复，已忽略")
+                else:
+                    session_key = sm2_ec.ecdh_hex(priv, data['pubkey'])[:32]
+                    self.rotate_session_key(peer, session_key)
+                    print(f"[系统] 与 {peer} 的密钥更新完成")
+                
+            elif data.get('type') == 'session_members':
+                # 多人房间成员变化（会话密钥仍由 key_exchange 两两协商）
+                self.room_members = [member for member in data['members'] if member != self.username]
+                print(f"[系统] 房间 {data['session']} 成员: {', '.join(data['members'])}")
+                
+            elif data.get('type') == 'delivery_report':
+                # 群发时部分成员没有收到
+                failed = ', '.join(f"{user}({reason})" for user, reason in data['failed'].items())
+                print(f"[警告] {data['msg_type']} 已送达 {data['delivered']} 人，未送达: {failed}")
+                
+            elif data.get('type') == 'user_offline':
+                # 对端下线，会话结束
+                peer = data['username']
+                self.end_session(peer)
+                if peer == self.session_peer:
+                    self.session_peer = None
+                if peer in self.room_members:
+                    self.room_members.remove(peer)
+                print(f"[系统] {peer} 已下线")
                 
             elif data.get('type') == 'user_list':
                 print(f"[系统] 在线用户: {', '.join(data['users'])}")
@@ -1419,13 +1705,10 @@ class WebSocketClient:
             print(f"[系统] 已连接到服务器: {self.server_url}")
             
             # 发送用户名
-            await self.websocket.send(json.dumps({
-                "type": "login",
-                "username": self.username
-            }))
+            await self.websocket.send(json.dumps(self.login_message()))
             
             # 发送公钥
-            priv, pub = self.ensure_sm2_keypair(self.username)
+            priv, pub = self.session_keypair()
             await self.websocket.send(json.dumps({
                 "type": "pubkey",
                 "username": self.username,
@@ -1438,9 +1721,32 @@ class WebSocketClient:
                 
         except Exception as e:
             print(f"[错误] 连接失败: {e}")
+        finally:
+            # 连接断开或客户端退出，会话随之结束
+            self.end_session(self.session_peer)
+    
+    async def send_room_message(self, text):
+        """房间消息：会话密钥两两协商，按成员分别加密，各发一帧"""
+        sent = []
+        for member in self.room_members:
+            session_key = self.load_session_key(self.username, member)
+            if not session_key:
+                print(f"[警告] 未找到与 {member} 的会话密钥，跳过")
+                continue
+            await self.websocket.send(json.dumps({
+                "type": "msg",
+                "from": self.username,
+                "to": member,
+                "content": self.encrypt_message(session_key, text)
+            }))
+            sent.append(member)
+        print(f"[我 -> {', '.join(sent) or '无人'}] {text}")
     
     async def send_text_message(self, text):
-        """发送文本消息"""
+        """发送文本消息（在多人房间中发给房间内所有成员）"""
+        if not self.session_peer and self.room_members:
+            await self.send_room_message(text)
+            return
         if not self.session_peer:
             print("[错误] 未建立会话")
             return
@@ -1455,8 +1761,8 @@ class WebSocketClient:
             
             message = {
                 "type": "msg",
-                "to": self.session_peer,
                 "from": self.username,
+                "to": self.session_peer,
                 "content": encrypted
             }
             
@@ -1539,6 +1845,29 @@ class WebSocketClient:
                             continue
                         
                         await self.send_stego_message(carrier_type, input_path, output_path, plaintext)
+                    elif user_input == "sendshards":
+                        # 分片发送隐写消息（多个载体）
+                        print("\n=== 分片发送隐写消息 ===")
+                        carrier_type = input("请选择隐写类型（image/pdf/video）: ").strip().lower()
+                        if carrier_type not in ['image', 'pdf', 'video']:
+                            print("❌ 不支持的隐写类型")
+                            continue
+                        
+                        cover_files = input("请输入多个载体文件名（逗号分隔）: ").strip()
+                        input_paths = [self.resolve_input_path(name.strip()) for name in cover_files.split(',') if name.strip()]
+                        if not input_paths or not all(input_paths):
+                            print("❌ 无法找到载体文件")
+                            continue
+                        
+                        plaintext = input("请输入要发送的明文消息: ").strip()
+                        if not plaintext:
+                            print("❌ 消息不能为空")
+                            continue
+                        
+                        await self.send_sharded_stego_message(carrier_type, input_paths, plaintext)
+                    elif user_input.strip() == "rekey":
+                        # 更新会话密钥
+                        await self.request_rekey()
                     elif user_input == "files":
                         # 显示可用文件
                         print("\n=== 可用文件 ===")
@@ -1594,10 +1923,10 @@ class WebSocketClient:
                                 continue
                         
                         try:
-                            extracted_data = extract_message(carrier_type, stego_path)
+                            extracted_data = await extract_message_async(carrier_type, stego_path)
                             session_key = self.load_session_key(self.username, self.session_peer)
                             if session_key:
-                                plaintext = self.decrypt_message(session_key, extracted_data.decode())
+                                plaintext = self.decrypt_message(session_key, extracted_data)
                                 print(f"[系统] 解密得到明文: {plaintext}")
                             else:
                                 print("[系统] 未找到会话密钥")
@@ -1623,9 +1952,12 @@ class WebSocketClient:
             if not self.username:
                 print("[错误] 用户名不能为空")
                 return
+            self.set_session_target(input("配对对象（用户名；#房间名 加入多人房间；留空自动配对）: "))
                 
             print("\n=== 命令说明 ===")
             print("sendmsg - 发送隐写消息")
+            print("sendshards - 分片发送隐写消息（多个载体并行）")
+            print("rekey - 更新会话密钥（临时SM2密钥对）")
             print("sendfile <文件名> <文件类型> - 发送文件")
             print("files - 显示可用文件")
             print("extractmsg - 提取隐写消息")
@@ -1651,6 +1983,7 @@ class WebSocketClient:
 async def main():
     client = WebSocketClient()
     client.username = input("请输入用户名: ").strip()
+    client.set_session_target(input("配对对象（用户名；#房间名 加入多人房间；留空自动配对）: "))
     
     # 启动输入循环
     client.start_input_loop()
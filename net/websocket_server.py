@@ -1,36 +1,629 @@
 import asyncio
+import atexit
 import websockets
+import websockets.exceptions
 import json
 import logging
+import logging.handlers
 import functools
+import itertools
+import queue
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from json.decoder import scanstring
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 日志：高频消息抽样记录，载荷字段只记录长度，明细由计数器汇总
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+LOG_SAMPLE_EVERY = 100     # 高频类型每 N 条记录一条
+SAMPLED_TYPES = frozenset(['msg', 'file_chunk', 'heartbeat'])
+LOG_FIELD_MAX = 64         # 超过该长度的字段值在日志中只记录长度
+STATS_INTERVAL = 60        # 汇总计数的输出间隔（秒）
+
+# 服务器只转发、不关心内容的消息类型
+FORWARD_TYPES = frozenset(['msg', 'file', 'file_start', 'file_chunk', 'file_end', 'rekey', 'rekey_ack'])
+# 单独计数的消息类型；type 由客户端提供，其余一律归入 other，计数表和指标标签都有界
+COUNTED_TYPES = FORWARD_TYPES | frozenset(['login', 'pubkey', 'heartbeat', 'user_list'])
+OTHER_TYPE = 'other'
+ROUTE_FIELDS = ('type', 'from', 'to')
+ROUTE_HEADER_LIMIT = 1024  # 路由字段只在帧开头这么多字符内查找
+
+# 每个连接的发送队列
+DEFAULT_QUEUE_SIZE = 256
+QUEUE_POLICIES = ('drop', 'block', 'disconnect')
+DEFAULT_QUEUE_POLICY = 'block'
+_CLOSE = object()  # 写任务结束标记
+
+DEFAULT_ROOM_CAPACITY = 64  # 多人房间的成员上限
+
+# /metrics 端点（本机 HTTP，与 WebSocket 服务共用事件循环）
+DEFAULT_METRICS_HOST = '127.0.0.1'
+DEFAULT_METRICS_PORT = 8766          # 0 表示不启动
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LOOP_LAG_INTERVAL = 0.5              # 事件循环延迟的采样间隔（秒）
+TRANSFER_IDLE = 60                   # 文件传输超过该时间没有新块视为结束（秒）
+METRICS_TOP_QUEUES = 20              # 逐用户输出队列深度的最大用户数（按深度排序）
+FILE_TYPES = frozenset(['file_start', 'file_chunk', 'file_end'])
+
+_decoder = json.JSONDecoder()
+_WS = ' \t\n\r'
+_ROUTE_KEYS = tuple(f'"{field}"' for field in ROUTE_FIELDS)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """同进程队列不需要序列化，记录原样入队，格式化留给监听线程"""
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(level=logging.INFO):
+    """
+    根日志器只挂一个 QueueHandler：事件循环里记日志只是入队，
+    格式化和写出在 QueueListener 的后台线程中完成。返回 listener。
+    """
+    log_queue = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    root = logging.getLogger()
+    root.handlers[:] = [_DeferredQueueHandler(log_queue)]
+    root.setLevel(level)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def _shorten(value, limit=LOG_FIELD_MAX):
+    if isinstance(value, str) and len(value) > limit:
+        return f'<{len(value)} chars>'
+    return value
+
+
+class MessageSummary:
+    """日志参数：只在日志真正输出时才生成 key=value 摘要，长字段（如十六进制载荷）只记录长度"""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        if not isinstance(self.data, dict):
+            return repr(_shorten(self.data))
+        return ' '.join(f'{key}={_shorten(value)!r}' for key, value in self.data.items())
+
+
+class MessageCounters:
+    """按消息类型计数（收到/转发/丢弃/字符数），取代逐条日志"""
+
+    def __init__(self):
+        self.received = Counter()
+        self.forwarded = Counter()
+        self.dropped = Counter()
+        self.chars = Counter()
+
+    @staticmethod
+    def bucket(msg_type):
+        """计数用的类型：未知类型（包括非字符串）归入 other"""
+        return msg_type if isinstance(msg_type, str) and msg_type in COUNTED_TYPES else OTHER_TYPE
+
+    def receive(self, msg_type, size):
+        """计数并返回这条消息是否需要记日志（高频类型抽样）"""
+        msg_type = self.bucket(msg_type)
+        self.received[msg_type] += 1
+        self.chars[msg_type] += size
+        return msg_type not in SAMPLED_TYPES or self.received[msg_type] % LOG_SAMPLE_EVERY == 1
+
+    def snapshot(self):
+        return {
+            'received': dict(self.received),
+            'forwarded': dict(self.forwarded),
+            'dropped': dict(self.dropped),
+            'chars': dict(self.chars),
+        }
+
+
+def _unique_keys(pairs):
+    """json.loads 的 object_pairs_hook：拒绝重复键（否则服务器与接收方可能看到不同的 type/to）"""
+    result = {}
+    for key, value in pairs:
+        if key in result:
+            raise ValueError(f"重复的键: {key}")
+        result[key] = value
+    return result
+
+
+def _no_route_keys_after(message, pos):
+    """
+    pos 之后不可能再出现路由键时返回 True。
+    任何位置出现反斜杠都回退（键可以写成 \\uXXXX 转义）；否则逐个检查引号处是否为 "type"/"from"/"to"。
+    只用单字符查找，十六进制/base64 载荷里没有引号，128KB 的文件块只需几微秒；
+    载荷恰好是 "to" 之类的字符串时误判，只会多走一次完整解析
+    """
+    if message.find('\\', pos) >= 0:
+        return False
+    pos = message.find('"', pos)
+    while pos >= 0:
+        if message.startswith(_ROUTE_KEYS, pos):
+            return False
+        pos = message.find('"', pos + 1)
+    return True
+
+
+def _skip_ws(text, pos):
+    while pos < len(text) and text[pos] in _WS:
+        pos += 1
+    return pos
+
+
+def parse_route(message, limit=ROUTE_HEADER_LIMIT):
+    """
+    只解析帧开头的路由字段（type、from、to），不解析后面的载荷。
+
+    客户端把这三个字段放在 JSON 对象最前面，128KB 的文件块也只需看前几十个字符；
+    路由字段之前的其他字段也会被跳过，只要都在 limit 之内。
+    找不到全部路由字段、字段不是字符串或帧不是 JSON 对象时返回 None，调用方回退到完整解析。
+
+    原始帧会原样转发，而接收方 json.loads 以最后一个重复键为准，所以路由键重复出现时也返回 None：
+    头部内直接检查；其余部分只查找引号和反斜杠（不解析载荷），见 _no_route_keys_after。
+    """
+    if not isinstance(message, str):
+        return None
+    head = message[:limit]
+    route = {}
+    try:
+        pos = _skip_ws(head, 0)
+        if head[pos:pos + 1] != '{':
+            return None
+        pos += 1
+        while True:
+            pos = _skip_ws(head, pos)
+            if head[pos:pos + 1] != '"':
+                return None
+            key, pos = scanstring(head, pos + 1)
+            pos = _skip_ws(head, pos)
+            if head[pos:pos + 1] != ':':
+                return None
+            value, pos = _decoder.raw_decode(head, _skip_ws(head, pos + 1))
+            if key in ROUTE_FIELDS:
+                if key in route or not isinstance(value, str):
+                    return None
+                route[key] = value
+                if len(route) == len(ROUTE_FIELDS):
+                    return route if _no_route_keys_after(message, pos) else None
+            pos = _skip_ws(head, pos)
+            if head[pos:pos + 1] != ',':
+                return None
+            pos += 1
+    except ValueError:
+        # 截断在某个值中间（例如大载荷排在路由字段之前）
+        return None
+
+class Histogram:
+    """累积桶直方图（Prometheus 格式），observe 为 O(log 桶数)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一格为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """[(上界, 累积计数)]，最后一项上界为 '+Inf'"""
+        result, total = [], 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class ServerMetrics:
+    """
+    /metrics 需要的运行时数据：连接数、转发延迟（收到帧到写任务发送完成）、
+    事件循环延迟、进行中的文件传输。消息计数和队列状态直接取自服务器。
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.connections = 0
+        self.connections_total = 0
+        self.latency = Histogram()
+        self.loop_lag = Histogram()
+        self.loop_lag_last = 0.0
+        self.loop_lag_max = 0.0
+        self.transfers = {}  # (from, to) -> [开始时间, 块数, 最后一块时间]
+
+    def track_file(self, msg_type, sender, target, now=None):
+        now = time.perf_counter() if now is None else now
+        key = (sender, target)
+        if msg_type == 'file_start':
+            self.transfers[key] = [now, 0, now]
+        elif msg_type == 'file_chunk':
+            transfer = self.transfers.setdefault(key, [now, 0, now])
+            transfer[1] += 1
+            transfer[2] = now
+        else:
+            self.transfers.pop(key, None)
+
+    def active_transfers(self, now=None):
+        """进行中的传输 {(from, to): (块数, 块/秒)}，顺便清理长时间没有新块的记录"""
+        now = time.perf_counter() if now is None else now
+        result = {}
+        for key, (started, chunks, last) in list(self.transfers.items()):
+            if now - last > TRANSFER_IDLE:
+                del self.transfers[key]
+                continue
+            elapsed = now - started
+            result[key] = (chunks, chunks / elapsed if elapsed > 0 else 0.0)
+        return result
+
+    async def monitor_loop_lag(self, interval=LOOP_LAG_INTERVAL):
+        """定时 sleep，实际醒来时间比预期晚多少即为事件循环延迟"""
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.perf_counter() - start - interval)
+            self.loop_lag.observe(lag)
+            self.loop_lag_last = lag
+            self.loop_lag_max = max(self.loop_lag_max, lag)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics(server):
+    """按 Prometheus 文本格式输出服务器指标"""
+    metrics = server.metrics
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{_label(val)}"' for key, val in labels.items())
+            lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+    def histogram(name, help_text, hist):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for bound, count in hist.cumulative():
+            lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+        lines.append(f'{name}_sum {hist.sum:.6f}')
+        lines.append(f'{name}_count {hist.count}')
+
+    metric('e2e_relay_uptime_seconds', 'gauge', '服务器运行时间', [({}, round(time.time() - metrics.started, 3))])
+    metric('e2e_relay_connections', 'gauge', '当前 WebSocket 连接数', [({}, metrics.connections)])
+    metric('e2e_relay_connections_total', 'counter', '累计接受的连接数', [({}, metrics.connections_total)])
+    metric('e2e_relay_online_users', 'gauge', '已登录用户数', [({}, len(server.clients))])
+    metric('e2e_relay_sessions', 'gauge', '会话数', [({}, len(server.sessions))])
+
+    # 标签只取有界的类型集合（见 MessageCounters.bucket），客户端无法制造新的时间序列
+    counters = server.counters
+    label_types = sorted(COUNTED_TYPES) + [OTHER_TYPE]
+    for name, counter, help_text in (
+            ('e2e_relay_messages_received_total', counters.received, '收到的消息数'),
+            ('e2e_relay_messages_forwarded_total', counters.forwarded, '成功放入接收方队列的消息数'),
+            ('e2e_relay_messages_dropped_total', counters.dropped, '未能投递的消息数'),
+            ('e2e_relay_message_bytes_total', counters.chars, '收到的消息字节数（JSON 帧为 ASCII）')):
+        metric(name, 'counter', help_text, [({'type': t}, counter[t]) for t in label_types if t in counter])
+
+    histogram('e2e_relay_latency_seconds', '收到帧到写任务发送完成的转发延迟', metrics.latency)
+
+    queues = server.queue_stats()
+    depths = [item['depth'] for item in queues.values()]
+    metric('e2e_relay_queue_depth_total', 'gauge', '所有发送队列中的消息总数', [({}, sum(depths))])
+    metric('e2e_relay_queue_depth_max', 'gauge', '最深的发送队列', [({}, max(depths, default=0))])
+    top = sorted(queues.items(), key=lambda item: item[1]['depth'], reverse=True)[:METRICS_TOP_QUEUES]
+    metric('e2e_relay_queue_depth', 'gauge', f'发送队列深度（最深的 {METRICS_TOP_QUEUES} 个用户）',
+           [({'user': user}, item['depth']) for user, item in top])
+    metric('e2e_relay_queue_dropped_total', 'counter', '队列满被丢弃的消息数（同上用户）',
+           [({'user': user}, item['dropped']) for user, item in top])
+
+    transfers = metrics.active_transfers()
+    metric('e2e_relay_transfers_active', 'gauge', '进行中的文件传输数', [({}, len(transfers))])
+    metric('e2e_relay_transfer_chunks', 'gauge', '文件传输已转发的块数',
+           [({'from': src, 'to': dst}, chunks) for (src, dst), (chunks, _) in transfers.items()])
+    metric('e2e_relay_transfer_chunk_rate', 'gauge', '文件传输的块速率（块/秒）',
+           [({'from': src, 'to': dst}, round(rate, 3)) for (src, dst), (_, rate) in transfers.items()])
+
+    metric('e2e_relay_loop_lag_seconds', 'gauge', '最近一次测得的事件循环延迟', [({}, round(metrics.loop_lag_last, 6))])
+    metric('e2e_relay_loop_lag_max_seconds', 'gauge', '事件循环延迟最大值', [({}, round(metrics.loop_lag_max, 6))])
+    histogram('e2e_relay_loop_lag_hist_seconds', '事件循环延迟分布', metrics.loop_lag)
+    return '\n'.join(lines) + '\n'
+
+
+class ClientConnection:
+    """
+    单个客户端的发送端：有界发送队列 + 独立的写任务。
+
+    其他连接的处理协程只把消息放进队列，真正的 websocket.send 在写任务中进行，
+    慢速接收方只会让自己的队列变满，不会阻塞服务器的其他部分。队列满时按 policy 处理:
+        drop        丢弃这条消息（计入 dropped）
+        block       发送方等待队列有空位（只阻塞发送方自己的连接）
+        disconnect  断开这个慢速客户端
+    """
+
+    def __init__(self, username, websocket, maxsize=DEFAULT_QUEUE_SIZE, policy=DEFAULT_QUEUE_POLICY, latency=None):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"未知的队列策略: {policy}")
+        self.username = username
+        self.websocket = websocket
+        self.policy = policy
+        self.latency = latency  # Histogram：收到帧到发送完成的耗时
+        self.queue = asyncio.Queue(maxsize)
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self.writer = asyncio.create_task(self._drain())
+
+    def depth(self):
+        return self.queue.qsize()
+
+    def stats(self):
+        return {
+            'depth': self.depth(),
+            'maxsize': self.queue.maxsize,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'policy': self.policy,
+        }
+
+    async def send(self, message, received_at=None):
+        """放入发送队列，返回是否入队；received_at 为收到原始帧的 perf_counter 时间，用于统计转发延迟"""
+        if self.closed:
+            return False
+        item = (message, received_at)
+        if self.policy == 'block':
+            await self.queue.put(item)
+            return True
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.policy == 'disconnect':
+                logger.warning("发送队列已满，断开连接 user=%s maxsize=%d", self.username, self.queue.maxsize)
+                self._abort()
+            elif self.dropped % LOG_SAMPLE_EVERY == 1:
+                logger.warning("发送队列已满，丢弃消息 user=%s maxsize=%d dropped=%d",
+                               self.username, self.queue.maxsize, self.dropped)
+            return False
+
+    async def _drain(self):
+        while True:
+            item = await self.queue.get()
+            if item is _CLOSE:
+                break
+            message, received_at = item
+            try:
+                await self.websocket.send(message)
+                self.sent += 1
+                if received_at is not None and self.latency is not None:
+                    self.latency.observe(time.perf_counter() - received_at)
+            except websockets.exceptions.ConnectionClosed:
+                logger.info("连接已关闭，停止发送 user=%s", self.username)
+                self._abort()
+                break
+            except Exception as e:
+                logger.error("发送失败 user=%s error=%s", self.username, e)
+                self._abort()
+                break
+
+    def _discard(self):
+        """清空队列，唤醒在 block 策略下等待入队的发送方"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    def _abort(self):
+        """立即停止写任务并关闭连接；连接关闭后接收循环结束，由 handle_client 清理"""
+        self.closed = True
+        if self.writer is not asyncio.current_task():
+            self.writer.cancel()
+        self._discard()
+        asyncio.ensure_future(self.websocket.close())
+
+    async def close(self, timeout=5):
+        """停止接收新消息，等写任务把已入队的消息发完"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.queue.put_nowait(_CLOSE)
+        except asyncio.QueueFull:
+            self.writer.cancel()
+        try:
+            await asyncio.wait_for(self.writer, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        self._discard()
+
+
+class Session:
+    """
+    一个会话：两人配对（capacity=2）或多人房间。
+
+    成员按加入顺序保存；pubkeys 只保存本会话成员上报的公钥，
+    密钥交换和下线通知都只发给同一会话的成员。
+    """
+    __slots__ = ('id', 'capacity', 'auto', 'members', 'pubkeys')
+
+    def __init__(self, session_id, capacity=2, auto=False):
+        self.id = session_id
+        self.capacity = capacity
+        self.auto = auto        # 未指定会话的用户自动配对产生
+        self.members = {}       # username -> ClientConnection
+        self.pubkeys = {}       # username -> pubkey
+
+    @property
+    def is_pair(self):
+        return self.capacity == 2
+
+    def is_full(self):
+        return len(self.members) >= self.capacity
+
+    def peers(self, username):
+        return [user for user in self.members if user != username]
+
+
 class WebSocketServer:
-    def __init__(self, host="0.0.0.0", port=8765):
+    """
+    转发服务器。每个用户属于一个会话，登录消息决定加入哪个会话:
+        {"type": "login", "username": "alice"}                    自动与下一个未指定会话的用户配对
+        {"type": "login", "username": "alice", "peer": "bob"}     与 bob 的两人会话
+        {"type": "login", "username": "alice", "session": "ops"}  加入多人房间 ops
+    转发类消息只能发给同一会话的成员；to 为会话 id（如 room:ops）时群发给会话内其他成员。
+    """
+
+    def __init__(self, host="0.0.0.0", port=8765, queue_size=DEFAULT_QUEUE_SIZE, queue_policy=DEFAULT_QUEUE_POLICY,
+                 room_capacity=DEFAULT_ROOM_CAPACITY, metrics_host=DEFAULT_METRICS_HOST,
+                 metrics_port=DEFAULT_METRICS_PORT):
+        if queue_policy not in QUEUE_POLICIES:
+            raise ValueError(f"未知的队列策略: {queue_policy}")
         self.host = host
         self.port = port
-        self.clients = {}  # username -> websocket
-        self.pubkeys = {}  # username -> pubkey
-        self.lock = asyncio.Lock()
+        self.queue_size = queue_size
+        self.queue_policy = queue_policy
+        self.room_capacity = room_capacity
+        self.metrics_host = metrics_host
+        self.metrics_port = metrics_port
+        self.clients = {}        # username -> ClientConnection
+        self.sessions = {}       # session id -> Session
+        self.user_sessions = {}  # username -> Session
+        self._waiting = deque()  # 等待第二个成员的自动配对会话
+        self._auto_ids = itertools.count(1)
+        self.lock = asyncio.Lock()  # 只保护上面这些索引的成员变化，不在持锁时发送
+        self.counters = MessageCounters()
+        self.metrics = ServerMetrics()
+        
+    def queue_stats(self):
+        """各连接发送队列的深度与丢弃计数"""
+        return {user: conn.stats() for user, conn in list(self.clients.items())}
+    
+    async def send_to(self, user, payload):
+        """序列化并放入 user 的发送队列"""
+        conn = self.clients.get(user)
+        if conn is None:
+            return False
+        return await conn.send(json.dumps(payload))
+    
+    def _session_for_login(self, username, data):
+        """按登录消息找到或创建会话；无法加入时返回 (None, 错误信息)。调用方持有 self.lock"""
+        peer = data.get('peer')
+        room = data.get('session')
+        if peer:
+            session_id = 'pair:' + '|'.join(sorted([username, peer]))
+            session = self.sessions.get(session_id) or Session(session_id, 2)
+        elif room:
+            session_id = f'room:{room}'
+            session = self.sessions.get(session_id) or Session(session_id, self.room_capacity)
+        else:
+            # 跳过已满或已解散的等待会话
+            while self._waiting and (self._waiting[0].is_full() or self._waiting[0].id not in self.sessions):
+                self._waiting.popleft()
+            if self._waiting:
+                session = self._waiting.popleft()
+            else:
+                session = Session(f'auto:{next(self._auto_ids)}', 2, auto=True)
+                self._waiting.append(session)
+        if session.is_full():
+            return None, "会话已满"
+        return session, None
+    
+    async def register(self, username, websocket, data=None):
+        """
+        登记用户并加入会话，返回 (ClientConnection, Session, 错误信息)；
+        会话状态变化的通知在释放锁之后发送
+        """
+        async with self.lock:
+            if username in self.clients:
+                return None, None, "用户名已存在"
+            session, error = self._session_for_login(username, data or {})
+            if error:
+                return None, None, error
+            conn = ClientConnection(username, websocket, self.queue_size, self.queue_policy, self.metrics.latency)
+            self.clients[username] = conn
+            self.sessions[session.id] = session
+            self.user_sessions[username] = session
+            session.members[username] = conn
+            members = list(session.members)
+        logger.info("用户上线 user=%s session=%s members=%d", username, session.id, len(members))
         
+        if session.is_pair:
+            # 两人会话满员：通知双方会话已建立，并主动向双方索要公钥
+            if len(members) == 2:
+                logger.info("会话建立 session=%s users=%s,%s", session.id, members[0], members[1])
+                for msg_type in ("session_ready", "request_pubkey"):
+                    for user in members:
+                        peer = members[1] if user == members[0] else members[0]
+                        await self.send_to(user, {"type": msg_type, "peer": peer})
+                        logger.debug("发送 type=%s to=%s", msg_type, user)
+        else:
+            await self.broadcast(members, {"type": "session_members", "session": session.id, "members": members})
+        return conn, session, None
+    
+    async def unregister(self, username, conn):
+        """移出会话并通知同一会话的其他成员；只清理本连接登记的用户名"""
+        async with self.lock:
+            if self.clients.get(username) is not conn:
+                return
+            del self.clients[username]
+            session = self.user_sessions.pop(username)
+            session.members.pop(username, None)
+            session.pubkeys.pop(username, None)
+            others = list(session.members)
+            if not others:
+                del self.sessions[session.id]
+            elif session.auto:
+                # 自动配对会话剩下一人时重新等待配对
+                self._waiting.append(session)
+        await conn.close()
+        await self.broadcast(others, {
+            "type": "user_offline",
+            "username": username
+        })
+    
+    async def handle_pubkey(self, username, pubkey):
+        """记录公钥，并在同一会话内与已上报公钥的成员两两交换"""
+        async with self.lock:
+            session = self.user_sessions.get(username)
+            if session is None:
+                return
+            session.pubkeys[username] = pubkey
+            peers = [(peer, session.pubkeys[peer]) for peer in session.peers(username) if peer in session.pubkeys]
+        logger.info("收到公钥上报 user=%s session=%s", username, session.id)
+        
+        for peer, peer_pub in peers:
+            await self.send_to(username, {"type": "key_exchange", "peer": peer, "peer_pub": peer_pub})
+            await self.send_to(peer, {"type": "key_exchange", "peer": username, "peer_pub": pubkey})
+            logger.debug("发送 type=key_exchange users=%s,%s", username, peer)
+    
     async def handle_client(self, websocket, path):
         """处理客户端连接"""
         username = None
+        conn = None
+        self.metrics.connections += 1
+        self.metrics.connections_total += 1
         try:
-            logger.info(f"新连接: {websocket.remote_address}")
+            logger.info("新连接 remote=%s", websocket.remote_address)
             
             # 等待客户端发送用户名
             async for message in websocket:
                 try:
                     data = json.loads(message)
-                    logger.info(f"收到消息: {data}")
+                    if self.counters.receive(data.get('type'), len(message)):
+                        logger.debug("收到消息 %s", MessageSummary(data))
                     
                     if data.get('type') == 'login':
                         username = data['username']
-                        logger.info(f"用户 {username} 尝试上线")
+                        logger.info("用户尝试上线 user=%s", username)
                         
                         if not username:
                             await websocket.send(json.dumps({
@@ -39,184 +632,216 @@ class WebSocketServer:
                             }))
                             return
                             
-                        async with self.lock:
-                            if username in self.clients:
-                                logger.info(f"用户名已存在: {username}")
-                                await websocket.send(json.dumps({
-                                    "type": "error",
-                                    "message": "用户名已存在"
-                                }))
-                                return
-                                
-                            if len(self.clients) >= 2:
-                                logger.info(f"已有两人在线，拒绝 {username}")
-                                await websocket.send(json.dumps({
-                                    "type": "error",
-                                    "message": "只允许两人在线"
-                                }))
-                                return
-                                
-                            self.clients[username] = websocket
-                            
-                        logger.info(f"用户 {username} 已上线")
-                        
-                        # 通知双方会话已建立
-                        async with self.lock:
-                            if len(self.clients) == 2:
-                                users = list(self.clients.keys())
-                                logger.info(f"会话建立: {users[0]} <-> {users[1]}")
-                                
-                                for user in users:
-                                    peer = users[1] if user == users[0] else users[0]
-                                    try:
-                                        await self.clients[user].send(json.dumps({
-                                            "type": "session_ready",
-                                            "peer": peer
-                                        }))
-                                        logger.info(f"发送session_ready给 {user}")
-                                    except Exception as e:
-                                        logger.error(f"发送session_ready失败: {e}")
-                                    
-                                # 主动向双方索要公钥
-                                for user in users:
-                                    peer = users[1] if user == users[0] else users[0]
-                                    try:
-                                        await self.clients[user].send(json.dumps({
-                                            "type": "request_pubkey",
-                                            "peer": peer
-                                        }))
-                                        logger.info(f"发送request_pubkey给 {user}")
-                                    except Exception as e:
-                                        logger.error(f"发送request_pubkey失败: {e}")
+                        conn, _, error = await self.register(username, websocket, data)
+                        if error:
+                            logger.info("拒绝登录 user=%s reason=%s", username, error)
+                            await websocket.send(json.dumps({
+                                "type": "error",
+                                "message": error
+                            }))
+                            return
                         break
                         
                 except json.JSONDecodeError as e:
-                    logger.warning(f"收到非JSON消息: {message}, 错误: {e}")
+                    logger.warning("收到非JSON消息 user=%s message=%s error=%s", username, MessageSummary(message), e)
                 except Exception as e:
-                    logger.error(f"客户端异常: {e}", exc_info=True)
-                    break
+                    # 登录消息不完整等：断开连接，不能进入主循环
+                    logger.error("客户端异常 user=%s error=%s", username, e, exc_info=True)
+                    return
+
+            if conn is None:
+                # 未登录就断开的连接
+                return
                     
             # 主消息循环
             async for message in websocket:
+                received_at = time.perf_counter()
                 try:
-                    data = json.loads(message)
-                    logger.info(f"收到消息: {data}")
+                    # 快速路径：只读路由字段，原始帧原样转发，不做完整的 json.loads/json.dumps
+                    route = parse_route(message)
+                    if route and route['type'] in FORWARD_TYPES:
+                        sampled = self.counters.receive(route['type'], len(message))
+                        await self.forward(route, message, username, received_at, sampled)
+                        continue
+                    
+                    data = json.loads(message, object_pairs_hook=_unique_keys)
+                    sampled = self.counters.receive(data.get('type'), len(message))
+                    if sampled:
+                        logger.debug("收到消息 %s", MessageSummary(data))
                     
                     if data.get('type') == 'pubkey':
-                        # 处理公钥上报
-                        user = data['username']
-                        pubkey = data['pubkey']
-                        
-                        async with self.lock:
-                            self.pubkeys[user] = pubkey
-                            logger.info(f"收到 {user} 的公钥上报")
-                            
-                            if len(self.pubkeys) == 2:
-                                users = list(self.pubkeys.keys())
-                                for u in users:
-                                    peer = users[1] if u == users[0] else users[0]
-                                    peer_pub = self.pubkeys[peer]
-                                    
-                                    try:
-                                        await self.clients[u].send(json.dumps({
-                                            "type": "key_exchange",
-                                            "peer": peer,
-                                            "peer_pub": peer_pub
-                                        }))
-                                        logger.info(f"发送key_exchange给 {u}")
-                                    except Exception as e:
-                                        logger.error(f"发送key_exchange失败: {e}")
-                                    
-                    elif data.get('type') == 'msg':
-                        # 转发加密消息
-                        target = data['to']
-                        async with self.lock:
-                            if target in self.clients:
-                                try:
-                                    await self.clients[target].send(json.dumps(data))
-                                    logger.info(f"转发加密消息: {data['from']} -> {target}")
-                                except Exception as e:
-                                    logger.error(f"转发消息失败: {e}")
-                                
-                    elif data.get('type') == 'file':
-                        # 转发文件
-                        target = data['to']
-                        async with self.lock:
-                            if target in self.clients:
-                                try:
-                                    await self.clients[target].send(json.dumps(data))
-                                    logger.info(f"转发文件: {data['from']} -> {target}, 文件: {data['filename']}")
-                                except Exception as e:
-                                    logger.error(f"转发文件失败: {e}")
+                        # 处理公钥上报（以连接登记的用户名为准）
+                        await self.handle_pubkey(username, data['pubkey'])
                                     
-                    elif data.get('type') in ['file_start', 'file_chunk', 'file_end']:
-                        # 转发分块文件消息
-                        target = data['to']
-                        async with self.lock:
-                            if target in self.clients:
-                                try:
-                                    await self.clients[target].send(json.dumps(data))
-                                    if data.get('type') == 'file_start':
-                                        logger.info(f"转发文件开始: {data['from']} -> {target}, 文件: {data['filename']}")
-                                    elif data.get('type') == 'file_chunk':
-                                        logger.info(f"转发文件块: {data['from']} -> {target}, 文件: {data['filename']}, 块: {data['chunk_index']}")
-                                    elif data.get('type') == 'file_end':
-                                        logger.info(f"转发文件结束: {data['from']} -> {target}, 文件: {data['filename']}")
-                                except Exception as e:
-                                    logger.error(f"转发分块文件消息失败: {e}")
+                    elif data.get('type') in FORWARD_TYPES:
+                        # 路由字段不在帧开头的旧客户端：完整解析后仍转发原始帧
+                        await self.forward(data, message, username, received_at, sampled)
                     elif data.get('type') == 'heartbeat':
                         # 处理心跳消息
-                        logger.debug(f"收到心跳: {data['from']}")
                         # 可以在这里添加心跳响应逻辑
+                        pass
                                 
                     elif data.get('type') == 'user_list':
-                        # 返回用户列表
-                        async with self.lock:
-                            users = list(self.clients.keys())
-                            try:
-                                await websocket.send(json.dumps({
-                                    "type": "user_list",
-                                    "users": users
-                                }))
-                                logger.info(f"发送用户列表给 {username}")
-                            except Exception as e:
-                                logger.error(f"发送用户列表失败: {e}")
+                        # 返回同一会话的成员（经自己的发送队列，保持与其他消息的顺序）
+                        session = self.user_sessions.get(username)
+                        await self.send_to(username, {
+                            "type": "user_list",
+                            "users": list(session.members) if session else []
+                        })
+                        logger.debug("发送 type=user_list to=%s", username)
                             
                 except json.JSONDecodeError as e:
-                    logger.warning(f"收到非JSON消息: {message}, 错误: {e}")
+                    logger.warning("收到非JSON消息 user=%s message=%s error=%s", username, MessageSummary(message), e)
+                except ValueError as e:
+                    logger.warning("拒绝消息 user=%s message=%s error=%s", username, MessageSummary(message), e)
                 except Exception as e:
-                    logger.error(f"处理消息失败: {e}")
+                    logger.error("处理消息失败 user=%s error=%s", username, e)
                     
         except websockets.exceptions.ConnectionClosed:
-            logger.info(f"连接关闭: {username}")
+            logger.info("连接关闭 user=%s", username)
         except Exception as e:
-            logger.error(f"客户端异常: {e}")
+            logger.error("客户端异常 user=%s error=%s", username, e)
         finally:
-            # 清理连接
+            # 清理连接（重名被拒的连接没有登记，不影响已在线的用户）
+            self.metrics.connections -= 1
             try:
-                async with self.lock:
-                    if username and username in self.clients:
-                        del self.clients[username]
-                    if username and username in self.pubkeys:
-                        del self.pubkeys[username]
-                        
-                    # 通知其他用户下线
-                    for user, ws in self.clients.items():
-                        try:
-                            await ws.send(json.dumps({
-                                "type": "user_offline",
-                                "username": username
-                            }))
-                        except:
-                            pass
-                            
-                logger.info(f"用户 {username} 下线")
+                if conn is not None:
+                    await self.unregister(username, conn)
+                logger.info("用户下线 user=%s", username)
             except Exception as e:
-                logger.error(f"清理连接失败: {e}")
+                logger.error("清理连接失败 user=%s error=%s", username, e)
+    
+    async def broadcast(self, users, message, received_at=None):
+        """
+        把同一帧交给多个用户的写任务：dict 只序列化一次，各连接并发入队，
+        某个接收方队列满（block 策略下等待）或已断开不影响其他接收方。
+        返回投递失败的用户及原因 {username: 'offline' | 'closed' | 'queue_full' | 异常信息}
+        """
+        frame = message if isinstance(message, str) else json.dumps(message)
+        targets, failures = [], {}
+        for user in users:
+            conn = self.clients.get(user)
+            if conn is None:
+                failures[user] = 'offline'
+            else:
+                targets.append((user, conn))
+        if not targets:
+            return failures
+        
+        results = await asyncio.gather(*(conn.send(frame, received_at) for _, conn in targets), return_exceptions=True)
+        for (user, conn), result in zip(targets, results):
+            if isinstance(result, BaseException):
+                failures[user] = str(result) or type(result).__name__
+            elif not result:
+                failures[user] = 'closed' if conn.closed else 'queue_full'
+        return failures
+    
+    async def fan_out(self, session, route, message, sender, received_at=None):
+        """会话内群发：to 为会话 id 的帧原样发给除发送方外的所有成员，失败的接收方回报给发送方"""
+        msg_type = route['type']
+        failures = await self.broadcast(session.peers(sender), message, received_at)
+        delivered = len(session.members) - 1 - len(failures)
+        self.counters.forwarded[msg_type] += delivered
+        if failures:
+            self.counters.dropped[msg_type] += len(failures)
+            logger.warning("群发部分失败 type=%s session=%s from=%s failed=%s", msg_type, session.id, sender, failures)
+            await self.send_to(sender, {
+                "type": "delivery_report",
+                "session": session.id,
+                "msg_type": msg_type,
+                "delivered": delivered,
+                "failed": failures
+            })
+        return failures
+    
+    async def forward(self, route, message, sender, received_at=None, sampled=False):
+        """
+        把原始帧放入 route['to'] 的发送队列，不重新序列化；只转发给与 sender 同一会话的成员。
+        to 为发送方所在会话的 id 时群发给会话内其他成员。
+        收到计数由调用方（handle_client）记一次，sampled 为该条是否抽样记日志。
+        接收方以帧里的 from 判断来源（rekey 等据此更换会话密钥），from 与登录用户名不符的帧直接丢弃
+        """
+        msg_type = route['type']
+        target = route.get('to')
+        if route.get('from') != sender:
+            self.counters.dropped[msg_type] += 1
+            logger.warning("丢弃伪造来源的帧 type=%s from=%r sender=%s", msg_type, route.get('from'), sender)
+            return
+        own = self.user_sessions.get(sender)
+        if own is not None and target == own.id:
+            await self.fan_out(own, route, message, sender, received_at)
+            return
+        session = self.user_sessions.get(target)
+        conn = session.members.get(target) if session else None
+        if conn is None or sender not in session.members:
+            self.counters.dropped[msg_type] += 1
+            return
+        if not await conn.send(message, received_at):
+            self.counters.dropped[msg_type] += 1
+            return
+        self.counters.forwarded[msg_type] += 1
+        if msg_type in FILE_TYPES:
+            self.metrics.track_file(msg_type, route.get('from'), target)
+        if sampled:
+            logger.debug("转发 type=%s from=%s to=%s chars=%d count=%d", msg_type, route.get('from'), target,
+                         len(message), self.counters.received[msg_type])
+    
+    def stats(self):
+        """消息计数与各连接发送队列状态"""
+        return {'messages': self.counters.snapshot(), 'queues': self.queue_stats(),
+                'online': len(self.clients), 'sessions': len(self.sessions)}
+    
+    async def report_stats(self, interval=STATS_INTERVAL):
+        """定期输出一行汇总，取代逐条转发日志"""
+        last = None
+        while True:
+            await asyncio.sleep(interval)
+            snapshot = self.counters.snapshot()
+            if snapshot == last:
+                continue
+            last = snapshot
+            depths = {user: item['depth'] for user, item in self.queue_stats().items()}
+            logger.info("消息统计 received=%s forwarded=%s dropped=%s queues=%s",
+                        snapshot['received'], snapshot['forwarded'], snapshot['dropped'], depths)
+    
+    async def handle_metrics(self, reader, writer):
+        """极简 HTTP 处理：GET /metrics 返回 Prometheus 文本，其余路径 404"""
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 5)
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 5)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+            parts = request_line.decode('latin-1').split()
+            path = parts[1].split('?')[0] if len(parts) >= 2 else ''
+            if len(parts) >= 2 and parts[0] == 'GET' and path == '/metrics':
+                status, body = '200 OK', render_metrics(self).encode('utf-8')
+                content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            else:
+                status, body, content_type = '404 Not Found', b'not found\n', 'text/plain'
+            writer.write(f'HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n'
+                         f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + body)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug("metrics 请求失败 error=%s", e)
+        finally:
+            writer.close()
+    
+    async def start_metrics(self):
+        """在当前事件循环上启动 /metrics HTTP 服务；metrics_port 为 0 时不启动"""
+        if not self.metrics_port:
+            return None
+        server = await asyncio.start_server(self.handle_metrics, self.metrics_host, self.metrics_port)
+        logger.info("指标端点 url=http://%s:%s/metrics", self.metrics_host, self.metrics_port)
+        return server
     
     async def start(self):
-        logger.info(f"启动WebSocket服务器: {self.host}:{self.port}")
+        logger.info("启动WebSocket服务器 host=%s port=%s", self.host, self.port)
+        reporter = asyncio.create_task(self.report_stats())
+        lag_monitor = asyncio.create_task(self.metrics.monitor_loop_lag())
+        metrics_server = None
         try:
+            metrics_server = await self.start_metrics()
             async with websockets.serve(
                 functools.partial(self.handle_client), 
                 self.host, 
@@ -228,7 +853,12 @@ class WebSocketServer:
                 logger.info("服务器已启动，等待连接...")
                 await asyncio.Future()  # 保持运行
         except Exception as e:
-            logger.error(f"服务器启动失败: {e}")
+            logger.error("服务器启动失败 error=%s", e)
+        finally:
+            reporter.cancel()
+            lag_monitor.cancel()
+            if metrics_server is not None:
+                metrics_server.close()
     
     def run(self):
         """运行服务器"""
@@ -237,8 +867,22 @@ class WebSocketServer:
         except KeyboardInterrupt:
             logger.info("收到退出信号，正在关闭服务器...")
         except Exception as e:
-            logger.error(f"服务器异常: {e}")
+            logger.error("服务器异常 error=%s", e)
 
 if __name__ == "__main__":
-    server = WebSocketServer()
+    import argparse
+    parser = argparse.ArgumentParser(description='WebSocket 转发服务器')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE, help='每个连接的发送队列长度')
+    parser.add_argument('--queue-policy', choices=QUEUE_POLICIES, default=DEFAULT_QUEUE_POLICY,
+                        help='发送队列满时的处理方式')
+    parser.add_argument('--room-capacity', type=int, default=DEFAULT_ROOM_CAPACITY, help='多人房间的成员上限')
+    parser.add_argument('--metrics-host', default=DEFAULT_METRICS_HOST, help='/metrics 监听地址')
+    parser.add_argument('--metrics-port', type=int, default=DEFAULT_METRICS_PORT, help='/metrics 端口（0 表示不启动）')
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'])
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+    server = WebSocketServer(args.host, args.port, args.queue_size, args.queue_policy, args.room_capacity,
+                             args.metrics_host, args.metrics_port)
     server.run()
\ No newline at end of file
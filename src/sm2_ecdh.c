@@ -6,6 +6,7 @@
 #include <gmssl/error.h>
 #include "sm2_ecdh.h"
 
+// PEM 文件接口（e2e-tool 使用）。内存缓冲区接口在 sm2_ecdh_raw.c，单独编译为动态库
 int sm2_generate_keypair(const char *privkey_path, const char *pubkey_path) {
     SM2_KEY key;
 
@@ -0,0 +1,95 @@
+#include <stdint.h>
+#include <string.h>
+#include <gmssl/sm2.h>
+#include <gmssl/version.h>
+#include "sm2_ecdh.h"
+
+// 内存缓冲区接口，单独编译为 sm2_ecdh 动态库（供 crypto/sm2_native.py 调用）。
+// 不依赖 PEM 接口和 sm2_z256_point_to_uncompressed_octets 等 3.1.2 才有的函数，
+// 所以在 GmSSL 3.1.2 之前的版本上也能加载
+
+// GmSSL 3.1.2 起 SM2_KEY 改用 SM2_Z256_POINT / sm2_z256_t，更早的版本为 SM2_POINT / 字节数组
+#if GMSSL_VERSION_NUM >= 30102
+#define SM2_ECDH_Z256 1
+#endif
+
+int sm2_ecdh_gmssl_version(void) {
+    return GMSSL_VERSION_NUM;
+}
+
+// 由原始私钥字节构造 SM2_KEY（同时计算公钥）
+static int sm2_key_from_raw(SM2_KEY *key, const uint8_t priv[SM2_RAW_PRIVATE_KEY_SIZE]) {
+    memset(key, 0, sizeof(SM2_KEY));
+#ifdef SM2_ECDH_Z256
+    sm2_z256_t d;
+    sm2_z256_from_bytes(d, priv);
+    return sm2_key_set_private_key(key, d) == 1 ? 0 : -1;
+#else
+    return sm2_key_set_private_key(key, priv) == 1 ? 0 : -1;
+#endif
+}
+
+static void sm2_public_key_to_raw(const SM2_KEY *key, uint8_t pub[SM2_RAW_PUBLIC_KEY_SIZE]) {
+#ifdef SM2_ECDH_Z256
+    sm2_z256_point_to_bytes(&key->public_key, pub);
+#else
+    memcpy(pub, key->public_key.x, 32);
+    memcpy(pub + 32, key->public_key.y, 32);
+#endif
+}
+
+int sm2_generate_keypair_raw(uint8_t priv[SM2_RAW_PRIVATE_KEY_SIZE], uint8_t pub[SM2_RAW_PUBLIC_KEY_SIZE]) {
+    SM2_KEY key;
+
+    if (sm2_key_generate(&key) != 1) {
+        return -1;
+    }
+#ifdef SM2_ECDH_Z256
+    sm2_z256_to_bytes(key.private_key, priv);
+#else
+    memcpy(priv, key.private_key, SM2_RAW_PRIVATE_KEY_SIZE);
+#endif
+    sm2_public_key_to_raw(&key, pub);
+    memset(&key, 0, sizeof(key));
+    return 0;
+}
+
+int sm2_compute_public_key_raw(const uint8_t priv[SM2_RAW_PRIVATE_KEY_SIZE], uint8_t pub[SM2_RAW_PUBLIC_KEY_SIZE]) {
+    SM2_KEY key;
+
+    if (sm2_key_from_raw(&key, priv) != 0) {
+        return -1;
+    }
+    sm2_public_key_to_raw(&key, pub);
+    memset(&key, 0, sizeof(key));
+    return 0;
+}
+
+int sm2_derive_session_key_raw(const uint8_t priv[SM2_RAW_PRIVATE_KEY_SIZE],
+                               const uint8_t peer_pub[SM2_RAW_PUBLIC_KEY_SIZE],
+                               uint8_t shared[SM2_RAW_SHARED_SIZE]) {
+    SM2_KEY local_key;
+    uint8_t peer_public_octets[65]; // 0x04 || x || y
+    int ret = -1;
+
+    if (sm2_key_from_raw(&local_key, priv) != 0) {
+        return -1;
+    }
+    peer_public_octets[0] = 0x04;
+    memcpy(peer_public_octets + 1, peer_pub, SM2_RAW_PUBLIC_KEY_SIZE);
+
+#ifdef SM2_ECDH_Z256
+    if (sm2_ecdh(&local_key, peer_public_octets, sizeof(peer_public_octets), shared) == 1) {
+        ret = 0;
+    }
+#else
+    SM2_POINT point;
+    if (sm2_ecdh(&local_key, peer_public_octets, sizeof(peer_public_octets), &point) == 1) {
+        memcpy(shared, point.x, 32);
+        memcpy(shared + 32, point.y, 32);
+        ret = 0;
+    }
+#endif
+    memset(&local_key, 0, sizeof(local_key));
+    return ret;
+}
@@ -0,0 +1,46 @@
+"""服务器测试共用的假连接和辅助函数"""
+import asyncio
+import json
+
+
+class FakeConnection:
+    """
+    假 WebSocket 连接：sent 记录服务器发出的原始帧；
+    incoming 为按顺序收到的帧（收完即断开），slow=True 时 send 阻塞到 release 被设置
+    """
+    def __init__(self, incoming=(), slow=False):
+        self.incoming = list(incoming)
+        self.sent = []
+        self.release = asyncio.Event()
+        if not slow:
+            self.release.set()
+        self.remote_address = ('127.0.0.1', 0)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.incoming:
+            raise StopAsyncIteration
+        return self.incoming.pop(0)
+
+    async def send(self, message):
+        await self.release.wait()
+        self.sent.append(message)
+
+    async def close(self):
+        self.incoming.clear()
+
+    @property
+    def messages(self):
+        """解析后的已发送帧"""
+        return [json.loads(m) for m in self.sent]
+
+    def of_type(self, msg_type):
+        return [m for m in self.messages if m['type'] == msg_type]
+
+
+async def flush():
+    """等各连接的写任务把队列发完"""
+    for _ in range(5):
+        await asyncio.sleep(0)
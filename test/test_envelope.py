@@ -0,0 +1,94 @@
+import base64
+import os
+from crypto import envelope, zuc
+
+SESSION_KEY = os.urandom(64).hex()
+
+def test_seal_and_open():
+    data = os.urandom(1000)
+    blob = envelope.seal(SESSION_KEY, data)
+    assert envelope.is_envelope(blob)
+    assert len(blob) == envelope.HEADER.size + len(data) + envelope.MAC_LEN
+    assert envelope.open_envelope(SESSION_KEY, blob) == data
+
+    bare = envelope.seal(SESSION_KEY, data, mac=False)
+    assert len(bare) == envelope.HEADER.size + len(data)
+    assert envelope.open_any(SESSION_KEY, bare, require_mac=False) == data
+    print("二进制信封加解密测试通过")
+
+def test_size_vs_legacy_hex():
+    plaintext = '隐写消息' * 500
+    legacy = zuc.encrypt_message(SESSION_KEY, plaintext).encode()
+    blob = envelope.seal(SESSION_KEY, plaintext.encode())
+    assert len(blob) * 2 < len(legacy) + 2 * (envelope.HEADER.size + envelope.MAC_LEN)
+    print(f"信封大小 {len(blob)} 字节，旧格式 {len(legacy)} 字节")
+
+def test_tamper_detected():
+    blob = bytearray(envelope.seal(SESSION_KEY, b'secret'))
+    blob[envelope.HEADER.size] ^= 1
+    try:
+        envelope.open_envelope(SESSION_KEY, bytes(blob))
+        assert False, "篡改的信封应当校验失败"
+    except ValueError:
+        pass
+    try:
+        envelope.open_envelope(SESSION_KEY, bytes(blob[:-1]))
+        assert False, "截断的信封应当被拒绝"
+    except ValueError:
+        pass
+    print("信封篡改检测测试通过")
+
+def test_stripped_mac_rejected():
+    blob = bytearray(envelope.seal(SESSION_KEY, b'pay 100 to bob'))
+    # 清除 MAC 标志、截掉校验值并翻转一位密文
+    blob[2] &= ~envelope.FLAG_MAC
+    del blob[-envelope.MAC_LEN:]
+    blob[envelope.HEADER.size] ^= 1
+    for opener in (envelope.open_envelope, envelope.open_any):
+        try:
+            opener(SESSION_KEY, bytes(blob))
+            assert False, "去掉 MAC 的信封应当被拒绝"
+        except ValueError:
+            pass
+    try:
+        envelope.decrypt_text(SESSION_KEY, base64.b64encode(bytes(blob)).decode())
+        assert False, "去掉 MAC 的 base64 信封应当被拒绝"
+    except ValueError:
+        pass
+    assert envelope.open_envelope(SESSION_KEY, bytes(blob), require_mac=False) == b'qay 100 to bob'
+    print("去除 MAC 降级攻击检测测试通过")
+
+def test_text_and_legacy_formats():
+    text = 'hello 你好'
+    b64 = envelope.encrypt_text(SESSION_KEY, text)
+    assert envelope.open_envelope(SESSION_KEY, base64.b64decode(b64)) == text.encode()
+    assert envelope.decrypt_text(SESSION_KEY, b64) == text
+
+    legacy = zuc.encrypt_message(SESSION_KEY, text)
+    assert envelope.decrypt_text(SESSION_KEY, legacy, require_mac=False) == text
+    assert envelope.decrypt_text(SESSION_KEY, legacy.encode(), require_mac=False) == text
+    print("base64 与旧格式兼容测试通过")
+
+def test_legacy_downgrade_rejected():
+    blob = envelope.seal(SESSION_KEY, b'pay alice 100')
+    _, _, _, iv, length = envelope.HEADER.unpack_from(blob)
+    ciphertext = bytearray(blob[envelope.HEADER.size:envelope.HEADER.size + length])
+    ciphertext[10] ^= ord('1') ^ ord('9')
+    # 去掉信封和 MAC，改写成旧的 iv:ct 格式
+    legacy = iv.hex() + ':' + ciphertext.hex()
+    for payload in (legacy, legacy.encode()):
+        try:
+            envelope.decrypt_text(SESSION_KEY, payload)
+            assert False, "默认应拒绝没有校验值的旧格式"
+        except ValueError:
+            pass
+    assert envelope.decrypt_text(SESSION_KEY, legacy, require_mac=False) == 'pay alice 900'
+    print("旧格式降级攻击检测测试通过")
+
+if __name__ == "__main__":
+    test_seal_and_open()
+    test_size_vs_legacy_hex()
+    test_tamper_detected()
+    test_stripped_mac_rejected()
+    test_text_and_legacy_formats()
+    test_legacy_downgrade_rejected()
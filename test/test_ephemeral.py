@@ -0,0 +1,129 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+from crypto import ephemeral, sm2_ec
+from crypto.keystore import KeyStore
+
+def test_pool_prefills_and_keys_unique():
+    pool = ephemeral.EphemeralKeyPool(size=3)
+    try:
+        assert pool.wait_ready(3, timeout=10)
+        seen = set()
+        for _ in range(10):
+            priv, pub = pool.take()  # 池空时当场生成
+            assert priv not in seen
+            seen.add(priv)
+            assert sm2_ec.public_key_hex(priv) == pub
+        assert pool.wait_ready(3, timeout=10)
+    finally:
+        pool.close()
+    assert len(pool) == 0
+    print("临时密钥对池预生成与唯一性测试通过")
+
+def test_enabled_flag():
+    with mock.patch.dict(os.environ, {ephemeral.EPHEMERAL_ENV: '1'}):
+        assert ephemeral.enabled()
+    with mock.patch.dict(os.environ, {ephemeral.EPHEMERAL_ENV: '0'}):
+        assert not ephemeral.enabled()
+    print("临时密钥开关测试通过")
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+def _make_client(name):
+    from net.websocket_client import WebSocketClient
+    client = WebSocketClient()
+    client.username = name
+    client.websocket = FakeWebSocket()
+    return client
+
+def test_rekey_round_trip():
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch('net.websocket_client.get_keystore', return_value=KeyStore(tmp)):
+        alice, bob = _make_client('alice'), _make_client('bob')
+        alice.session_peer, bob.session_peer = 'bob', 'alice'
+
+        async def run():
+            await alice.request_rekey()
+            rekey = alice.websocket.sent.pop()
+            assert json.loads(rekey)['type'] == 'rekey'
+            await bob.handle_message(rekey)
+            ack = bob.websocket.sent.pop()
+            assert json.loads(ack)['type'] == 'rekey_ack'
+            await alice.handle_message(ack)
+
+        asyncio.run(run())
+        key_a = alice.load_session_key('alice', 'bob')
+        key_b = bob.load_session_key('bob', 'alice')
+        assert key_a is not None and key_a == key_b
+        assert not alice.pending_rekeys
+    print("rekey 密钥更新往返测试通过")
+
+def test_message_in_flight_during_rekey():
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch('net.websocket_client.get_keystore', return_value=KeyStore(tmp)):
+        alice, bob = _make_client('alice'), _make_client('bob')
+        alice.session_peer, bob.session_peer = 'bob', 'alice'
+        old_key = os.urandom(16).hex()
+        alice.save_session_key('alice', 'bob', old_key)
+        bob.save_session_key('bob', 'alice', old_key)
+
+        def msg_from_alice(text):
+            content = alice.encrypt_message(alice.load_session_key('alice', 'bob'), text)
+            return json.dumps({"type": "msg", "from": "alice", "to": "bob", "content": content})
+
+        async def run():
+            await alice.request_rekey()
+            rekey = alice.websocket.sent.pop()
+            # alice 在收到 rekey_ack 之前发出的消息仍用旧密钥加密，经服务器排在 rekey 之后到达
+            in_flight = msg_from_alice("rekey 途中的消息")
+            await bob.handle_message(rekey)
+            await bob.handle_message(in_flight)
+            assert 'alice' in bob.previous_keys
+            await alice.handle_message(bob.websocket.sent.pop())
+            await bob.handle_message(msg_from_alice("新密钥的消息"))
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            asyncio.run(run())
+        lines = output.getvalue().splitlines()
+        assert "[alice] rekey 途中的消息" in lines
+        assert "[alice] 新密钥的消息" in lines
+        assert not any("解密失败" in line for line in lines)
+        # 新密钥解密成功后不再保留旧密钥
+        assert not bob.previous_keys
+    print("密钥更新途中消息解密测试通过")
+
+def test_session_setup_with_ephemeral_keys():
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch('net.websocket_client.get_keystore', return_value=KeyStore(tmp)), \
+            mock.patch.dict(os.environ, {ephemeral.EPHEMERAL_ENV: '1'}):
+        alice, bob = _make_client('alice'), _make_client('bob')
+        _, pub_a = alice.session_keypair()
+        _, pub_b = bob.session_keypair()
+        assert alice.ephemeral_priv and bob.ephemeral_priv
+        # 未写入长期密钥
+        assert not os.path.exists(os.path.join(tmp, 'keys'))
+
+        async def run():
+            await alice.handle_message(json.dumps({"type": "key_exchange", "peer": "bob", "peer_pub": pub_b}))
+            await bob.handle_message(json.dumps({"type": "key_exchange", "peer": "alice", "peer_pub": pub_a}))
+
+        asyncio.run(run())
+        assert alice.load_session_key('alice', 'bob') == bob.load_session_key('bob', 'alice')
+    print("临时密钥会话建立测试通过")
+
+if __name__ == "__main__":
+    test_pool_prefills_and_keys_unique()
+    test_enabled_flag()
+    test_rekey_round_trip()
+    test_message_in_flight_during_rekey()
+    test_session_setup_with_ephemeral_keys()
@@ -0,0 +1,38 @@
+from hide.bench import parse_size, format_size, build_cases, case_key, capacity, compare_with_baseline
+
+def test_parse_size():
+    assert parse_size("1K") == 1024
+    assert parse_size("100M") == 100 * 1024 * 1024
+    assert parse_size("512") == 512
+    assert format_size(parse_size("64K")) == "64K"
+    print("大小解析测试通过")
+
+def test_build_cases():
+    cases = build_cases(['image', 'pdf', 'video'], [1024], [1, 2], ['640x480'], [1, 10])
+    keys = [case_key(c) for c in cases]
+    assert keys == [
+        'image/1K/640x480/n1', 'image/1K/640x480/n2',
+        'pdf/1K/p1', 'pdf/1K/p10',
+        'video/1K/640x480',
+    ]
+    print("用例生成测试通过")
+
+def test_capacity():
+    assert capacity({'carrier': 'image', 'size': 1024, 'n_bits': 1, 'resolution': '640x480'}) == 640 * 480 * 3 // 8 - 4
+    # PDF 嵌入数据不超过原文件的5%：1页放不下 1K，页数越多容量越大
+    one, ten = capacity({'carrier': 'pdf', 'pages': 1}), capacity({'carrier': 'pdf', 'pages': 10})
+    assert 0 < one < 1024 and one < ten
+    print("载体容量估计测试通过")
+
+def test_compare_with_baseline():
+    baseline = {'results': [{'key': 'image/1K/640x480/n1', 'status': 'ok', 'embed_s': 1.0, 'extract_s': 1.0, 'peak_rss': 100}]}
+    results = [{'key': 'image/1K/640x480/n1', 'status': 'ok', 'embed_s': 1.5, 'extract_s': 1.05, 'peak_rss': 100}]
+    regressions = compare_with_baseline(results, baseline, threshold=0.1)
+    assert [(key, metric) for key, metric, *_ in regressions] == [('image/1K/640x480/n1', 'embed_s')]
+    print("基线对比测试通过")
+
+if __name__ == "__main__":
+    test_parse_size()
+    test_build_cases()
+    test_capacity()
+    test_compare_with_baseline()
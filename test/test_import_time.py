@@ -0,0 +1,77 @@
+"""
+冷启动导入耗时检查：用 python -X importtime 在全新解释器中导入客户端模块，
+累计耗时超过预算或提前加载了重量级依赖时失败。
+
+预算可通过环境变量 E2E_IMPORT_BUDGET_SCALE 按机器速度整体放缩。
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 模块 -> 累计导入耗时预算（毫秒）
+IMPORT_BUDGETS_MS = {
+    'hide.steg': 25,
+    'net.client_factory': 25,
+    'net.websocket_client': 250,
+}
+
+# 纯文本聊天启动时不应加载的重量级模块
+DEFERRED_MODULES = ['cv2', 'numpy', 'skimage', 'PyPDF2', 'gmssl', 'gmalg', 'readline',
+                    'firebase_admin', 'socketio']
+
+RUNS = 5
+
+
+def measure_import(module, runs=RUNS):
+    """返回 (累计导入耗时中位数ms, 导入的模块名集合)"""
+    samples = []
+    loaded = set()
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+        )
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:') or '|' not in line:
+                continue
+            _, cumulative, name = line.split('|')
+            name = name.strip()
+            loaded.add(name)
+            if name == module and cumulative.strip().isdigit():
+                samples.append(int(cumulative) / 1000)
+    return statistics.median(samples), loaded
+
+
+def test_import_time_budget():
+    scale = float(os.environ.get('E2E_IMPORT_BUDGET_SCALE', '1'))
+    failures = []
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        elapsed, loaded = measure_import(module)
+        eager = sorted(m for m in DEFERRED_MODULES if m in loaded)
+        print(f"{module:<24} {elapsed:8.1f} ms (预算 {budget * scale:.0f} ms)"
+              + (f"  提前加载: {', '.join(eager)}" if eager else ""))
+        if elapsed > budget * scale:
+            failures.append(f"{module} 导入耗时 {elapsed:.1f} ms 超出预算 {budget * scale:.0f} ms")
+        if eager:
+            failures.append(f"{module} 启动时加载了 {', '.join(eager)}")
+    assert not failures, '\n'.join(failures)
+
+
+def test_check_dependencies_does_not_import():
+    code = ("import sys, contextlib, io\n"
+            "import net.client_factory as f\n"
+            "with contextlib.redirect_stdout(io.StringIO()):\n"
+            "    f.check_dependencies()\n"
+            f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))\n")
+    proc = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT,
+                          capture_output=True, text=True, check=True)
+    assert proc.stdout.strip() == '', f"依赖检查导入了: {proc.stdout.strip()}"
+    print("依赖检查未导入任何重量级模块")
+
+
+if __name__ == "__main__":
+    test_import_time_budget()
+    test_check_dependencies_does_not_import()
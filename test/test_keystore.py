@@ -0,0 +1,131 @@
+import json
+import os
+import tempfile
+import threading
+from unittest import mock
+from crypto.keystore import KeyStore
+
+def test_session_keys_cached_and_persisted():
+    with tempfile.TemporaryDirectory() as base:
+        store = KeyStore(base)
+        session_key = os.urandom(16).hex()
+        store.set_session_key('alice', 'bob', session_key)
+        assert store.get_session_key('bob', 'alice') == session_key
+
+        # 之后的查询只走内存缓存，不再打开文件
+        key = store.get_session_key_bytes('alice', 'bob')
+        with mock.patch('builtins.open', side_effect=AssertionError("不应读盘")):
+            for _ in range(100):
+                assert store.get_session_key_bytes('bob', 'alice') is key
+
+        with open(store.index_path, 'r', encoding='utf-8') as f:
+            assert json.load(f)['sessions'] == {'alice': {'bob': session_key}}
+        assert KeyStore(base).get_session_key('alice', 'bob') == session_key
+    print("会话密钥缓存与持久化测试通过")
+
+def test_rekey_invalidates_cache():
+    with tempfile.TemporaryDirectory() as base:
+        store = KeyStore(base)
+        store.set_session_key('alice', 'bob', '00' * 16)
+        assert store.get_session_key_bytes('alice', 'bob') == bytes(16)
+        store.set_session_key('bob', 'alice', 'ff' * 16)
+        assert store.get_session_key_bytes('alice', 'bob') == b'\xff' * 16
+    print("密钥交换后缓存失效测试通过")
+
+def test_many_peers_single_index_file():
+    with tempfile.TemporaryDirectory() as base:
+        store = KeyStore(base)
+        for i in range(1000):
+            store._load_index()[('alice', f'peer{i:04d}')] = f'{i:032x}'
+        store.set_session_key('alice', 'zed', 'ab' * 16)
+        assert sorted(os.listdir(store.session_dir)) == ['index.json', 'index.lock']
+        reloaded = KeyStore(base)
+        assert reloaded.session_count() == 1001
+        assert reloaded.get_session_key_bytes('peer0042', 'alice') == (42).to_bytes(16, 'big')
+    print("千个对端单索引文件测试通过")
+
+def test_concurrent_fill_not_stale():
+    with tempfile.TemporaryDirectory() as base:
+        store = KeyStore(base)
+        store.set_session_key('alice', 'bob', '00' * 16)
+        old_read = store.get_session_key
+        started, release = threading.Event(), threading.Event()
+
+        def slow_read(me, peer):
+            session_key = old_read(me, peer)
+            started.set()
+            release.wait(1)
+            return session_key
+
+        store.get_session_key = slow_read
+        reader = threading.Thread(target=store.get_session_key_bytes, args=('alice', 'bob'))
+        reader.start()
+        started.wait(1)
+        writer = threading.Thread(target=store.set_session_key, args=('bob', 'alice', 'ff' * 16))
+        writer.start()
+        release.set()
+        reader.join()
+        writer.join()
+        store.get_session_key = old_read
+        assert store.get_session_key_bytes('alice', 'bob') == b'\xff' * 16
+    print("并发读取与密钥更换不留旧缓存测试通过")
+
+def test_processes_share_index():
+    with tempfile.TemporaryDirectory() as base:
+        first, second = KeyStore(base), KeyStore(base)
+        first.set_session_key('alice', 'bob', '11' * 16)
+        second.set_session_key('carol', 'dave', '22' * 16)
+        first.set_session_key('alice', 'erin', '33' * 16)
+        second.set_session_key('alice', 'bob', '44' * 16)
+        reloaded = KeyStore(base)
+        assert reloaded.session_count() == 3
+        assert reloaded.get_session_key('alice', 'bob') == '44' * 16
+        assert reloaded.get_session_key('carol', 'dave') == '22' * 16
+        assert reloaded.get_session_key('alice', 'erin') == '33' * 16
+        # 另一个实例更换过的密钥在下次写入合并时刷新
+        first.set_session_key('frank', 'gina', '55' * 16)
+        assert first.get_session_key_bytes('alice', 'bob') == b'\x44' * 16
+    print("多进程共享索引合并测试通过")
+
+def test_legacy_migration():
+    with tempfile.TemporaryDirectory() as base:
+        store = KeyStore(base)
+        os.makedirs(store.session_dir)
+        with open(store.legacy_session_path('bob', 'alice'), 'w') as f:
+            f.write('12' * 64)
+        assert store.get_session_key_bytes('alice', 'bob') == b'\x12' * 16
+        assert KeyStore(base)._load_index()[('alice', 'bob')] == '12' * 64
+    print("旧版会话密钥迁移测试通过")
+
+def test_missing_key_lookup_cached():
+    with tempfile.TemporaryDirectory() as base:
+        store = KeyStore(base)
+        with mock.patch('crypto.keystore.os.path.exists', wraps=os.path.exists) as exists:
+            for _ in range(100):
+                assert store.get_session_key_bytes('alice', 'carol') is None
+        assert exists.call_count == 1
+        # 保存密钥后不再视为缺失
+        store.set_session_key('alice', 'carol', 'ab' * 64)
+        assert store.get_session_key_bytes('carol', 'alice') == b'\xab' * 16
+        assert ('alice', 'carol') not in store._missing
+    print("缺失会话密钥查找缓存测试通过")
+
+def test_keypair_cached():
+    with tempfile.TemporaryDirectory() as base:
+        store = KeyStore(base)
+        priv, pub = store.ensure_keypair('alice')
+        assert len(priv) == 64 and len(pub) == 128
+        with mock.patch('builtins.open', side_effect=AssertionError("不应读盘")):
+            assert store.ensure_keypair('alice') == (priv, pub)
+        assert KeyStore(base).ensure_keypair('alice') == (priv, pub)
+    print("SM2 密钥对缓存测试通过")
+
+if __name__ == "__main__":
+    test_session_keys_cached_and_persisted()
+    test_rekey_invalidates_cache()
+    test_many_peers_single_index_file()
+    test_concurrent_fill_not_stale()
+    test_processes_share_index()
+    test_legacy_migration()
+    test_missing_key_lookup_cached()
+    test_keypair_cached()
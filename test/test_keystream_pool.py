@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from unittest import mock
+from crypto import envelope, keystream_pool, zuc
+from crypto.keystore import KeyStore
+
+def test_pool_fills_and_each_iv_used_once():
+    key = os.urandom(16)
+    pool = keystream_pool.KeystreamPool(key, size=4, length=256)
+    try:
+        assert pool.wait_ready(4, timeout=10)
+        ivs = set()
+        for _ in range(20):
+            assert pool.wait_ready(1, timeout=10)
+            iv, keystream = pool.take(100)
+            assert iv not in ivs
+            ivs.add(iv)
+            assert keystream == zuc.python_crypt(key, iv, bytes(256))
+        assert pool.take(257) is None  # 超长消息不走池
+    finally:
+        pool.close()
+    print("密钥流池填充与IV唯一性测试通过")
+
+def test_drain_and_close():
+    pool = keystream_pool.KeystreamPool(os.urandom(16), size=4, length=64)
+    assert pool.wait_ready(4, timeout=10)
+    pool.drain()
+    assert len(pool) <= 1  # 清空后后台可能已重新生成一对
+    assert pool.wait_ready(4, timeout=10)
+    pool.close()
+    assert len(pool) == 0 and pool.take(10) is None
+    pool._thread.join(timeout=5)
+    assert not pool._thread.is_alive()
+    print("密钥流池清空与关闭测试通过")
+
+def test_envelope_uses_pool():
+    key = os.urandom(16)
+    pool = keystream_pool.warm(key)
+    try:
+        assert pool.wait_ready(keystream_pool.DEFAULT_POOL_SIZE, timeout=30)
+        pooled_ivs = {iv for iv, _ in list(pool._items)}
+        blob = envelope.seal(key, '你好'.encode())
+        assert blob[3:19] in pooled_ivs
+        assert envelope.seal(key, '你好'.encode())[3:19] != blob[3:19]
+        assert envelope.open_envelope(key, blob) == '你好'.encode()
+
+        start = time.perf_counter()
+        for _ in range(5):
+            envelope.seal(key, b'hi')
+        print(f"池化加密5条短消息耗时 {(time.perf_counter() - start) * 1000:.2f} ms")
+    finally:
+        keystream_pool.discard(key)
+    assert keystream_pool.take(key, 10) is None
+    print("信封使用密钥流池测试通过")
+
+class ClosingWebSocket:
+    """登录后立即断开的连接"""
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+def test_session_end_drains_pool():
+    from net.websocket_client import WebSocketClient
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch('net.websocket_client.get_keystore', return_value=KeyStore(tmp)):
+        client = WebSocketClient()
+        client.username = 'alice'
+
+        # 对端下线
+        client.save_session_key('alice', 'bob', '01' * 16)
+        key = client.load_session_key('alice', 'bob')
+        client.session_peer = 'bob'
+        assert key in keystream_pool._pools
+        asyncio.run(client.handle_message(json.dumps({"type": "user_offline", "username": "bob"})))
+        assert key not in keystream_pool._pools and client.session_peer is None
+
+        # 连接断开
+        client.save_session_key('alice', 'carol', '02' * 16)
+        key = client.load_session_key('alice', 'carol')
+        client.session_peer = 'carol'
+        assert key in keystream_pool._pools
+
+        async def fake_connect(*args, **kwargs):
+            return ClosingWebSocket()
+
+        with mock.patch('net.websocket_client.websockets.connect', fake_connect):
+            asyncio.run(client.connect())
+        assert key not in keystream_pool._pools
+    print("会话结束清空密钥流池测试通过")
+
+if __name__ == "__main__":
+    test_pool_fills_and_each_iv_used_once()
+    test_drain_and_close()
+    test_envelope_uses_pool()
+    test_session_end_drains_pool()
@@ -1,36 +1,68 @@
+"""
+ZUC 性能测试（进程内计时，见 crypto.perf）
+
+直接运行时测量 16B–4MB 的完整套件并输出 p50/p95/p99 与 MB/s：
+    python test/test_perf.py [--json perf.json] [--baseline perf.json]
+"""
 import os
-import time
-import subprocess
-import hashlib
+import sys
+import tempfile
 
-os.makedirs("perf_test", exist_ok=True)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-lengths = [2**n for n in range(4, 22)]  # 从 16B 到 4MB
+from crypto import perf
 
-print(f"{'Size (bytes)':>12} | {'Enc Time (ms)':>14} | {'Dec Time (ms)':>14} | {'OK?'}")
-print("-" * 55)
+def test_percentile_and_summary():
+    samples = [i / 1000 for i in range(1, 101)]  # 1ms..100ms
+    assert perf.percentile(samples, 50) == 0.05
+    assert perf.percentile(samples, 95) == 0.095
+    assert perf.percentile(samples, 99) == 0.099
+    assert perf.percentile([0.003], 99) == 0.003
+    summary = perf.summarize(samples, 1024 * 1024)
+    assert summary['samples'] == 100 and summary['min_ms'] == 1.0 and summary['p50_ms'] == 50.0
+    assert summary['mb_s'] == 20.0
+    print("百分位数与统计汇总测试通过")
 
-for size in lengths:
-    infile = f"test/data/input_{size}.txt"
-    cipherfile = f"test/data/cipher_{size}.zuc"
-    recovered = f"test/data/recovered_{size}.txt"
+def test_run_suite_in_process():
+    rows = perf.run_suite([16, 4096], impls=['python', 'gmssl'], warmup=1, repeat=3, log=None)
+    impls = {row['impl'] for row in rows}
+    assert 'python' in impls
+    for row in rows:
+        assert row['samples'] == 3 and row['op'] in ('encrypt', 'decrypt')
+        assert row['p50_ms'] <= row['p95_ms'] <= row['p99_ms']
+    print(f"进程内套件测试通过（实现: {', '.join(sorted(impls))}）")
 
-    # 生成指定长度的随机明文
-    with open(infile, "wb") as f:
-        f.write(os.urandom(size))
+def test_slow_impls_capped():
+    rows = perf.run_suite([16, 128 * 1024], impls=['python'], warmup=0, repeat=1, slow_max=1024, log=None)
+    assert {row['size'] for row in rows} == {16}
+    print("慢速实现大小上限测试通过")
 
-    # 加密
-    t1 = time.time()
-    subprocess.run(["./e2e-tool", "encrypt", "-in", infile, "-out", cipherfile], check=True, stdout=subprocess.DEVNULL)
-    t2 = time.time()
+def test_output_and_baseline_compare():
+    rows = [{'impl': 'gmssl', 'op': 'encrypt', 'size': 1024, 'samples': 5, 'min_ms': 0.01, 'mean_ms': 0.012,
+             'p50_ms': 0.012, 'p95_ms': 0.02, 'p99_ms': 0.02, 'mb_s': 81.38}]
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, csv_path = os.path.join(tmp, 'perf.json'), os.path.join(tmp, 'perf.csv')
+        perf.write_json(json_path, rows)
+        perf.write_csv(csv_path, rows)
+        assert perf.load_results(json_path) == rows
+        assert perf.load_results(csv_path)[0]['p50_ms'] == 0.012
 
-    # 解密
-    t3 = time.time()
-    subprocess.run(["./e2e-tool", "decrypt", "-in", cipherfile, "-out", recovered, "-key", "zuc.key"], check=True, stdout=subprocess.DEVNULL)
-    t4 = time.time()
+        slower = [dict(rows[0], p50_ms=0.015)]
+        [result] = perf.compare(slower, perf.load_results(csv_path), threshold=0.1)
+        assert result['regression'] and result['ratio'] == 1.25
+        [result] = perf.compare(slower, rows, threshold=0.5)
+        assert not result['regression']
+        assert perf.main(['--sizes', '16', '--impl', 'python', '--warmup', '0', '--repeat', '2',
+                          '--baseline', json_path]) == 0  # 基线中没有对应项，不算回退
+    print("JSON/CSV 输出与基线比较测试通过")
 
-    # 校验明文一致性
-    with open(infile, "rb") as f1, open(recovered, "rb") as f2:
-        ok = hashlib.sha256(f1.read()).digest() == hashlib.sha256(f2.read()).digest()
+def test_cli_batch():
+    if not perf.find_tool():
+        print("未找到 e2e-tool，跳过批量模式测试")
+        return
+    samples = perf._bench_cli_batch(1000, warmup=0, repeat=1, files=5)  # 内部校验解密结果
+    assert len(samples['encrypt']) == 1 and len(samples['decrypt']) == 1
+    print("e2e-tool 批量加解密测试通过")
 
-    print(f"{size:12} | {(t2 - t1)*1000:14.2f} | {(t4 - t3)*1000:14.2f} | {'✅' if ok else '❌'}")
+if __name__ == "__main__":
+    raise SystemExit(perf.main(['--sizes', ','.join(str(2 ** n) for n in range(4, 23, 2))] + sys.argv[1:]))
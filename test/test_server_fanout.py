@@ -0,0 +1,70 @@
+import asyncio
+import json
+from unittest import mock
+from net import websocket_server
+from net.websocket_server import WebSocketServer
+from test.server_helpers import FakeConnection, flush
+
+def test_broadcast_encodes_once():
+    async def run():
+        server = WebSocketServer()
+        conns = {f'u{i}': FakeConnection() for i in range(50)}
+        for name, conn in conns.items():
+            await server.register(name, conn, {"session": "big"})
+        await flush()
+        with mock.patch.object(websocket_server.json, 'dumps', wraps=json.dumps) as dumps:
+            failures = await server.broadcast(list(conns), {"type": "notice", "text": "hi"})
+        assert failures == {} and dumps.call_count == 1
+        await flush()
+        frames = [conn.sent[-1] for conn in conns.values()]
+        assert all(frame is frames[0] for frame in frames)  # 同一个字符串对象
+    asyncio.run(run())
+    print("群发只序列化一次测试通过")
+
+def test_slow_member_does_not_delay_others():
+    async def run():
+        server = WebSocketServer(queue_size=1, queue_policy='block')
+        slow, fast = FakeConnection(slow=True), FakeConnection()
+        await server.register('slow', slow, {"session": "g"})
+        await server.register('fast', fast, {"session": "g"})
+        await flush()
+        # 两条 session_members 通知：slow 的写任务卡在第一条上，第二条占满队列
+        assert server.clients['slow'].depth() == 1
+        pending = asyncio.ensure_future(server.broadcast(['slow', 'fast'], "frame"))
+        await flush()
+        assert not pending.done() and fast.sent[-1] == "frame"  # fast 已收到，slow 仍在等待
+        slow.release.set()
+        assert await asyncio.wait_for(pending, 1) == {}
+        await flush()
+        assert slow.sent[-1] == "frame"
+    asyncio.run(run())
+    print("慢速成员不拖慢其他成员测试通过")
+
+def test_per_recipient_failures():
+    async def run():
+        server = WebSocketServer(queue_size=1, queue_policy='drop')
+        conns = {name: FakeConnection(slow=name == 'full') for name in ('a', 'full', 'gone', 'ok')}
+        for name, conn in conns.items():
+            await server.register(name, conn, {"session": "team"})
+        await flush()
+        await server.broadcast(['full'], "x")  # 写任务卡住
+        await server.broadcast(['full'], "y")  # 队列满
+        server.clients['gone'].closed = True
+
+        frame = json.dumps({"type": "msg", "from": "a", "to": "room:team", "content": "hello"})
+        await server.forward(websocket_server.parse_route(frame), frame, 'a')
+        await flush()
+        assert conns['ok'].sent[-1] == frame
+        report = json.loads(conns['a'].sent[-1])
+        assert report['type'] == 'delivery_report' and report['delivered'] == 1
+        assert report['failed'] == {'full': 'queue_full', 'gone': 'closed'}
+        assert await server.broadcast(['nobody'], "x") == {'nobody': 'offline'}
+        stats = server.counters.snapshot()
+        assert stats['forwarded']['msg'] == 1 and stats['dropped']['msg'] == 2
+    asyncio.run(run())
+    print("逐个接收方失败回报测试通过")
+
+if __name__ == "__main__":
+    test_broadcast_encodes_once()
+    test_slow_member_does_not_delay_others()
+    test_per_recipient_failures()
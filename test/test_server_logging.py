@@ -0,0 +1,111 @@
+import asyncio
+import atexit
+import io
+import json
+import logging
+import logging.handlers
+from unittest import mock
+from net import websocket_server
+from net.websocket_server import MessageCounters, MessageSummary, WebSocketServer
+from test.server_helpers import FakeConnection
+
+def test_summary_truncates_payload():
+    data = {"type": "file_chunk", "from": "alice", "to": "bob", "chunk_index": 3, "chunk_data": "ab" * 65536}
+    text = str(MessageSummary(data))
+    assert "chunk_data='<131072 chars>'" in text and "from='alice'" in text and "chunk_index=3" in text
+    assert len(text) < 200
+    print("日志摘要截断测试通过")
+
+def test_summary_is_lazy():
+    log = logging.getLogger('test_server_logging.lazy')
+    log.setLevel(logging.INFO)
+    with mock.patch.object(MessageSummary, '__str__', side_effect=AssertionError("不应格式化")):
+        log.debug("收到消息 %s", MessageSummary({"chunk_data": "00" * 1000}))
+    print("日志延迟格式化测试通过")
+
+def test_counters_sample_high_rate_types():
+    counters = MessageCounters()
+    sampled = sum(counters.receive('file_chunk', 100) for _ in range(1000))
+    assert sampled == 1000 // websocket_server.LOG_SAMPLE_EVERY
+    assert all(counters.receive('pubkey', 10) for _ in range(5))
+    snapshot = counters.snapshot()
+    assert snapshot['received'] == {'file_chunk': 1000, 'pubkey': 5}
+    assert snapshot['chars']['file_chunk'] == 100000
+    print("高频消息抽样计数测试通过")
+
+def test_counters_bound_unknown_types():
+    counters = MessageCounters()
+    for i in range(1000):
+        counters.receive(f'junk-{i}', 10)
+    counters.receive(['not', 'a', 'string'], 10)
+    counters.receive(None, 10)
+    counters.receive('msg', 10)
+    snapshot = counters.snapshot()
+    assert snapshot['received'] == {'other': 1002, 'msg': 1}
+    assert set(snapshot['chars']) == {'other', 'msg'}
+    print("未知消息类型归入 other 测试通过")
+
+def test_setup_logging_uses_queue_listener():
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    stream = io.StringIO()
+    try:
+        with mock.patch('logging.StreamHandler', return_value=logging.StreamHandler(stream)):
+            listener = websocket_server.setup_logging(logging.INFO)
+        assert isinstance(root.handlers[0], logging.handlers.QueueHandler)
+        logging.getLogger('test_server_logging').info("事件 user=%s", 'alice')
+        listener.stop()
+        atexit.unregister(listener.stop)
+        assert "事件 user=alice" in stream.getvalue()
+    finally:
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+    print("队列日志处理器测试通过")
+
+def test_server_counts_instead_of_logging():
+    chunks = [json.dumps({"type": "file_chunk", "from": "alice", "to": "bob", "chunk_data": "ab" * 1000})
+              for _ in range(250)]
+    alice = FakeConnection([json.dumps({"type": "login", "username": "alice"})] + chunks
+                           + [json.dumps({"type": "msg", "from": "alice", "to": "carol", "content": "x"})])
+    server = WebSocketServer()
+
+    async def run():
+        await server.register('bob', FakeConnection())
+        with mock.patch.object(websocket_server.logger, 'debug') as debug:
+            await server.handle_client(alice, '/')
+        await server.clients['bob'].close()
+        return debug
+
+    debug = asyncio.run(run())
+    forwards = [c for c in debug.call_args_list if c.args[0].startswith("转发")]
+    assert len(forwards) == 3  # 第 1、101、201 块
+    stats = server.stats()['messages']
+    assert stats['received']['file_chunk'] == 250 and stats['forwarded']['file_chunk'] == 250
+    assert stats['dropped'] == {'msg': 1}  # carol 不在线
+    print("服务器计数与抽样日志测试通过")
+
+def test_fallback_frames_counted_once():
+    # 路由字段不在开头的旧帧走完整解析，也只计数一次
+    legacy = json.dumps({"type": "msg", "content": "x" * 2000, "to": "bob", "from": "alice"})
+    alice = FakeConnection([json.dumps({"type": "login", "username": "alice"}), legacy])
+    server = WebSocketServer()
+
+    async def run():
+        await server.register('bob', FakeConnection())
+        await server.handle_client(alice, '/')
+        await server.clients['bob'].close()
+
+    asyncio.run(run())
+    stats = server.stats()['messages']
+    assert stats['received']['msg'] == 1 and stats['chars']['msg'] == len(legacy)
+    assert stats['forwarded']['msg'] == 1
+    print("回退路径单次计数测试通过")
+
+if __name__ == "__main__":
+    test_summary_truncates_payload()
+    test_summary_is_lazy()
+    test_counters_sample_high_rate_types()
+    test_counters_bound_unknown_types()
+    test_setup_logging_uses_queue_listener()
+    test_server_counts_instead_of_logging()
+    test_fallback_frames_counted_once()
@@ -0,0 +1,114 @@
+import asyncio
+import json
+from net.websocket_server import Histogram, ServerMetrics, WebSocketServer, render_metrics
+from test.server_helpers import FakeConnection, flush
+
+def test_histogram_buckets():
+    hist = Histogram(buckets=(0.001, 0.01, 0.1))
+    for value in (0.0005, 0.001, 0.005, 0.05, 2.0):
+        hist.observe(value)
+    assert hist.cumulative() == [(0.001, 2), (0.01, 3), (0.1, 4), ('+Inf', 5)]
+    assert hist.count == 5 and abs(hist.sum - 2.0565) < 1e-9
+    print("延迟直方图分桶测试通过")
+
+def test_transfer_chunk_rate():
+    metrics = ServerMetrics()
+    metrics.track_file('file_start', 'alice', 'bob', now=100.0)
+    for i in range(10):
+        metrics.track_file('file_chunk', 'alice', 'bob', now=100.0 + (i + 1) * 0.5)
+    assert metrics.active_transfers(now=105.0) == {('alice', 'bob'): (10, 2.0)}
+    metrics.track_file('file_end', 'alice', 'bob', now=105.0)
+    assert metrics.active_transfers(now=105.0) == {}
+    metrics.track_file('file_chunk', 'carol', 'dave', now=0.0)
+    assert metrics.active_transfers(now=1000.0) == {}  # 长时间没有新块视为结束
+    print("文件传输块速率测试通过")
+
+def test_render_metrics():
+    async def run():
+        server = WebSocketServer()
+        alice, bob = FakeConnection(), FakeConnection()
+        await server.register('alice', alice)
+        await server.register('bob', bob)
+        server.metrics.connections = 2
+        frames = [json.dumps({"type": "file_start", "from": "alice", "to": "bob", "filename": "x"})]
+        frames += [json.dumps({"type": "file_chunk", "from": "alice", "to": "bob", "chunk_data": "ab" * 100})] * 3
+        for frame in frames:
+            await server.forward({"type": json.loads(frame)['type'], "from": "alice", "to": "bob"}, frame, 'alice',
+                                 received_at=0.0)
+        await flush()
+        return server, render_metrics(server)
+
+    server, text = asyncio.run(run())
+    lines = text.splitlines()
+    assert 'e2e_relay_connections 2' in lines
+    assert 'e2e_relay_sessions 1' in lines
+    assert 'e2e_relay_messages_forwarded_total{type="file_chunk"} 3' in lines
+    assert 'e2e_relay_latency_seconds_count 4' in lines
+    assert 'e2e_relay_queue_depth{user="bob"} 0' in lines
+    assert 'e2e_relay_transfer_chunks{from="alice",to="bob"} 3' in lines
+    assert 'e2e_relay_transfers_active 1' in lines
+    assert any(line.startswith('e2e_relay_loop_lag_seconds ') for line in lines)
+    print("指标文本输出测试通过")
+
+def test_render_metrics_bounded_type_labels():
+    server = WebSocketServer()
+    for i in range(50):
+        server.counters.receive(f'random-{i}', 10)
+    server.counters.receive('msg', 10)
+    # 即使计数表里混入了未归类的键，也不会成为标签值
+    server.counters.dropped['evil"} 1\nfake_metric{x="'] += 1
+    lines = [line for line in render_metrics(server).splitlines() if not line.startswith('#')]
+    received = [line for line in lines if line.startswith('e2e_relay_messages_received_total')]
+    assert received == ['e2e_relay_messages_received_total{type="msg"} 1',
+                        'e2e_relay_messages_received_total{type="other"} 50']
+    assert not any('random-' in line or 'evil' in line or line.startswith('fake_metric') for line in lines)
+    print("指标类型标签有界测试通过")
+
+def test_metrics_http_endpoint():
+    async def get(port, path):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response.decode('utf-8')
+
+    async def run():
+        server = WebSocketServer()
+        http = await asyncio.start_server(server.handle_metrics, '127.0.0.1', 0)
+        port = http.sockets[0].getsockname()[1]
+        try:
+            ok = await get(port, '/metrics')
+            missing = await get(port, '/other')
+        finally:
+            http.close()
+            await http.wait_closed()
+        return ok, missing
+
+    ok, missing = asyncio.run(run())
+    assert ok.startswith('HTTP/1.1 200 OK') and 'e2e_relay_online_users 0' in ok
+    assert missing.startswith('HTTP/1.1 404')
+    print("指标 HTTP 端点测试通过")
+
+def test_loop_lag_monitor():
+    async def run():
+        metrics = ServerMetrics()
+        task = asyncio.ensure_future(metrics.monitor_loop_lag(interval=0.01))
+        await asyncio.sleep(0.015)
+        import time
+        time.sleep(0.05)  # 阻塞事件循环
+        await asyncio.sleep(0.03)
+        task.cancel()
+        return metrics
+
+    metrics = asyncio.run(run())
+    assert metrics.loop_lag.count >= 1 and metrics.loop_lag_max >= 0.03
+    print("事件循环延迟监测测试通过")
+
+if __name__ == "__main__":
+    test_histogram_buckets()
+    test_transfer_chunk_rate()
+    test_render_metrics()
+    test_render_metrics_bounded_type_labels()
+    test_metrics_http_endpoint()
+    test_loop_lag_monitor()
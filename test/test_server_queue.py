@@ -0,0 +1,97 @@
+import asyncio
+import json
+from net.websocket_server import ClientConnection, WebSocketServer
+
+class SlowConnection:
+    """send 在 release 之前一直挂起，模拟不读数据的接收方"""
+    def __init__(self, incoming=()):
+        self.incoming = list(incoming)
+        self.sent = []
+        self.closed = False
+        self.release = asyncio.Event()
+        self.remote_address = ('127.0.0.1', 0)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0)
+        if not self.incoming:
+            raise StopAsyncIteration
+        return self.incoming.pop(0)
+
+    async def send(self, message):
+        await self.release.wait()
+        self.sent.append(message)
+
+    async def close(self):
+        self.closed = True
+
+def _msg(i, sender='alice', to='bob'):
+    return json.dumps({"type": "msg", "from": sender, "to": to, "content": str(i)})
+
+def test_drop_policy():
+    async def run():
+        peer = SlowConnection()
+        conn = ClientConnection('bob', peer, maxsize=4, policy='drop')
+        results = [await conn.send(_msg(i)) for i in range(10)]
+        await asyncio.sleep(0)
+        assert results.count(False) == conn.dropped and conn.dropped >= 5
+        assert conn.stats()['depth'] <= 4
+        peer.release.set()
+        await conn.close()
+        assert len(peer.sent) == 10 - conn.dropped and not peer.closed
+    asyncio.run(run())
+    print("队列满丢弃策略测试通过")
+
+def test_disconnect_policy():
+    async def run():
+        peer = SlowConnection()
+        conn = ClientConnection('bob', peer, maxsize=2, policy='disconnect')
+        for i in range(5):
+            await conn.send(_msg(i))
+        await asyncio.sleep(0)
+        assert peer.closed and conn.closed
+        assert not await conn.send(_msg(99))
+    asyncio.run(run())
+    print("队列满断开策略测试通过")
+
+def test_block_policy():
+    async def run():
+        peer = SlowConnection()
+        conn = ClientConnection('bob', peer, maxsize=2, policy='block')
+        sender = asyncio.ensure_future(asyncio.gather(*(conn.send(_msg(i)) for i in range(6))))
+        await asyncio.sleep(0.01)
+        assert not sender.done() and conn.depth() == 2  # 发送方在等待空位
+        peer.release.set()
+        assert all(await asyncio.wait_for(sender, 1))
+        await conn.close()
+        assert len(peer.sent) == 6 and conn.dropped == 0
+    asyncio.run(run())
+    print("队列满阻塞策略测试通过")
+
+def test_slow_peer_does_not_stall_server():
+    async def run():
+        server = WebSocketServer(queue_size=8, queue_policy='drop')
+        bob = SlowConnection()
+        await server.register('bob', bob)
+        # bob 不读数据时，alice 的上线、消息处理和下线都不会被卡住
+        alice = SlowConnection([json.dumps({"type": "login", "username": "alice"})]
+                               + [_msg(i) for i in range(50)]
+                               + [json.dumps({"type": "user_list"})])
+        alice.release.set()
+        await asyncio.wait_for(server.handle_client(alice, '/'), 2)
+        stats = server.queue_stats()['bob']
+        assert stats['depth'] == 8 and stats['dropped'] > 0
+        assert any(json.loads(m)['type'] == 'user_list' for m in alice.sent)
+        assert not server.lock.locked()
+        bob.release.set()
+        await server.clients['bob'].close()
+    asyncio.run(run())
+    print("慢速接收方不阻塞服务器测试通过")
+
+if __name__ == "__main__":
+    test_drop_policy()
+    test_disconnect_policy()
+    test_block_policy()
+    test_slow_peer_does_not_stall_server()
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+import time
+from net.websocket_server import WebSocketServer, parse_route
+from test.server_helpers import FakeConnection
+
+CHUNK = os.urandom(64 * 1024).hex()
+
+def test_parse_route_header_first():
+    message = json.dumps({"type": "file_chunk", "from": "alice", "to": "bob", "chunk_data": CHUNK})
+    assert parse_route(message) == {"type": "file_chunk", "from": "alice", "to": "bob"}
+    # 路由字段前有小字段、带转义的用户名
+    message = json.dumps({"type": "file_start", "filename": "a.png", "filesize": 10, "from": "a\"b",
+                          "to": "用户", "chunks": 1})
+    assert parse_route(message) == {"type": "file_start", "from": "a\"b", "to": "用户"}
+    print("路由头部分解析测试通过")
+
+def test_parse_route_fallback():
+    # 大载荷排在路由字段之前、字段缺失、类型不对、非对象时都回退到完整解析
+    assert parse_route(json.dumps({"type": "file", "data": CHUNK, "from": "a", "to": "b"})) is None
+    assert parse_route(json.dumps({"type": "heartbeat", "from": "a"})) is None
+    assert parse_route(json.dumps({"type": "msg", "from": "a", "to": 1})) is None
+    assert parse_route('[1, 2]') is None
+    assert parse_route('{"type": "msg", "from": "a", "to"') is None
+    assert parse_route(b'{"type": "msg"}') is None
+    print("路由头回退测试通过")
+
+def test_parse_route_rejects_duplicate_keys():
+    smuggled = ('{"type": "msg", "from": "a", "to": "b", "content": "x", '
+                '"type": "key_exchange", "peer": "c", "peer_pub": "00"}')
+    assert json.loads(smuggled)['type'] == 'key_exchange'  # 接收方以最后一个键为准
+    assert parse_route(smuggled) is None
+    assert parse_route('{"type": "msg", "type": "file", "from": "a", "to": "b"}') is None
+    # 用转义写的重复键
+    assert parse_route('{"type": "msg", "from": "a", "to": "b", "t\\u0079pe": "rekey"}') is None
+    # 重复键排在大载荷之后
+    far = json.dumps({"type": "file_chunk", "from": "a", "to": "b", "chunk_data": CHUNK})[:-1] + ', "to": "c"}'
+    assert parse_route(far) is None
+    print("路由键重复回退测试通过")
+
+def test_parse_route_cost_independent_of_payload():
+    message = json.dumps({"type": "file_chunk", "from": "alice", "to": "bob", "chunk_data": CHUNK})
+    start = time.perf_counter()
+    for _ in range(200):
+        parse_route(message)
+    route_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(200):
+        json.dumps(json.loads(message))
+    full_s = time.perf_counter() - start
+    print(f"128KB 文件块 200次: 路由头 {route_s * 1000:.1f} ms，完整解析+序列化 {full_s * 1000:.1f} ms")
+    assert route_s * 10 < full_s
+
+def test_server_forwards_original_frame():
+    chunk = json.dumps({"type": "file_chunk", "from": "alice", "to": "bob", "chunk_data": CHUNK})
+    legacy = json.dumps({"type": "msg", "content": "x" * 2000, "to": "bob", "from": "alice"})
+    alice = FakeConnection([json.dumps({"type": "login", "username": "alice"}), chunk, legacy])
+    bob = FakeConnection()
+    server = WebSocketServer()
+
+    async def run():
+        await server.register('bob', bob)
+        await server.handle_client(alice, '/')
+        await server.clients['bob'].close()
+
+    asyncio.run(run())
+    forwarded = [m for m in bob.sent if json.loads(m)['type'] in ('file_chunk', 'msg')]
+    assert forwarded[0] is chunk  # 原始帧原样转发
+    assert forwarded[1] == legacy  # 旧字段顺序走完整解析，仍转发原始帧
+    print("服务器原帧转发测试通过")
+
+def test_server_drops_duplicate_key_frames():
+    smuggled = ('{"type": "msg", "from": "alice", "to": "bob", "content": "x", '
+                '"type": "key_exchange", "peer": "mallory", "peer_pub": "00"}')
+    # 载荷里出现 "to" 字样只会走完整解析，仍然正常转发
+    benign = json.dumps({"type": "msg", "from": "alice", "to": "bob", "content": "to"})
+    alice = FakeConnection([json.dumps({"type": "login", "username": "alice"}), smuggled, benign])
+    bob = FakeConnection()
+    server = WebSocketServer()
+
+    async def run():
+        await server.register('bob', bob)
+        await server.handle_client(alice, '/')
+        await server.clients['bob'].close()
+
+    asyncio.run(run())
+    relayed = [m for m in bob.sent if json.loads(m)['type'] in ('msg', 'key_exchange')]
+    assert relayed == [benign]
+    print("重复键帧拦截测试通过")
+
+if __name__ == "__main__":
+    test_parse_route_header_first()
+    test_parse_route_fallback()
+    test_parse_route_rejects_duplicate_keys()
+    test_parse_route_cost_independent_of_payload()
+    test_server_forwards_original_frame()
+    test_server_drops_duplicate_key_frames()
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import tempfile
+from unittest import mock
+from crypto.keystore import KeyStore
+from net.websocket_server import WebSocketServer
+from test.server_helpers import FakeConnection, flush
+
+def test_auto_pairing_many_sessions():
+    async def run():
+        server = WebSocketServer()
+        conns = {}
+        for i in range(1000):
+            name = f'u{i}'
+            conns[name] = FakeConnection()
+            _, _, error = await server.register(name, conns[name])
+            assert error is None
+        await flush()
+        assert len(server.sessions) == 500 and len(server.clients) == 1000
+        for i in range(0, 1000, 2):
+            assert conns[f'u{i}'].of_type('session_ready') == [{"type": "session_ready", "peer": f'u{i + 1}'}]
+            assert conns[f'u{i + 1}'].of_type('session_ready') == [{"type": "session_ready", "peer": f'u{i}'}]
+    asyncio.run(run())
+    print("多会话自动配对测试通过")
+
+def test_key_exchange_and_offline_scoped_to_session():
+    async def run():
+        server = WebSocketServer()
+        conns = {name: FakeConnection() for name in ('a', 'b', 'c', 'd')}
+        handles = {}
+        for name in conns:
+            handles[name], _, _ = await server.register(name, conns[name])
+        for name in conns:
+            await server.handle_pubkey(name, f'{name}-pub')
+        await flush()
+        assert conns['a'].of_type('key_exchange') == [{"type": "key_exchange", "peer": "b", "peer_pub": "b-pub"}]
+        assert conns['d'].of_type('key_exchange') == [{"type": "key_exchange", "peer": "c", "peer_pub": "c-pub"}]
+
+        await server.unregister('a', handles['a'])
+        await flush()
+        assert conns['b'].of_type('user_offline') == [{"type": "user_offline", "username": "a"}]
+        assert not conns['c'].of_type('user_offline') and not conns['d'].of_type('user_offline')
+
+        # b 剩下一人，重新等待配对；新用户与 b 配对并完成密钥交换
+        e = FakeConnection()
+        await server.register('e', e)
+        await server.handle_pubkey('e', 'e-pub')
+        await flush()
+        assert e.of_type('session_ready') == [{"type": "session_ready", "peer": "b"}]
+        assert {"type": "key_exchange", "peer": "e", "peer_pub": "e-pub"} in conns['b'].messages
+    asyncio.run(run())
+    print("密钥交换与下线通知限定在会话内测试通过")
+
+def test_forward_only_within_session():
+    async def run():
+        server = WebSocketServer()
+        conns = {name: FakeConnection() for name in ('a', 'b', 'c', 'd')}
+        for name in conns:
+            await server.register(name, conns[name])
+        same = json.dumps({"type": "msg", "from": "a", "to": "b", "content": "hi"})
+        other = json.dumps({"type": "msg", "from": "a", "to": "c", "content": "hi"})
+        await server.forward({"type": "msg", "from": "a", "to": "b"}, same, 'a')
+        await server.forward({"type": "msg", "from": "a", "to": "c"}, other, 'a')
+        await flush()
+        assert len(conns['b'].of_type('msg')) == 1 and not conns['c'].of_type('msg')
+        assert server.counters.dropped['msg'] == 1
+    asyncio.run(run())
+    print("跨会话转发拦截测试通过")
+
+def test_unauthenticated_connection_cannot_relay():
+    async def run():
+        server = WebSocketServer()
+        a, b = FakeConnection(), FakeConnection()
+        await server.register('a', a)
+        await server.register('b', b)
+        spoof = json.dumps({"type": "msg", "from": "carol", "to": "b", "content": "spoof"})
+        # 不完整的登录消息不能让连接绕过登录进入主循环
+        attacker = FakeConnection([json.dumps({"type": "login"}), spoof])
+        await server.handle_client(attacker, '/')
+        # 没有登录就发的帧同样不会转发
+        await server.handle_client(FakeConnection([spoof]), '/')
+        await server.forward({"type": "msg", "from": "carol", "to": "b"}, spoof, None)
+        await flush()
+        assert not b.of_type('msg')
+        assert set(server.clients) == {'a', 'b'}
+    asyncio.run(run())
+    print("未登录连接转发拦截测试通过")
+
+def test_spoofed_from_dropped_in_room():
+    async def run():
+        server = WebSocketServer()
+        conns = {name: FakeConnection() for name in ('a', 'b')}
+        for name in conns:
+            await server.register(name, conns[name], {"session": "ops"})
+        # 同房间的 c 冒充 a：快速路径和完整解析路径都要拦截
+        spoof = json.dumps({"type": "rekey", "from": "a", "to": "b", "pubkey": "00"})
+        legacy = json.dumps({"type": "msg", "content": "x" * 2000, "to": "b", "from": "a"})
+        own = json.dumps({"type": "msg", "from": "c", "to": "b", "content": "hi"})
+        c = FakeConnection([json.dumps({"type": "login", "username": "c", "session": "ops"}), spoof, legacy, own])
+        await server.handle_client(c, '/')
+        await flush()
+        assert not conns['b'].of_type('rekey')
+        assert [m['from'] for m in conns['b'].of_type('msg')] == ['c']
+        assert server.counters.dropped['rekey'] == 1 and server.counters.dropped['msg'] == 1
+    asyncio.run(run())
+    print("房间内伪造 from 拦截测试通过")
+
+def test_explicit_pairs_and_rooms():
+    async def run():
+        server = WebSocketServer(room_capacity=3)
+        conns = {name: FakeConnection() for name in ('alice', 'bob', 'x', 'y', 'z', 'w')}
+        await server.register('alice', conns['alice'], {"peer": "bob"})
+        await server.register('x', conns['x'])  # 自动配对不会占用 alice 的会话
+        await server.register('bob', conns['bob'], {"peer": "alice"})
+        for name in ('y', 'z'):
+            await server.register(name, conns[name], {"session": "ops"})
+        _, _, error = await server.register('w', conns['w'], {"session": "ops"})
+        assert error is None
+        _, _, error = await server.register('v', FakeConnection(), {"session": "ops"})
+        assert error == "会话已满"
+        _, _, error = await server.register('bob', FakeConnection())
+        assert error == "用户名已存在"
+        await flush()
+        assert conns['alice'].of_type('session_ready') == [{"type": "session_ready", "peer": "bob"}]
+        assert not conns['x'].of_type('session_ready')
+        room = conns['y'].of_type('session_members')[-1]
+        assert room == {"type": "session_members", "session": "room:ops", "members": ["y", "z", "w"]}
+        assert server.user_sessions['x'] is not server.user_sessions['alice']
+    asyncio.run(run())
+    print("指定配对与多人房间测试通过")
+
+def test_client_login_targets_and_room_messages():
+    from net.websocket_client import WebSocketClient
+    with tempfile.TemporaryDirectory() as tmp, \
+            mock.patch('net.websocket_client.get_keystore', return_value=KeyStore(tmp)):
+        clients = {}
+        for name, target in (('alice', 'bob'), ('y', '#ops'), ('z', '#ops'), ('w', '#ops'), ('x', '')):
+            client = WebSocketClient()
+            client.username = name
+            client.set_session_target(target)
+            client.websocket = FakeConnection()
+            clients[name] = client
+        assert clients['alice'].login_message() == {"type": "login", "username": "alice", "peer": "bob"}
+        assert clients['y'].login_message() == {"type": "login", "username": "y", "session": "ops"}
+        assert clients['x'].login_message() == {"type": "login", "username": "x"}
+
+        async def run():
+            server = WebSocketServer()
+            conns = {name: FakeConnection() for name in ('y', 'z', 'w')}
+            for name in conns:
+                await server.register(name, conns[name], clients[name].login_message())
+            await flush()
+            y = clients['y']
+            await y.handle_message(json.dumps(conns['y'].of_type('session_members')[-1]))
+            assert y.room_members == ['z', 'w']
+            for peer in ('z', 'w'):
+                y.save_session_key('y', peer, f'{len(peer):02x}' * 16)
+
+            # 房间消息按成员分别加密，服务器在同一会话内逐个转发
+            await y.send_text_message('hello room')
+            frames = y.websocket.of_type('msg')
+            assert [frame['to'] for frame in frames] == ['z', 'w']
+            for frame in frames:
+                raw = json.dumps(frame)
+                await server.forward(frame, raw, 'y')
+            await flush()
+            for peer in ('z', 'w'):
+                received = conns[peer].of_type('msg')
+                key = clients[peer].load_session_key(peer, 'y')
+                assert len(received) == 1 and clients[peer].decrypt_message(key, received[0]['content']) == 'hello room'
+
+            await y.handle_message(json.dumps({"type": "delivery_report", "session": "room:ops", "msg_type": "msg",
+                                               "delivered": 1, "failed": {"w": "queue_full"}}))
+            await y.handle_message(json.dumps({"type": "user_offline", "username": "w"}))
+            assert y.room_members == ['z']
+        asyncio.run(run())
+    print("客户端指定会话与房间消息测试通过")
+
+if __name__ == "__main__":
+    test_auto_pairing_many_sessions()
+    test_key_exchange_and_offline_scoped_to_session()
+    test_forward_only_within_session()
+    test_unauthenticated_connection_cannot_relay()
+    test_spoofed_from_dropped_in_room()
+    test_explicit_pairs_and_rooms()
+    test_client_login_targets_and_room_messages()
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import random
+import tempfile
+from hide.bench import create_cover_image
+from hide.shard import ShardAssembler, embed_sharded_async, is_shard, parse_shard, split_payload
+from hide.steg import extract_message
+
+def test_split_and_reassemble():
+    payload = os.urandom(100000)
+    shards = split_payload(payload, count=7)
+    assert len(shards) == 7 and all(is_shard(s) for s in shards)
+
+    # 乱序到达，且有重复分片
+    order = shards + shards[:2]
+    random.shuffle(order)
+    assembler = ShardAssembler()
+    results = [assembler.add(s) for s in order]
+    assert payload in results
+    print("分片乱序重组测试通过")
+
+def test_late_duplicate_after_completion():
+    payload = os.urandom(5000)
+    shards = split_payload(payload, count=3)
+    assembler = ShardAssembler()
+    results = [assembler.add(s) for s in shards]
+    assert results[-1] == payload
+    # 重组完成后迟到的重复分片被忽略，不留下待重组条目
+    assert assembler.add(shards[1]) is None
+    message_id = parse_shard(shards[1]).message_id
+    assert assembler.is_completed(message_id) and assembler.progress(message_id) is None
+    assert not assembler._pending
+
+    # 已完成的消息ID超时后被清理
+    expired = ShardAssembler(timeout=0)
+    for s in split_payload(payload, count=2):
+        expired.add(s)
+    expired.add(split_payload(b"y" * 10, count=1)[0])
+    assert len(expired._completed) <= 1
+    print("迟到重复分片忽略测试通过")
+
+def test_shard_size_and_corruption():
+    shards = split_payload(b"x" * 1000, shard_size=300)
+    assert len(shards) == 4
+    corrupted = bytearray(shards[0])
+    corrupted[-1] ^= 1
+    try:
+        parse_shard(bytes(corrupted))
+        assert False, "损坏的分片应当校验失败"
+    except ValueError:
+        pass
+    print("分片校验测试通过")
+
+def test_embed_sharded_async():
+    payload = os.urandom(20000)  # 超过单张 160x120 图片的容量
+
+    with tempfile.TemporaryDirectory() as workdir:
+        covers = [create_cover_image(os.path.join(workdir, f"cover{i}.png"), 160, 120) for i in range(3)]
+        outputs = asyncio.run(embed_sharded_async('image', covers, os.path.join(workdir, 'out'), payload))
+        assembler = ShardAssembler()
+        results = [assembler.add(extract_message('image', path)) for path in reversed(outputs)]
+    assert results[-1] == payload
+    print("分片并行嵌入测试通过")
+
+if __name__ == "__main__":
+    test_split_and_reassemble()
+    test_late_duplicate_after_completion()
+    test_shard_size_and_corruption()
+    test_embed_sharded_async()
@@ -0,0 +1,77 @@
+import asyncio
+import os
+import pickle
+import tempfile
+from unittest import mock
+import numpy as np
+from hide import steg
+from hide.bench import create_cover_image
+from hide.shm import ShmRing
+from hide.steg import embed_array_async, extract_array_async, get_shm_ring
+
+def test_shm_ring_reuse():
+    ring = ShmRing(max_blocks=2)
+    try:
+        a = ring.acquire(1000)
+        name = a.name
+        ring.release(a)
+        b = ring.acquire(2000)
+        assert b.name == name  # 复用同一块
+        c = ring.acquire(10 * 1024 * 1024)
+        ring.release(b)
+        ring.release(c)
+        ring.acquire(100 * 1024 * 1024)  # 超过上限，回收最旧的空闲块
+        assert ring.block_count == 2
+    finally:
+        ring.close()
+    print("共享内存环形分配测试通过")
+
+def test_embed_array_async():
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+    secret = bytes(rng.integers(0, 256, 200000, dtype=np.uint8))
+
+    # 路径接口的异步隐写也使用同一个分配器，只看本测试新建的块
+    blocks_before = get_shm_ring().block_count
+
+    async def run():
+        results = []
+        for n_bits in (1, 2):
+            stego = await embed_array_async(frame, secret, n_bits=n_bits)
+            results.append((stego, await extract_array_async(stego, n_bits=n_bits)))
+        return results
+
+    for stego, extracted in asyncio.run(run()):
+        assert extracted == secret
+        assert stego.shape == frame.shape and not np.shares_memory(stego, frame)
+        assert np.abs(stego.astype(int) - frame.astype(int)).max() <= 3
+    # 两轮任务复用像素块，只为更大的结果块新建
+    assert get_shm_ring().block_count - blocks_before <= 4
+    print("共享内存数组隐写测试通过")
+
+def test_path_api_payload_via_shm():
+    secret = os.urandom(40000)
+    submitted = []
+    submit = steg.get_executor().submit
+
+    def record(func, *args, **kwargs):
+        submitted.append(len(pickle.dumps((args, kwargs))))
+        return submit(func, *args, **kwargs)
+
+    async def run(workdir):
+        cover = create_cover_image(os.path.join(workdir, "cover.png"), 400, 300)
+        output = os.path.join(workdir, "stego.png")
+        await steg.embed_message_async('image', cover, output, secret)
+        return await steg.extract_message_async('image', output)
+
+    with tempfile.TemporaryDirectory() as workdir, mock.patch.object(steg.get_executor(), 'submit', record):
+        extracted = asyncio.run(run(workdir))
+    assert extracted == secret
+    # 跨进程只传路径和描述符，负载和提取结果都不经 pickle
+    assert len(submitted) == 2 and max(submitted) < 1024
+    print("路径接口负载经共享内存传递测试通过")
+
+if __name__ == "__main__":
+    test_shm_ring_reuse()
+    test_embed_array_async()
+    test_path_api_payload_via_shm()
@@ -0,0 +1,91 @@
+import os
+import time
+from unittest import mock
+from gmssl import sm2, func
+from crypto import sm2_ec
+
+G_HEX = sm2.default_ecc_table['g']
+
+def python_only():
+    """强制使用纯 Python 引擎（即使找到了原生动态库）"""
+    return mock.patch.dict(os.environ, {sm2_ec.BACKEND_ENV: 'python'})
+
+def test_curve_parameters():
+    table = sm2.default_ecc_table
+    assert sm2_ec.P == int(table['p'], 16)
+    assert sm2_ec.N == int(table['n'], 16)
+    assert sm2_ec.B == int(table['b'], 16)
+    assert sm2_ec.point_to_hex(sm2_ec.G) == G_HEX
+    assert sm2_ec.is_on_curve(sm2_ec.G)
+    print("SM2 曲线参数测试通过")
+
+@python_only()
+def test_keygen_matches_gmssl():
+    legacy = sm2.CryptSM2(public_key='', private_key='00' * 32)
+    for priv in ['1', '2', 'f', '10', '%x' % (sm2_ec.N - 1)] + [func.random_hex(64) for _ in range(20)]:
+        pub = sm2_ec.public_key_hex(priv)
+        assert pub == legacy._kg(int(priv, 16), G_HEX), priv
+        assert sm2_ec.is_on_curve(sm2_ec.point_from_hex(pub))
+    priv, pub = sm2_ec.generate_keypair()
+    assert len(priv) == 64 and pub == legacy._kg(int(priv, 16), G_HEX)
+    print("SM2 密钥生成与 gmssl 一致性测试通过")
+
+@python_only()
+def test_ecdh_matches_gmssl():
+    legacy = sm2.CryptSM2(public_key='', private_key='00' * 32)
+    for _ in range(20):
+        priv_a, pub_a = sm2_ec.generate_keypair()
+        priv_b, pub_b = sm2_ec.generate_keypair()
+        shared = sm2_ec.ecdh_hex(priv_a, pub_b)
+        assert shared == legacy._kg(int(priv_a, 16), pub_b)
+        assert shared == sm2_ec.ecdh_hex(priv_b, pub_a)
+        # 重复对端走缓存表，结果不变
+        assert sm2_ec.ecdh_hex(priv_a, pub_b) == shared
+    print("SM2 ECDH 与 gmssl 一致性测试通过")
+
+def test_invalid_inputs():
+    for bad in ['00' * 64, '12', G_HEX[:-1] + ('0' if G_HEX[-1] != '0' else '1')]:
+        try:
+            sm2_ec.point_from_hex(bad)
+            assert False, "应拒绝无效公钥"
+        except ValueError:
+            pass
+    try:
+        sm2_ec.scalar_mult_base(sm2_ec.N)
+        assert False, "应拒绝零标量"
+    except ValueError:
+        pass
+    print("SM2 无效输入测试通过")
+
+@python_only()
+def test_peer_cache_bounded():
+    priv, _ = sm2_ec.generate_keypair()
+    for _ in range(sm2_ec.PEER_CACHE_SIZE + 5):
+        sm2_ec.ecdh_hex(priv, sm2_ec.generate_keypair()[1])
+    assert len(sm2_ec._peer_tables) == sm2_ec.PEER_CACHE_SIZE
+    print("SM2 对端缓存容量测试通过")
+
+@python_only()
+def test_faster_than_gmssl():
+    priv, peer_pub = sm2_ec.generate_keypair()
+    legacy = sm2.CryptSM2(public_key='', private_key=priv)
+    k = int(priv, 16)
+    start = time.perf_counter()
+    for _ in range(5):
+        legacy._kg(k, peer_pub)
+    legacy_s = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(5):
+        sm2_ec.ecdh_hex(priv, peer_pub)
+    engine_s = time.perf_counter() - start
+    print(f"ECDH 5次: gmssl {legacy_s * 1000:.1f} ms，引擎 {engine_s * 1000:.1f} ms")
+    assert engine_s < legacy_s
+    print("SM2 性能测试通过")
+
+if __name__ == "__main__":
+    test_curve_parameters()
+    test_keygen_matches_gmssl()
+    test_ecdh_matches_gmssl()
+    test_invalid_inputs()
+    test_peer_cache_bounded()
+    test_faster_than_gmssl()
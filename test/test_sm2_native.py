@@ -0,0 +1,56 @@
+import os
+import unittest
+from unittest import mock
+from gmssl import sm2
+from crypto import sm2_ec, sm2_native
+
+requires_native = unittest.skipUnless(sm2_native.available(), "未找到 SM2 动态库（make shared 或设置 E2E_SM2_LIB）")
+
+@requires_native
+def test_native_matches_python_engine():
+    legacy = sm2.CryptSM2(public_key='', private_key='00' * 32)
+    with mock.patch.dict(os.environ, {sm2_ec.BACKEND_ENV: 'python'}):
+        for _ in range(20):
+            priv, pub = sm2_native.generate_keypair()
+            assert sm2_ec.public_key_hex(priv) == pub == sm2_native.public_key_hex(priv)
+            peer_priv, peer_pub = sm2_ec.generate_keypair()
+            shared = sm2_native.ecdh_hex(priv, peer_pub)
+            assert shared == sm2_ec.ecdh_hex(priv, peer_pub) == sm2_ec.ecdh_hex(peer_priv, pub)
+            assert shared == legacy._kg(int(priv, 16), peer_pub)
+    print(f"SM2 原生绑定与纯 Python 引擎一致性测试通过（{sm2_native.LIB_PATH}）")
+
+@requires_native
+def test_native_rejects_invalid_input():
+    priv, _ = sm2_native.generate_keypair()
+    for bad in ['00' * 64, '12']:
+        try:
+            sm2_native.ecdh_hex(priv, bad)
+            assert False, "应拒绝无效公钥"
+        except ValueError:
+            pass
+    try:
+        sm2_native.public_key_hex('%x' % sm2_ec.N)
+        assert False, "应拒绝无效私钥"
+    except ValueError:
+        pass
+    print("SM2 原生绑定无效输入测试通过")
+
+def test_dispatch_and_fallback():
+    with mock.patch.dict(os.environ, {sm2_ec.BACKEND_ENV: 'auto'}):
+        assert sm2_ec.backend() == ('native' if sm2_native.is_fast() else 'python')
+    with mock.patch.dict(os.environ, {sm2_ec.BACKEND_ENV: 'python'}):
+        assert sm2_ec.backend() == 'python'
+    with mock.patch.dict(os.environ, {sm2_ec.BACKEND_ENV: 'native'}):
+        assert sm2_ec.backend() == ('native' if sm2_native.available() else 'python')
+        # n-1 超出原生库接受的私钥范围，回退到纯 Python 结果（即 -G）
+        x, y = sm2_ec.G
+        assert sm2_ec.public_key_hex('%x' % (sm2_ec.N - 1)) == sm2_ec.point_to_hex((x, sm2_ec.P - y))
+    print("SM2 后端选择与回退测试通过")
+
+if __name__ == "__main__":
+    for test in (test_native_matches_python_engine, test_native_rejects_invalid_input):
+        try:
+            test()
+        except unittest.SkipTest as e:
+            print(f"跳过 {test.__name__}: {e}")
+    test_dispatch_and_fallback()
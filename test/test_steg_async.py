@@ -0,0 +1,47 @@
+import asyncio
+import os
+import tempfile
+from hide.bench import create_cover_image
+from hide.steg import embed_message_async, extract_message_async, set_concurrency_limit, MAX_CONCURRENCY
+
+def test_steg_async():
+    secret = b"hello, this is a secret message!"
+
+    async def run(workdir):
+        cover = create_cover_image(os.path.join(workdir, "cover.png"), 200, 150)
+        outputs = [os.path.join(workdir, f"stego_{i}.png") for i in range(3)]
+        # 并发嵌入
+        await asyncio.gather(*(embed_message_async('image', cover, out, secret) for out in outputs))
+        return await asyncio.gather(*(extract_message_async('image', out) for out in outputs))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        extracted = asyncio.run(run(workdir))
+    assert extracted == [secret] * 3
+    print("异步隐写测试：", True)
+
+def test_steg_async_cancel():
+    async def run(workdir):
+        cover = create_cover_image(os.path.join(workdir, "cover.png"), 200, 150)
+        set_concurrency_limit(1)
+        try:
+            first = asyncio.ensure_future(embed_message_async('image', cover, os.path.join(workdir, "a.png"), b"a"))
+            second = asyncio.ensure_future(embed_message_async('image', cover, os.path.join(workdir, "b.png"), b"b"))
+            await asyncio.sleep(0)
+            second.cancel()
+            await first
+            try:
+                await second
+            except asyncio.CancelledError:
+                return True
+            return False
+        finally:
+            set_concurrency_limit(MAX_CONCURRENCY)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cancelled = asyncio.run(run(workdir))
+    assert cancelled
+    print("异步隐写取消测试：", cancelled)
+
+if __name__ == "__main__":
+    test_steg_async()
+    test_steg_async_cancel()
@@ -0,0 +1,126 @@
+import os
+import tempfile
+import gmalg
+from crypto import zuc, zuc_ctypes
+
+def legacy_keystream(key, iv, length):
+    g = gmalg.ZUC(key, iv)
+    return b''.join(g.generate() for _ in range((length + 3) // 4))[:length]
+
+def test_standard_vector():
+    # GM/T 0001 测试向量：全零 key/iv
+    assert zuc.ZUC(bytes(16), bytes(16)).keystream(8).hex() == '27bede74018082da'
+    key = bytes.fromhex('3d4c4be96a82fdaeb58f641db17b455b')
+    iv = bytes.fromhex('84319aa8de6915ca1f6bda6bfbd8c766')
+    assert zuc.ZUC(key, iv).keystream(8).hex() == '14f1c272 3279c419'.replace(' ', '')
+    print("ZUC 标准测试向量通过")
+
+def test_matches_gmalg():
+    for length in (1, 3, 4, 5, 1000, 4 * zuc.BLOCK_WORDS + 7):
+        key, iv = os.urandom(16), os.urandom(16)
+        assert zuc.ZUC(key, iv).keystream(length) == legacy_keystream(key, iv, length)
+    print("ZUC 密钥流与 gmalg 一致")
+
+def test_keystream_into_preallocated():
+    key, iv = os.urandom(16), os.urandom(16)
+    buf = bytearray(10003)
+    assert zuc.ZUC(key, iv).keystream_into(buf) == len(buf)
+    assert bytes(buf) == legacy_keystream(key, iv, len(buf))
+    print("预分配缓冲区密钥流测试通过")
+
+def test_message_roundtrip_and_legacy_format():
+    session_key = os.urandom(64).hex()
+    for text in ('', 'hello', '你好，世界' * 1000):
+        msg = zuc.encrypt_message(session_key, text)
+        assert zuc.decrypt_message(session_key, msg) == text
+        assert zuc.decrypt_message(bytes.fromhex(session_key), msg) == text
+
+    # 旧实现生成的 'iv:ct' 消息仍可解密
+    key, iv = bytes.fromhex(session_key[:32]), os.urandom(16)
+    pt = '旧格式消息'.encode()
+    ct = bytes(a ^ b for a, b in zip(pt, legacy_keystream(key, iv, len(pt))))
+    assert zuc.decrypt_message(session_key, iv.hex() + ':' + ct.hex()) == '旧格式消息'
+    print("消息加解密与旧格式兼容测试通过")
+
+def test_backends_agree():
+    key, iv, data = os.urandom(16), os.urandom(16), os.urandom(4099)
+    expected = zuc.python_crypt(key, iv, data)
+    for name in zuc.available_backends():
+        assert zuc.BACKENDS[name](key, iv, data) == expected, name
+    print(f"ZUC 后端输出一致: {', '.join(zuc.available_backends())}")
+
+def test_inplace_buffers():
+    import numpy as np
+
+    key, iv, data = os.urandom(16), os.urandom(16), os.urandom(20003)
+    expected = zuc.python_crypt(key, iv, data)
+    for name, crypt_inplace in zuc.INPLACE_BACKENDS.items():
+        if name not in zuc.available_backends():
+            continue
+        buf = bytearray(data)
+        assert crypt_inplace(key, iv, buf) == len(data) and buf == expected
+
+        # memoryview 切片只修改对应区间
+        buf = bytearray(data)
+        crypt_inplace(key, iv, memoryview(buf)[100:200])
+        assert buf[100:200] == zuc.python_crypt(key, iv, data[100:200]) and buf[:100] == data[:100]
+
+        # 多维 NumPy 数组按字节处理
+        arr = np.frombuffer(data[:20000], dtype=np.uint8).copy().reshape(100, 50, 4)
+        crypt_inplace(key, iv, arr)
+        assert arr.tobytes() == expected[:20000]
+
+        try:
+            crypt_inplace(key, iv, data)
+            assert False, "只读缓冲区应当被拒绝"
+        except TypeError:
+            pass
+    print("原地加密测试通过")
+
+def test_backend_selection_cache_and_override():
+    saved = {k: os.environ.get(k) for k in (zuc.BACKEND_ENV, zuc.CACHE_ENV)}
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.environ.pop(zuc.BACKEND_ENV, None)
+            os.environ[zuc.CACHE_ENV] = os.path.join(workdir, 'zuc_backend.json')
+            name, source = zuc.select_backend(force=True)
+            assert name in zuc.available_backends()
+            if len(zuc.available_backends()) > 1:
+                assert source == 'benchmark'
+                assert zuc.select_backend() == (name, 'cache')
+
+            os.environ[zuc.BACKEND_ENV] = 'python'
+            assert zuc.select_backend() == ('python', 'env')
+            assert zuc.backend_info()['backend'] == 'python'
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        zuc.select_backend()
+    print("ZUC 后端选择测试通过")
+
+def test_missing_library_does_not_fail_import():
+    saved = os.environ.get(zuc_ctypes.LIB_ENV)
+    os.environ[zuc_ctypes.LIB_ENV] = '/nonexistent/libgmssl.so'
+    try:
+        assert zuc_ctypes.candidate_paths()[0] == '/nonexistent/libgmssl.so'
+        lib, path = zuc_ctypes.load_library()
+        assert path != '/nonexistent/libgmssl.so'
+    finally:
+        if saved is None:
+            os.environ.pop(zuc_ctypes.LIB_ENV, None)
+        else:
+            os.environ[zuc_ctypes.LIB_ENV] = saved
+    print("缺少原生库时导入不失败")
+
+if __name__ == "__main__":
+    test_standard_vector()
+    test_matches_gmalg()
+    test_keystream_into_preallocated()
+    test_message_roundtrip_and_legacy_format()
+    test_backends_agree()
+    test_inplace_buffers()
+    test_backend_selection_cache_and_override()
+    test_missing_library_does_not_fail_import()
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import random
+import tempfile
+from crypto import zuc
+from crypto.zuc_stream import ZucStream, encrypt_file, iter_encrypt_file
+
+def test_arbitrary_chunk_boundaries():
+    key, iv, data = os.urandom(16), os.urandom(16), os.urandom(50000)
+    expected = zuc.python_crypt(key, iv, data)
+    for backend in zuc.available_backends():
+        stream = ZucStream(key, iv, backend)
+        out, pos = [], 0
+        while pos < len(data):
+            n = random.choice([0, 1, 2, 3, 5, 7, 4096, 10001])
+            out.append(stream.update(data[pos:pos + n]))
+            pos += n
+        assert b''.join(out) == expected, backend
+        assert stream.offset == len(data)
+    print("任意分块边界流式加密测试通过")
+
+def test_encrypt_file_constant_buffer():
+    key, iv = os.urandom(16), os.urandom(16)
+    data = os.urandom(3 * 65536 + 13)
+    with tempfile.TemporaryDirectory() as workdir:
+        src = os.path.join(workdir, 'plain.bin')
+        enc = os.path.join(workdir, 'plain.bin.zuc')
+        dec = os.path.join(workdir, 'plain.dec')
+        with open(src, 'wb') as f:
+            f.write(data)
+
+        assert encrypt_file(src, enc, key, iv, chunk_size=65535) == len(data)
+        with open(enc, 'rb') as f:
+            assert f.read() == zuc.python_crypt(key, iv, data)
+        encrypt_file(enc, dec, key, iv, chunk_size=4099)
+        with open(dec, 'rb') as f:
+            assert f.read() == data
+
+        # 所有块都来自同一个复用缓冲区
+        chunks = [(chunk.obj, hashlib.sha256(chunk).digest()) for chunk in iter_encrypt_file(src, key, iv, 65536)]
+        assert len(chunks) == 4 and len({id(obj) for obj, _ in chunks}) == 1
+    print("固定内存文件加密测试通过")
+
+if __name__ == "__main__":
+    test_arbitrary_chunk_boundaries()
+    test_encrypt_file_constant_buffer()